@@ -0,0 +1,190 @@
+"""Admission control and backpressure for live scoring sessions.
+
+Without a limit, every extra session slows every other one down: server-side
+inference is shared, and each session's chunk queue used to grow without
+bound while it waited. Two pieces keep tail latency predictable instead:
+
+AdmissionController decides at `start` time. Audio-mode sessions consume
+server-side inference, so they're capped at the backend's throughput: each
+inference slot (a pool worker, or the in-process backend) runs batches of up
+to max_batch_size chunks, and every batch entry keeps up with
+AUDIO_SESSIONS_PER_SLOT sessions in real time. AUDIO_SESSION_CAPACITY
+overrides that. When it runs out a client that can run wav2vec2 itself
+(allow_downgrade) is switched to logits mode, anyone else is turned away
+with a retry hint. Every session, logits mode included, counts against
+MAX_LIVE_SESSIONS. Either limit set to 0 means none.
+
+BoundedChunkQueue replaces the per-session queue.Queue. put() never blocks
+the socket handler: once SESSION_QUEUE_MAX_CHUNKS items are waiting, a new
+chunk is merged into the newest queued one (one bigger inference instead of
+two) or, when merging isn't possible, the oldest queued chunk is dropped.
+"""
+import os
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+
+from inference import INFERENCE_BATCH_MAX
+from inference_pool import INFERENCE_WORKERS
+
+MAX_LIVE_SESSIONS = int(os.environ.get("MAX_LIVE_SESSIONS", "500"))
+# Concurrent audio-mode sessions one batch entry of one inference slot keeps
+# up with in real time.
+AUDIO_SESSIONS_PER_SLOT = int(os.environ.get("AUDIO_SESSIONS_PER_SLOT", "4"))
+# Unset: derived from the inference backend (see audio_capacity_for).
+AUDIO_SESSION_CAPACITY = (int(os.environ["AUDIO_SESSION_CAPACITY"])
+                          if os.environ.get("AUDIO_SESSION_CAPACITY") else None)
+ADMISSION_RETRY_AFTER_SECONDS = float(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+
+SESSION_QUEUE_MAX_CHUNKS = int(os.environ.get("SESSION_QUEUE_MAX_CHUNKS", "8"))
+# "merge" (default) or "drop".
+SESSION_QUEUE_OVERFLOW = os.environ.get("SESSION_QUEUE_OVERFLOW", "merge")
+# A merged chunk may grow to at most this many of the incoming chunk.
+SESSION_QUEUE_MERGE_LIMIT = int(os.environ.get("SESSION_QUEUE_MERGE_LIMIT", "4"))
+
+
+class Admission:
+    """Outcome of AdmissionController.admit(). Truthy when admitted; pass it
+    back to release() when the session ends."""
+
+    __slots__ = ("admitted", "mode", "reason", "retry_after", "_released")
+
+    def __init__(self, admitted, mode=None, reason=None, retry_after=None):
+        self.admitted = admitted
+        self.mode = mode
+        self.reason = reason
+        self.retry_after = retry_after
+        self._released = False
+
+    def __bool__(self):
+        return self.admitted
+
+
+def audio_capacity_for(concurrency, max_batch_size, per_slot=AUDIO_SESSIONS_PER_SLOT):
+    """Audio sessions a backend with `concurrency` slots running batches of
+    up to `max_batch_size` keeps up with."""
+    return max(1, concurrency) * max(1, max_batch_size) * per_slot
+
+
+class AdmissionController:
+    """Args:
+        audio_capacity: a fixed cap; None derives it from the configured
+                        backend now and from the loaded one in fit().
+    """
+
+    def __init__(self, max_sessions=MAX_LIVE_SESSIONS, audio_capacity=AUDIO_SESSION_CAPACITY,
+                 retry_after=ADMISSION_RETRY_AFTER_SECONDS):
+        self.max_sessions = max_sessions
+        self._fixed_capacity = audio_capacity is not None
+        self.audio_capacity = (audio_capacity if self._fixed_capacity
+                               else audio_capacity_for(INFERENCE_WORKERS, INFERENCE_BATCH_MAX))
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._active = {"audio": 0, "logits": 0}
+        self._counts = {"admitted": 0, "downgraded": 0, "rejected": 0}
+
+    def fit(self, backend):
+        """Re-derive the audio capacity from a loaded inference backend
+        (unless it was set explicitly)."""
+        if self._fixed_capacity:
+            return
+        capacity = audio_capacity_for(getattr(backend, "concurrency", 1),
+                                      getattr(backend, "max_batch_size", 1))
+        with self._lock:
+            self.audio_capacity = capacity
+
+    def admit(self, mode, allow_downgrade=False):
+        mode = "logits" if mode == "logits" else "audio"
+        with self._lock:
+            if self.max_sessions and sum(self._active.values()) >= self.max_sessions:
+                self._counts["rejected"] += 1
+                return Admission(False, reason="server_full", retry_after=self.retry_after)
+            reason = None
+            if (mode == "audio" and self.audio_capacity
+                    and self._active["audio"] >= self.audio_capacity):
+                if not allow_downgrade:
+                    self._counts["rejected"] += 1
+                    return Admission(False, reason="inference_full", retry_after=self.retry_after)
+                mode, reason = "logits", "inference_full"
+                self._counts["downgraded"] += 1
+            self._active[mode] += 1
+            self._counts["admitted"] += 1
+            return Admission(True, mode=mode, reason=reason)
+
+    def release(self, admission):
+        if not admission:
+            return
+        with self._lock:
+            if admission._released:
+                return
+            admission._released = True
+            self._active[admission.mode] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active_audio_sessions": self._active["audio"],
+                "active_logits_sessions": self._active["logits"],
+                "audio_session_capacity": self.audio_capacity,
+                "max_live_sessions": self.max_sessions,
+                **self._counts,
+            }
+
+
+class BoundedChunkQueue:
+    """Per-session chunk queue with the get()/put() surface of queue.Queue.
+
+    put() never blocks. The None end-of-stream sentinel is always accepted
+    and never merged or dropped, so a stop is never lost under overload.
+    """
+
+    def __init__(self, maxsize=SESSION_QUEUE_MAX_CHUNKS, overflow=SESSION_QUEUE_OVERFLOW,
+                 merge_limit=SESSION_QUEUE_MERGE_LIMIT):
+        self.maxsize = max(1, maxsize)
+        self.overflow = overflow
+        self.merge_limit = merge_limit
+        self.merged = 0
+        self.dropped = 0
+        self._stopped = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if self._stopped:
+                # Nothing queued after the sentinel is ever read.
+                return
+            if item is None:
+                self._stopped = True
+                self._items.append(item)
+            elif len(self._items) < self.maxsize:
+                self._items.append(item)
+            elif not self._merge(item):
+                self._items.popleft()
+                self.dropped += 1
+                self._items.append(item)
+            self._cond.notify()
+
+    def _merge(self, item):
+        if self.overflow != "merge":
+            return False
+        newest = self._items[-1]
+        if (np.ndim(newest) != np.ndim(item)
+                or np.shape(newest)[1:] != np.shape(item)[1:]
+                or len(newest) + len(item) > self.merge_limit * len(item)):
+            return False
+        self._items[-1] = np.concatenate([newest, item])
+        self.merged += 1
+        return True
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout if block else 0):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
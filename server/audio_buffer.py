@@ -0,0 +1,162 @@
+"""Bounded per-session audio storage and a process-wide memory budget.
+
+Sessions used to keep every audio chunk they received, in logits mode too,
+so a client that never sent `stop` grew server memory without limit. Now
+whatever a session keeps for prosody lives in fixed-size ring buffers,
+allocated once when the session starts and holding only the most recent
+SESSION_AUDIO_MAX_SECONDS:
+
+  * RingBuffer: the most recent `capacity` values of a 1-D stream (the yin
+    tracker's per-frame pitch, aperiodicity and level).
+  * AudioRingBuffer: raw audio for trackers that need the whole utterance
+    (pyin), stored as SESSION_AUDIO_DTYPE (int16 by default, half the size
+    of float32) and optionally decimated by SESSION_AUDIO_DOWNSAMPLE.
+
+Every session's buffers are reserved against one MemoryBudget of
+AUDIO_MEMORY_BUDGET_MB before it's admitted; when the budget is spent, new
+sessions are turned away instead of pushing the process into swap. The
+budget's usage is reported on /metrics.
+"""
+import os
+import threading
+
+import numpy as np
+
+SESSION_AUDIO_MAX_SECONDS = float(os.environ.get("SESSION_AUDIO_MAX_SECONDS", "30"))
+# "int16" or "float32".
+SESSION_AUDIO_DTYPE = os.environ.get("SESSION_AUDIO_DTYPE", "int16")
+# Keep every Nth sample (after averaging each N), e.g. 2 stores 16 kHz audio
+# at 8 kHz. Pitch only goes up to ~300 Hz, but pyin frames then span twice
+# the time, so scores shift slightly.
+SESSION_AUDIO_DOWNSAMPLE = int(os.environ.get("SESSION_AUDIO_DOWNSAMPLE", "1"))
+AUDIO_MEMORY_BUDGET_MB = float(os.environ.get("AUDIO_MEMORY_BUDGET_MB", "512"))
+
+_INT16_SCALE = 32767.0
+
+
+class MemoryBudget:
+    """Byte budget shared by every session's buffers."""
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = int(limit_bytes)
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._holders = 0
+        self._refused = 0
+
+    def reserve(self, nbytes):
+        """True (and nbytes held until release()) if it fits."""
+        with self._lock:
+            if self._reserved + nbytes > self.limit_bytes:
+                self._refused += 1
+                return False
+            self._reserved += nbytes
+            self._holders += 1
+            return True
+
+    def release(self, nbytes):
+        with self._lock:
+            self._reserved -= nbytes
+            self._holders -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_bytes": self.limit_bytes,
+                "reserved_bytes": self._reserved,
+                "sessions": self._holders,
+                "refused": self._refused,
+            }
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def memory_budget():
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = MemoryBudget(AUDIO_MEMORY_BUDGET_MB * 1024 * 1024)
+    return _budget
+
+
+class RingBuffer:
+    """The most recent `capacity` values written, in a preallocated array."""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self._data = np.zeros(max(1, int(capacity)), dtype=dtype)
+        self._end = 0       # next write position
+        self.written = 0    # values ever written
+
+    def __len__(self):
+        return min(self.written, len(self._data))
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    @property
+    def overwritten(self):
+        return self.written - len(self)
+
+    def extend(self, values):
+        values = np.asarray(values)
+        capacity = len(self._data)
+        self.written += len(values)
+        if len(values) >= capacity:
+            self._data[:] = values[-capacity:]
+            self._end = 0
+            return
+        head = min(len(values), capacity - self._end)
+        self._data[self._end:self._end + head] = values[:head]
+        self._data[:len(values) - head] = values[head:]
+        self._end = (self._end + len(values)) % capacity
+
+    def values(self):
+        """Everything held, oldest first (a copy)."""
+        if self.written < len(self._data):
+            return self._data[:self._end].copy()
+        return np.concatenate([self._data[self._end:], self._data[:self._end]])
+
+
+class AudioRingBuffer:
+    """The most recent max_seconds of a float32 audio stream.
+
+    Stored as `dtype` at sr / downsample; audio() returns it as float32 at
+    that rate (self.sr).
+    """
+
+    def __init__(self, sr, max_seconds=SESSION_AUDIO_MAX_SECONDS, dtype=SESSION_AUDIO_DTYPE,
+                 downsample=SESSION_AUDIO_DOWNSAMPLE):
+        if dtype not in ("int16", "float32"):
+            raise ValueError(f"Unknown SESSION_AUDIO_DTYPE {dtype!r}")
+        self.downsample = max(1, int(downsample))
+        self.sr = sr // self.downsample
+        self._ring = RingBuffer(int(max_seconds * self.sr), dtype=dtype)
+        self._carry = np.zeros(0, dtype=np.float32)  # samples short of a full decimation block
+
+    @property
+    def nbytes(self):
+        return self._ring.nbytes
+
+    def __len__(self):
+        return len(self._ring)
+
+    def write(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.downsample > 1:
+            audio = np.concatenate([self._carry, audio])
+            usable = len(audio) - len(audio) % self.downsample
+            self._carry = audio[usable:]
+            audio = audio[:usable].reshape(-1, self.downsample).mean(axis=1)
+        if self._ring._data.dtype == np.int16:
+            audio = np.round(np.clip(audio, -1.0, 1.0) * _INT16_SCALE).astype(np.int16)
+        self._ring.extend(audio)
+
+    def audio(self):
+        stored = self._ring.values()
+        if stored.dtype == np.int16:
+            return stored.astype(np.float32) / _INT16_SCALE
+        return stored
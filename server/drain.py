@@ -0,0 +1,74 @@
+"""Graceful shutdown of a serving process.
+
+On SIGTERM (a deploy, or gunicorn recycling a worker) the process used to
+go down with whatever sessions it held, and a kid mid-sentence got nothing
+back. Drain instead:
+
+  * stops admitting: `start` is answered with busy / 'draining' (and
+    /health with 503) so clients and the load balancer go elsewhere;
+  * gives live sessions up to SHUTDOWN_DRAIN_SECONDS to finish on their
+    own;
+  * ends whatever is still running as a `stop` would, so what was scored so
+    far is still finalized and sent;
+  * waits up to SHUTDOWN_SETTLE_SECONDS more for those to wind down and for
+    pending work (prosody scoring) to report.
+
+gunicorn's graceful_timeout has to cover both (see gunicorn.conf.py).
+"""
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "20"))
+SHUTDOWN_SETTLE_SECONDS = float(os.environ.get("SHUTDOWN_SETTLE_SECONDS", "10"))
+
+
+class Drain:
+    """Winds a process's sessions down.
+
+    Args:
+        sessions: the session table (a session_table.SessionTable).
+        end: end(sid, session) — wind the session down as a stop would.
+        pending: returns how much other work (e.g. prosody jobs in flight)
+                 still has to report before the process can go.
+    """
+
+    def __init__(self, sessions, end, pending=lambda: 0, timeout=SHUTDOWN_DRAIN_SECONDS,
+                 settle=SHUTDOWN_SETTLE_SECONDS, clock=time.monotonic, sleep=time.sleep,
+                 poll=0.1):
+        self._sessions = sessions
+        self._end = end
+        self._pending = pending
+        self.timeout = timeout
+        self.settle = settle
+        self._clock = clock
+        self._sleep = sleep
+        self._poll = poll
+        self.draining = False
+
+    def run(self):
+        """Drain. Returns how many sessions finished on their own, were
+        ended, and were still there when the settle time ran out."""
+        self.draining = True
+        live = len(self._sessions)
+        logger.info("Draining %d live session(s)", live)
+        self._wait(self.timeout)
+        left = self._sessions.items()
+        for sid, session in left:
+            try:
+                self._end(sid, session)
+            except Exception:
+                logger.exception("Ending session %s for shutdown failed", sid)
+        self._wait(self.settle)
+        abandoned = len(self._sessions)
+        if abandoned:
+            logger.warning("Shutting down with %d session(s) still live", abandoned)
+        return {"finished": live - len(left), "ended": len(left) - abandoned,
+                "abandoned": abandoned}
+
+    def _wait(self, seconds):
+        deadline = self._clock() + seconds
+        while (len(self._sessions) or self._pending()) and self._clock() < deadline:
+            self._sleep(self._poll)
@@ -0,0 +1,261 @@
+"""Incremental CTC forced alignment over the reference phonemes.
+
+The greedy aligner (stream_decode_util.StreamingAligner) commits to each
+decoded phoneme as it sees it, looking at most three reference phonemes
+ahead; when a chunk confuses it the pointer can drift for the rest of the
+sentence. ForcedAligner instead keeps a CTC Viterbi lattice over the whole
+reference — the standard blank / phoneme / blank ... topology, plus
+penalized transitions that skip up to ALIGNMENT_MAX_SKIP phonemes so a child
+leaving one out doesn't derail everything after it — and advances it one
+frame at a time as chunks arrive. Each frame is a handful of NumPy ops over
+the (states,) vector, so cost grows with sentence length, not with Python
+work per phoneme.
+
+Events for a reference phoneme are emitted once the best path has moved
+ALIGNMENT_SETTLE_PHONEMES past it (and for everything the path reached at
+finish()), scored at the frame where the path's evidence for it peaks, in
+the same schema stream_decode_logits yields.
+
+Pick the engine with ALIGNMENT_ENGINE=greedy (default) or viterbi.
+"""
+import os
+
+import numpy as np
+
+from phoneme_vocab import normalize, phoneme_vocab
+from stream_decode_util import (R_COLORED_VOWEL, AlignmentEvent, StreamingAligner, _top3_mask,
+                                gop_score)
+
+ALIGNMENT_ENGINE = os.environ.get("ALIGNMENT_ENGINE", "greedy")
+# Log-probability cost of each reference phoneme the path skips.
+ALIGNMENT_SKIP_PENALTY = float(os.environ.get("ALIGNMENT_SKIP_PENALTY", "8.0"))
+ALIGNMENT_MAX_SKIP = int(os.environ.get("ALIGNMENT_MAX_SKIP", "3"))
+# How far the best path must be past a phoneme before it's reported.
+ALIGNMENT_SETTLE_PHONEMES = int(os.environ.get("ALIGNMENT_SETTLE_PHONEMES", "2"))
+
+# Emission floor for phonemes the model has no token for, so the lattice
+# stays finite and simply skips them.
+_LOG_FLOOR = -1e4
+
+
+def make_aligner(reference_phonemes, tokenizer, engine=None):
+    """A feed()/finish() aligner for the configured ALIGNMENT_ENGINE."""
+    engine = engine or ALIGNMENT_ENGINE
+    if engine == "viterbi":
+        return ForcedAligner(reference_phonemes, tokenizer)
+    if engine == "greedy":
+        return StreamingAligner(reference_phonemes, tokenizer)
+    raise ValueError(f"Unknown ALIGNMENT_ENGINE {engine!r}")
+
+
+def _log_softmax(rows):
+    peak = rows.max(axis=1, keepdims=True)
+    peak[~np.isfinite(peak)] = 0.0
+    return rows - (peak + np.log(np.exp(rows - peak).sum(axis=1, keepdims=True)))
+
+
+class ForcedAligner:
+    """Drop-in alternative to StreamingAligner: feed(logits) -> events,
+    finish() -> events, done once every reference phoneme is reported."""
+
+    logit_threshold = StreamingAligner.logit_threshold
+
+    def __init__(self, reference_phonemes, tokenizer, skip_penalty=ALIGNMENT_SKIP_PENALTY,
+                 max_skip=ALIGNMENT_MAX_SKIP, settle=ALIGNMENT_SETTLE_PHONEMES):
+        self.reference_phonemes = [p for p in reference_phonemes if p != "ˈ"]
+        self.vocab = phoneme_vocab(tokenizer)
+        self.ref_norm = [normalize(p) for p in self.reference_phonemes]
+        self.ref_nid = np.array([self.vocab.norm_index.get(p, -1) for p in self.ref_norm],
+                                dtype=np.intp)
+        self.blank_id = tokenizer.pad_token_id
+        self.skip_penalty = skip_penalty
+        self.settle = settle
+        n = len(self.reference_phonemes)
+        # States: 0 = leading blank, 2k+1 = phoneme k, 2k+2 = blank after it.
+        self.num_states = 2 * n + 1
+        self._accept = self._accepted_groups()
+        # (n, widest) group columns per reference phoneme, padded with the
+        # floor column len(groups).
+        width = max((len(a) for a in self._accept), default=0) or 1
+        self._accept_cols = np.full((n, width), len(self.vocab.norm_names), dtype=np.intp)
+        for k, groups in enumerate(self._accept):
+            self._accept_cols[k, :len(groups)] = groups
+        self._build_transitions(skip_penalty, max_skip)
+
+        self._alpha = np.full(self.num_states, -np.inf)
+        self._alpha[0] = 0.0
+        self._backptr = []     # (frames, states) per chunk
+        self._label_lp = []    # (frames, n) per chunk
+        self._group_max = []   # (frames, groups) per chunk
+        self._group_top3 = []  # (frames, groups) per chunk
+        self.reported = 0
+
+    @property
+    def done(self):
+        return self.reported >= len(self.reference_phonemes)
+
+    def _accepted_groups(self):
+        """Normalized groups each reference phoneme can be emitted as: its
+        own, plus the r-coloring equivalences the greedy aligner credits —
+        ɝ for a vowel followed by "r" and for that "r", and "r" for a
+        reference ɝ said as a split vowel + r."""
+        r_colored = self.vocab.norm_index.get(R_COLORED_VOWEL, -1)
+        r = self.vocab.norm_index.get("r", -1)
+        accept = [[nid] if nid >= 0 else [] for nid in self.ref_nid.tolist()]
+        for k, phoneme in enumerate(self.ref_norm):
+            if phoneme == R_COLORED_VOWEL and r >= 0:
+                accept[k].append(r)
+            elif (r_colored >= 0 and k + 1 < len(self.ref_norm)
+                    and self.ref_norm[k + 1] == "r"):
+                accept[k].append(r_colored)
+                accept[k + 1].append(r_colored)
+        return accept
+
+    def _build_transitions(self, skip_penalty, max_skip):
+        """(offsets, penalty) so that state s may be entered from s - d for
+        each offset d at the matching penalty (-inf where not allowed)."""
+        S = self.num_states
+        states = np.arange(S)
+        is_label = states % 2 == 1
+        offsets = [0, 1, 2]
+        penalties = [np.zeros(S), np.where(states >= 1, 0.0, -np.inf)]
+        # Phoneme to phoneme without a blank, unless they're the same token.
+        same_as_prev = np.zeros(S, dtype=bool)
+        nid = self.ref_nid
+        same_as_prev[3::2] = (nid[1:] == nid[:-1]) & (nid[1:] >= 0)
+        penalties.append(np.where(is_label & (states >= 3) & ~same_as_prev, 0.0, -np.inf))
+        for k in range(1, max_skip + 1):
+            # Into phoneme n skipping k: from phoneme n-1-k or the blank after it.
+            for d in (2 + 2 * k, 1 + 2 * k):
+                offsets.append(d)
+                penalties.append(np.where(is_label & (states >= d), -k * skip_penalty, -np.inf))
+        self._offsets = np.array(offsets)
+        self._sources = states[np.newaxis, :] - self._offsets[:, np.newaxis]
+        self._penalty = np.stack(penalties)
+        self._sources[self._penalty == -np.inf] = 0
+        self._states = states
+
+    def feed(self, logits):
+        if self.done:
+            return []
+        logits = np.asarray(logits, dtype=np.float32)
+        if len(logits):
+            self._advance(logits)
+        return self._report(final=False)
+
+    def finish(self):
+        if self.done:
+            return []
+        return self._report(final=True)
+
+    def _advance(self, logits):
+        vocab = self.vocab
+        log_probs = _log_softmax(logits)
+        cols, starts = vocab.group_cols, vocab.group_starts
+        group_lp = np.maximum.reduceat(log_probs[:, cols], starts, axis=1)
+        # Extra floor column for the padding in _accept_cols.
+        group_lp = np.concatenate([group_lp, np.full((len(logits), 1), _LOG_FLOOR)], axis=1)
+        label_lp = np.maximum(group_lp[:, self._accept_cols].max(axis=2), _LOG_FLOOR)
+        blank_lp = np.maximum(log_probs[:, self.blank_id], _LOG_FLOOR)
+
+        emit = np.empty((len(logits), self.num_states))
+        emit[:, 0::2] = blank_lp[:, np.newaxis]
+        emit[:, 1::2] = label_lp
+
+        backptr = np.empty((len(logits), self.num_states), dtype=np.int32)
+        alpha, sources, penalty, states = self._alpha, self._sources, self._penalty, self._states
+        for t in range(len(logits)):
+            candidates = alpha[sources] + penalty
+            best = candidates.argmax(axis=0)
+            backptr[t] = states - self._offsets[best]
+            alpha = candidates[best, states] + emit[t]
+        self._alpha = alpha
+
+        self._backptr.append(backptr)
+        self._label_lp.append(label_lp)
+        self._group_max.append(np.maximum.reduceat(logits[:, cols], starts, axis=1))
+        self._group_top3.append(np.logical_or.reduceat(_top3_mask(logits)[:, cols], starts, axis=1))
+
+    def _end_state(self, final):
+        """Where the best path ends now. At end of stream, a path through
+        the whole reference wins unless stopping early is more than one skip
+        penalty likelier — ties otherwise go to the earlier state."""
+        alpha = self._alpha
+        best = int(alpha.argmax())
+        if final and self.num_states > 1:
+            # Ending on the last phoneme or the blank after it.
+            end = self.num_states - 2 if alpha[-2] > alpha[-1] else self.num_states - 1
+            if alpha[end] >= alpha[best] - self.skip_penalty:
+                return end
+        return best
+
+    def _best_path(self, final):
+        """State at every frame along the best path ending now."""
+        backptr = np.concatenate(self._backptr)
+        path = np.empty(len(backptr), dtype=np.intp)
+        s = self._end_state(final)
+        for t in range(len(backptr) - 1, -1, -1):
+            path[t] = s
+            s = backptr[t, s]
+        return path
+
+    def _report(self, final):
+        if not self._backptr:
+            return []
+        path = self._best_path(final)
+        # Last phoneme the path has reached (-1 while still in the leading blank).
+        reached = (int(path[-1]) - 1) // 2
+        upto = reached + 1 if final else reached + 1 - self.settle
+        if upto <= self.reported:
+            return []
+        label_lp = np.concatenate(self._label_lp)
+        group_max = np.concatenate(self._group_max)
+        group_top3 = np.concatenate(self._group_top3)
+        events = []
+        for pos in range(self.reported, upto):
+            frames = np.flatnonzero(path == 2 * pos + 1)
+            if not len(frames):
+                events.append(_omitted(self.reference_phonemes[pos], pos))
+                continue
+            frame = frames[label_lp[frames, pos].argmax()]
+            events.append(self._scored(pos, group_max[frame], group_top3[frame]))
+        self.reported = upto
+        return events
+
+    def _scored(self, pos, group_max, group_top3):
+        nid = int(self.ref_nid[pos])
+        target_p = self.ref_norm[pos]
+        decoded_nid = int(group_max.argmax())
+        decoded = self.vocab.norm_names[decoded_nid]
+        lv = group_max[decoded_nid]
+        target_lv = float(group_max[nid]) if nid >= 0 else float("nan")
+        if (decoded == target_p or decoded_nid in self._accept[pos]
+                or (nid >= 0 and (target_lv > self.logit_threshold or group_top3[nid]))):
+            label = "correct"
+        else:
+            label = "mispronounced"
+        gop = gop_score(target_lv, float(lv))
+        score = 1.0 if label == "correct" else (gop if gop is not None else 0.5)
+        return AlignmentEvent(
+            phoneme=self.reference_phonemes[pos],
+            position=pos,
+            label=label,
+            decoded=decoded,
+            target_logit=target_lv,
+            decoded_logit=lv,
+            gop=gop,
+            score=score,
+        )
+
+
+def _omitted(phoneme, pos):
+    return AlignmentEvent(
+        phoneme=phoneme,
+        position=pos,
+        label="omitted",
+        decoded="",
+        target_logit=float("nan"),
+        decoded_logit=float("nan"),
+        gop=0.0,
+        score=0.0,
+    )
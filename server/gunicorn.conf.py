@@ -0,0 +1,70 @@
+"""Production server: gunicorn with gevent workers.
+
+    cd server && gunicorn main:app
+
+(gunicorn picks this file up from the working directory.) `python main.py`
+stays the development server.
+
+  * Each worker is one gevent process: every connection is a greenlet, so
+    idle clients cost no OS thread, while inference and alignment run on
+    the session pool's native threads (see runtime). WebSockets are served
+    by the gevent worker through simple-websocket.
+  * The app is imported once in the master (preload_app), which loads the
+    model weights before forking, so workers share one copy of them. Pools,
+    threads and background tasks start in each worker after the fork
+    (main.start_workers()).
+  * SIGTERM drains the worker: new sessions are refused, live ones are
+    given SHUTDOWN_DRAIN_SECONDS to finish and then ended with their
+    results delivered (see drain). graceful_timeout covers that.
+
+GUNICORN_WORKERS above 1 needs every client on the websocket transport
+(polling requests of one client would hit different workers) and
+SOCKETIO_MESSAGE_QUEUE set so the workers can emit to each other's clients
+(see session_router). The worker and connection counts below are
+unvalidated starting defaults, not benchmark results; see the README's
+"Production server" section for how to size them with scripts/bench_load.py.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SOCKETIO_ASYNC_MODE", "gevent")
+os.environ["PRELOAD_BEFORE_FORK"] = "1"
+
+from runtime import patch  # noqa: E402
+
+# Patch the master before the app (and everything it imports) loads.
+patch(os.environ["SOCKETIO_ASYNC_MODE"])
+
+from drain import SHUTDOWN_DRAIN_SECONDS, SHUTDOWN_SETTLE_SECONDS  # noqa: E402
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+worker_class = "gevent" if os.environ["SOCKETIO_ASYNC_MODE"] == "gevent" else "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+# Connections (greenlets) one worker holds open at once.
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "2000"))
+# SOCKETIO_ASYNC_MODE=threading only: one thread per connection.
+threads = int(os.environ.get("GUNICORN_THREADS", "100"))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(SHUTDOWN_DRAIN_SECONDS + SHUTDOWN_SETTLE_SECONDS) + 5
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    import main
+
+    main.start_workers()
+
+    # The worker installs its SIGTERM handler after this hook, from this
+    # attribute: drain, then stop accepting as usual.
+    stop = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        main.start_drain()
+        stop(sig, frame)
+
+    worker.handle_exit = handle_exit
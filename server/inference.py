@@ -0,0 +1,389 @@
+"""Server-side wav2vec2 inference backends for audio-mode sessions.
+
+Clients that can't run the model on-device stream raw PCM, and the server
+turns each chunk into CTC logits for stream_decode_logits. Which runtime does
+that is picked with INFERENCE_BACKEND:
+
+    torch  (default) – Wav2Vec2ForCTC through PyTorch, fp32.
+    torch-optimized  – PyTorch under inference_mode with the Linear layers
+                       dynamically quantized to int8, an explicit thread
+                       budget (INFERENCE_INTRA_OP_THREADS /
+                       INFERENCE_INTER_OP_THREADS) and, with
+                       INFERENCE_TORCH_COMPILE=1, torch.compile.
+    onnx             – the same checkpoint through onnxruntime on CPU, using
+                       the files scripts/export_wav2vec2_onnx.py produces.
+                       ONNX_QUANTIZED=1 (default) picks model_quantized.onnx
+                       (int8), ONNX_QUANTIZED=0 picks model.onnx (fp32).
+
+Every backend exposes the same infer(chunk) -> (frames, vocab) float32 array,
+so the alignment code never needs to know which runtime produced the logits.
+
+With INFERENCE_BATCH_MAX > 1 the backend is wrapped in a BatchingBackend: a
+single scheduler thread collects chunks from every live session for up to
+INFERENCE_BATCH_WAIT_MS, pads them into one batch, runs one forward pass and
+hands each session back its own slice of the logits.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from runtime import native_executor, start_native_thread
+
+logger = logging.getLogger("inference")
+
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+INFERENCE_BATCH_MAX = int(os.environ.get("INFERENCE_BATCH_MAX", "1"))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", "10"))
+
+# torch-optimized engine settings.
+INFERENCE_QUANTIZE = os.environ.get("INFERENCE_QUANTIZE", "1") != "0"
+INFERENCE_TORCH_COMPILE = os.environ.get("INFERENCE_TORCH_COMPILE", "0") == "1"
+INFERENCE_INTRA_OP_THREADS = int(os.environ.get("INFERENCE_INTRA_OP_THREADS", str(os.cpu_count() or 1)))
+# wav2vec2's forward pass has no independent ops for inter-op threads to run.
+INFERENCE_INTER_OP_THREADS = int(os.environ.get("INFERENCE_INTER_OP_THREADS", "1"))
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_ONNX_MODEL_DIR = (_REPO_ROOT / "talky-app" / "public" / "models"
+                          / "wav2vec2-xls-r-300m-timit-phoneme" / "onnx")
+ONNX_MODEL_DIR = Path(os.environ.get("ONNX_MODEL_DIR", DEFAULT_ONNX_MODEL_DIR))
+ONNX_QUANTIZED = os.environ.get("ONNX_QUANTIZED", "1") != "0"
+# 0 lets onnxruntime pick (one thread per physical core).
+ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0"))
+
+
+# wav2vec2's convolutional feature encoder (identical across base/large/xls-r):
+# each layer maps L samples/frames to floor((L - kernel) / stride) + 1.
+_CONV_KERNELS = (10, 3, 3, 3, 3, 2, 2)
+_CONV_STRIDES = (5, 2, 2, 2, 2, 2, 2)
+
+
+def frames_for_samples(num_samples):
+    """Number of logit frames wav2vec2 emits for num_samples of audio."""
+    length = int(num_samples)
+    for kernel, stride in zip(_CONV_KERNELS, _CONV_STRIDES):
+        if length < kernel:
+            return 0
+        length = (length - kernel) // stride + 1
+    return length
+
+
+class InferenceBackend:
+    """Runs wav2vec2 on one mono float32 chunk and returns its CTC logits as a
+    (frames, vocab) float32 numpy array in the tokenizer's vocab order."""
+
+    name = None
+    device = "cpu"
+    # How many infer/infer_batch calls the backend can usefully run at once.
+    concurrency = 1
+
+    def __init__(self, processor, sample_rate=16000):
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    @property
+    def vocab_size(self):
+        return len(self.processor.tokenizer)
+
+    def infer(self, chunk):
+        raise NotImplementedError
+
+    def infer_batch(self, chunks):
+        """Logits for several chunks at once, one (frames, vocab) array per
+        chunk. Backends that can pad into a single forward pass override this."""
+        return [self.infer(chunk) for chunk in chunks]
+
+    def _split_batch(self, logits, chunks):
+        # Padded positions produce trailing frames that belong to no chunk.
+        return [logits[i, :frames_for_samples(len(chunk))] for i, chunk in enumerate(chunks)]
+
+
+class TorchBackend(InferenceBackend):
+    name = "torch"
+
+    def __init__(self, processor, model, device="cpu", sample_rate=16000):
+        super().__init__(processor, sample_rate)
+        self.model = model
+        self.device = device
+
+    @property
+    def vocab_size(self):
+        return max(self.model.config.vocab_size, len(self.processor.tokenizer))
+
+    def infer(self, chunk):
+        import torch
+
+        inputs = self.processor(chunk, sampling_rate=self.sample_rate,
+                                return_tensors="pt", padding=True).to(self.device)
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return logits[0].cpu().numpy()
+
+    def infer_batch(self, chunks):
+        import torch
+
+        inputs = self.processor(list(chunks), sampling_rate=self.sample_rate,
+                                return_tensors="pt", padding=True).to(self.device)
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return self._split_batch(logits.cpu().numpy(), chunks)
+
+
+class OptimizedTorchBackend(TorchBackend):
+    """fp32 checkpoint, tuned for CPU-only nodes: Linear layers (the bulk of
+    the transformer's FLOPs) dynamically quantized to int8, inference_mode
+    instead of no_grad, and a fixed thread budget instead of torch's default
+    of one intra-op thread per core for every concurrent caller.
+
+    Must keep passing the alignment-label accuracy gate in
+    tests/unit/test_inference_backends.py against the plain fp32 backend.
+    """
+
+    name = "torch-optimized"
+
+    def __init__(self, processor, model, device="cpu", sample_rate=16000,
+                 quantize=INFERENCE_QUANTIZE, compile_model=INFERENCE_TORCH_COMPILE,
+                 intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+                 inter_op_threads=INFERENCE_INTER_OP_THREADS):
+        import torch
+
+        apply_thread_budget(intra_op_threads, inter_op_threads)
+        if quantize and device == "cpu":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear},
+                                                           dtype=torch.qint8)
+        if compile_model:
+            try:
+                model = torch.compile(model)
+            except Exception:
+                logger.exception("torch.compile failed, running the model eagerly")
+        super().__init__(processor, model, device, sample_rate)
+
+    def infer(self, chunk):
+        import torch
+
+        inputs = self.processor(chunk, sampling_rate=self.sample_rate,
+                                return_tensors="pt", padding=True).to(self.device)
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return logits[0].cpu().numpy()
+
+    def infer_batch(self, chunks):
+        import torch
+
+        inputs = self.processor(list(chunks), sampling_rate=self.sample_rate,
+                                return_tensors="pt", padding=True).to(self.device)
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return self._split_batch(logits.cpu().numpy(), chunks)
+
+
+def apply_thread_budget(intra_op_threads, inter_op_threads=None):
+    """Pin torch's intra-op (and, once per process, inter-op) thread counts."""
+    import torch
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Can only be set before the first parallel op in this process.
+            pass
+
+
+class OnnxBackend(InferenceBackend):
+    """Same checkpoint through onnxruntime's CPU execution provider. The graph
+    takes the processor's normalized input_values, so feature extraction is
+    shared with the torch path and the logit columns line up with the vocab."""
+
+    name = "onnx"
+
+    def __init__(self, processor, model_path, intra_op_threads=ONNX_INTRA_OP_THREADS,
+                 sample_rate=16000):
+        super().__init__(processor, sample_rate)
+        self.model_path = Path(model_path)
+        self.intra_op_threads = intra_op_threads
+        self._session = None
+        self._session_pid = None
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._output_name = self.session.get_outputs()[0].name
+
+    @property
+    def session(self):
+        # onnxruntime's thread pool doesn't survive fork(), so a process-pool
+        # worker (inference_pool.py) opens its own session on first use.
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+            self._session = ort.InferenceSession(str(self.model_path), options,
+                                                 providers=["CPUExecutionProvider"])
+            self._session_pid = os.getpid()
+        return self._session
+
+    @property
+    def vocab_size(self):
+        width = self.session.get_outputs()[0].shape[-1]
+        return width if isinstance(width, int) else super().vocab_size
+
+    def _run(self, audio):
+        inputs = self.processor(audio, sampling_rate=self.sample_rate,
+                                return_tensors="np", padding=True)
+        feeds = {"input_values": np.asarray(inputs["input_values"], dtype=np.float32)}
+        if "attention_mask" in self._input_names and "attention_mask" in inputs:
+            feeds["attention_mask"] = np.asarray(inputs["attention_mask"], dtype=np.int64)
+        return self.session.run([self._output_name], feeds)[0]
+
+    def infer(self, chunk):
+        return self._run(chunk)[0]
+
+    def infer_batch(self, chunks):
+        # Without an attention_mask input the padding is visible to the
+        # transformer layers, so short chunks in a mixed batch drift slightly
+        # from their unbatched logits. The frontend's fixed-size chunks keep
+        # that padding to the final chunk of each sentence.
+        return self._split_batch(self._run(list(chunks)), chunks)
+
+
+class BatchingBackend(InferenceBackend):
+    """Cross-session micro-batching in front of another backend.
+
+    infer() is called from many session threads at once; each call parks its
+    chunk on a shared queue and blocks on a Future. One scheduler thread takes
+    the first pending chunk, keeps collecting until max_batch_size chunks are
+    waiting or max_wait_ms has passed, and runs them through the wrapped
+    backend's infer_batch as a single forward pass. When the wrapped backend
+    can run several batches at once (a PoolBackend), the scheduler waits for
+    a free worker before collecting the next batch, so chunks that arrive
+    while every worker is busy pile up into a fuller batch.
+
+    The scheduler and the batch runners are native threads (see runtime):
+    under gevent a batched forward pass on a greenlet would stall every
+    socket in the process. Its callers, the session pumps, are native
+    threads too, so every handoff here is between OS threads.
+    """
+
+    def __init__(self, inner, max_batch_size=INFERENCE_BATCH_MAX,
+                 max_wait_ms=INFERENCE_BATCH_WAIT_MS):
+        super().__init__(inner.processor, inner.sample_rate)
+        self.inner = inner
+        self.name = inner.name
+        self.device = inner.device
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.concurrency = inner.concurrency
+        self.batches = 0
+        self.chunks = 0
+        self._pending = queue.Queue()
+        self._free = threading.Semaphore(self.concurrency)
+        self._executor = (native_executor(self.concurrency, thread_name_prefix="inference-batch")
+                          if self.concurrency > 1 else None)
+        start_native_thread(self._loop, name="inference-batcher")
+
+    def infer(self, chunk):
+        return self.submit(chunk).result()
+
+    def infer_batch(self, chunks):
+        futures = [self.submit(chunk) for chunk in chunks]
+        return [f.result() for f in futures]
+
+    def submit(self, chunk):
+        future = Future()
+        self._pending.put((chunk, future))
+        return future
+
+    def _collect(self):
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if remaining > 0
+                             else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            self._free.acquire()
+            batch = self._collect()
+            if self._executor is None:
+                self._run(batch)
+            else:
+                self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        try:
+            chunks = [chunk for chunk, _ in batch]
+            try:
+                results = self.inner.infer_batch(chunks)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                return
+            self.batches += 1
+            self.chunks += len(batch)
+            for (_, future), logits in zip(batch, results):
+                future.set_result(logits)
+        finally:
+            self._free.release()
+
+
+def onnx_model_path(model_dir=None, quantized=None):
+    model_dir = Path(model_dir) if model_dir is not None else ONNX_MODEL_DIR
+    quantized = ONNX_QUANTIZED if quantized is None else quantized
+    return model_dir / ("model_quantized.onnx" if quantized else "model.onnx")
+
+
+def load_runtime_backend(processor, model_id, name=None):
+    """Just the model: no worker processes or batching threads, so it's safe
+    to load in a parent before fork() and hand to load_backend() in each
+    child."""
+    name = name or INFERENCE_BACKEND
+    if name == "onnx":
+        path = onnx_model_path()
+        if not path.exists():
+            raise FileNotFoundError(
+                f"{path} not found — run scripts/export_wav2vec2_onnx.py or set ONNX_MODEL_DIR")
+        return OnnxBackend(processor, path)
+    if name not in ("torch", "torch-optimized"):
+        raise ValueError(f"Unknown INFERENCE_BACKEND {name!r}")
+
+    import torch
+    from transformers import Wav2Vec2ForCTC
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = Wav2Vec2ForCTC.from_pretrained(model_id).eval()
+    model.to(device)
+    if name == "torch-optimized":
+        return OptimizedTorchBackend(processor, model, device)
+    return TorchBackend(processor, model, device)
+
+
+def load_backend(processor, model_id, name=None, batch_max=None, workers=None, runtime=None):
+    """Build the backend named by INFERENCE_BACKEND (or `name`). The torch
+    checkpoint is only downloaded/loaded for the torch backend — an onnx
+    deployment never pays its ~1.2 GB of resident weights.
+
+    INFERENCE_WORKERS > 0 forks the loaded backend into a process pool (see
+    inference_pool.py); batching, when enabled, sits in front of the pool.
+    `runtime` is a backend already loaded by load_runtime_backend()."""
+    from inference_pool import INFERENCE_WORKERS, PoolBackend
+
+    backend = runtime or load_runtime_backend(processor, model_id, name)
+    workers = INFERENCE_WORKERS if workers is None else workers
+    if workers > 0:
+        backend = PoolBackend(backend, workers=workers)
+    batch_max = INFERENCE_BATCH_MAX if batch_max is None else batch_max
+    if batch_max > 1:
+        backend = BatchingBackend(backend, max_batch_size=batch_max)
+    return backend
@@ -0,0 +1,222 @@
+"""Process-pool inference: N worker processes sharing one copy of the weights.
+
+A single Python process can't use more than about one core's worth of the
+GIL, and many session threads all calling into torch fight over the same
+intra-op thread pool. With INFERENCE_WORKERS=N the loaded backend is forked
+into N worker processes instead:
+
+  * The model is loaded once in the parent. Torch parameters are moved into
+    shared memory (model.share_memory()) before the fork, so the ~1.2 GB
+    xls-r-300m checkpoint exists once no matter how many workers run — page
+    touches in a worker can't trigger a copy-on-write duplicate.
+  * Each worker owns a pair of fixed-size shared-memory buffers created before
+    the fork: the parent writes the batch's audio into one, the worker writes
+    the logits into the other, and only the chunk lengths/shapes go over the
+    worker's pipe.
+  * Each worker runs with its own INFERENCE_WORKER_THREADS intra-op budget,
+    so N workers x threads stays within the machine's cores.
+
+The onnx backend can't share a session across fork(), so its workers each
+open their own onnxruntime session from the model file — one copy of the
+weights per worker, but the int8 model is a quarter of the fp32 size.
+
+Linux only (relies on the fork start method). Forking copies only the
+calling thread, along with any lock another thread happened to hold, so the
+pool has to be built before the process starts other threads: main builds
+it in start_workers(), next to the prosody pool. A worker that dies is
+re-forked on the spot; that one late fork is the exception.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference import InferenceBackend
+
+logger = logging.getLogger("inference_pool")
+
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.environ.get(
+    "INFERENCE_WORKER_THREADS",
+    str(max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS))),
+))
+# Largest batch (in seconds of audio) one worker round-trip can carry.
+INFERENCE_POOL_SLOT_SECONDS = float(os.environ.get("INFERENCE_POOL_SLOT_SECONDS", "30"))
+
+# wav2vec2 emits one frame per 320 samples (20 ms at 16 kHz), never more.
+_SAMPLES_PER_FRAME = 320
+
+
+def _set_thread_budget(threads):
+    try:
+        from inference import apply_thread_budget
+        apply_thread_budget(threads)
+    except ImportError:
+        pass
+
+
+def _worker_main(backend, audio_shm, logits_shm, conn, threads):
+    if threads:
+        _set_thread_budget(threads)
+    audio = np.ndarray((audio_shm.size // 4,), dtype=np.float32, buffer=audio_shm.buf)
+    logits = np.ndarray((logits_shm.size // 4,), dtype=np.float32, buffer=logits_shm.buf)
+    while True:
+        try:
+            lengths = conn.recv()
+        except EOFError:
+            break
+        if lengths is None:
+            break
+        try:
+            bounds = np.cumsum([0] + lengths)
+            chunks = [audio[start:end] for start, end in zip(bounds, bounds[1:])]
+            shapes, pos = [], 0
+            for result in backend.infer_batch(chunks):
+                result = np.asarray(result, dtype=np.float32)
+                logits[pos:pos + result.size] = result.ravel()
+                pos += result.size
+                shapes.append(result.shape)
+            conn.send(("ok", shapes))
+        except Exception as exc:  # noqa: BLE001 - reported back to the caller
+            conn.send(("error", repr(exc)))
+
+
+class _Worker:
+    def __init__(self, ctx, backend, audio_samples, logits_values, threads):
+        self.audio_shm = shared_memory.SharedMemory(create=True, size=audio_samples * 4)
+        self.logits_shm = shared_memory.SharedMemory(create=True, size=logits_values * 4)
+        self.audio = np.ndarray((audio_samples,), dtype=np.float32, buffer=self.audio_shm.buf)
+        self.logits = np.ndarray((logits_values,), dtype=np.float32, buffer=self.logits_shm.buf)
+        self._ctx = ctx
+        self._backend = backend
+        self._threads = threads
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._backend, self.audio_shm, self.logits_shm, child_conn, self._threads),
+            name="inference-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def run(self, chunks):
+        pos = 0
+        for chunk in chunks:
+            self.audio[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        self.conn.send([len(chunk) for chunk in chunks])
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"inference worker failed: {payload}")
+        out, pos = [], 0
+        for shape in payload:
+            size = shape[0] * shape[1]
+            out.append(self.logits[pos:pos + size].reshape(shape).copy())
+            pos += size
+        return out
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def release(self):
+        self.audio_shm.close()
+        self.audio_shm.unlink()
+        self.logits_shm.close()
+        self.logits_shm.unlink()
+
+
+class PoolBackend(InferenceBackend):
+    """Dispatches infer/infer_batch calls to whichever worker process is idle.
+
+    Calls block while every worker is busy. `concurrency` tells a
+    BatchingBackend in front of the pool how many batches may be in flight.
+    """
+
+    def __init__(self, inner, workers=INFERENCE_WORKERS, threads=INFERENCE_WORKER_THREADS,
+                 slot_seconds=INFERENCE_POOL_SLOT_SECONDS):
+        super().__init__(inner.processor, inner.sample_rate)
+        self.inner = inner
+        self.name = inner.name
+        self.device = inner.device
+        self.concurrency = max(1, int(workers))
+        self.capacity = int(slot_seconds * inner.sample_rate)
+
+        model = getattr(inner, "model", None)
+        if model is not None and hasattr(model, "share_memory"):
+            model.share_memory()
+        if getattr(inner, "intra_op_threads", None) == 0:
+            inner.intra_op_threads = threads
+
+        ctx = multiprocessing.get_context("fork")
+        logits_values = (self.capacity // _SAMPLES_PER_FRAME + 1) * inner.vocab_size
+        self._workers = [_Worker(ctx, inner, self.capacity, logits_values, threads)
+                         for _ in range(self.concurrency)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def infer(self, chunk):
+        return self.infer_batch([chunk])[0]
+
+    def infer_batch(self, chunks):
+        results = []
+        for group in self._groups(chunks):
+            results.extend(self._dispatch(group))
+        return results
+
+    def _groups(self, chunks):
+        """Split a batch into runs that fit one worker's audio buffer."""
+        group, size = [], 0
+        for chunk in chunks:
+            if len(chunk) > self.capacity:
+                raise ValueError(f"chunk of {len(chunk)} samples exceeds the "
+                                 f"{self.capacity}-sample inference worker buffer "
+                                 f"(INFERENCE_POOL_SLOT_SECONDS)")
+            if group and size + len(chunk) > self.capacity:
+                yield group
+                group, size = [], 0
+            group.append(chunk)
+            size += len(chunk)
+        if group:
+            yield group
+
+    def _dispatch(self, chunks):
+        worker = self._idle.get()
+        try:
+            return worker.run(chunks)
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            logger.error("Inference worker %s died, restarting it", worker.process.pid)
+            worker.process.join(timeout=1)
+            worker.start()
+            raise RuntimeError("inference worker died mid-batch")
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            worker.stop()
+            worker.release()
@@ -0,0 +1,130 @@
+"""Push-driven live scoring sessions on a shared worker pool.
+
+Each session used to own a thread parked in chunk_queue.get() for as long as
+the client stayed connected, so connection count was capped by how many
+threads the box could hold. LiveSession instead runs only when there's
+work: the socket handler puts a chunk on the session's queue and calls
+schedule(), which submits one pump to a shared executor unless a pump for
+that session is already queued or running. The pump drains whatever is
+queued — inference for audio sessions, then the aligner's feed() — and
+returns its worker to the pool. At most one pump per session runs at a
+time, so chunks are always aligned in order.
+"""
+import logging
+import os
+import queue
+import threading
+
+from runtime import native_executor
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by every live session. A pump holds one only while
+# it's aligning (or waiting on inference for) queued chunks. They're OS
+# threads under every SOCKETIO_ASYNC_MODE (see runtime), so inference never
+# runs on the event loop.
+SESSION_WORKERS = int(os.environ.get("SESSION_WORKERS", "32"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def session_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = native_executor(SESSION_WORKERS, thread_name_prefix="session")
+    return _executor
+
+
+class LiveSession:
+    """Aligns one session's queued chunks on the shared executor.
+
+    Args:
+        chunk_queue: the session's BoundedChunkQueue; None ends the stream.
+        start: called once, on a worker, before the first chunk. Returns
+               (aligner, to_logits): a feed()/finish() aligner (see
+               forced_align.make_aligner) and a callable turning a queued
+               item into (frames, vocab) logits (an AudioLogitsStream's push
+               for audio sessions, identity for logits sessions). Loading
+               the model here keeps it off the socket handler.
+        on_events: called with each non-empty list of aligner events.
+        on_end: called once when the stream ends, alignment fails or the
+                session is aborted.
+    """
+
+    def __init__(self, chunk_queue, start, on_events, on_end, executor=None):
+        self.queue = chunk_queue
+        self._start = start
+        self._on_events = on_events
+        self._on_end = on_end
+        self._executor = executor
+        self._aligner = None
+        self._to_logits = None
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self.ended = False
+
+    def schedule(self):
+        """Make sure a pump will see everything queued so far. Call after
+        every put()."""
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        (self._executor or session_executor()).submit(self._pump)
+
+    def _pump(self):
+        while True:
+            try:
+                item = self.queue.get(block=False)
+            except queue.Empty:
+                with self._lock:
+                    # A put() that lands after this check sees _scheduled
+                    # cleared and schedules a fresh pump.
+                    if not self.queue.qsize():
+                        self._scheduled = False
+                        return
+                continue
+            if self.ended:
+                continue
+            try:
+                if item is None:
+                    events = self._aligner.finish() if self._aligner else []
+                else:
+                    events = self._feed(item)
+                if events:
+                    self._on_events(events)
+            except Exception:
+                logger.exception("Stream decode failed")
+                item = None
+            if item is None:
+                self._end()
+
+    def _feed(self, item):
+        if self._aligner is None:
+            self._aligner, self._to_logits = self._start()
+        if self._aligner.done:
+            return []
+        return self._aligner.feed(self._to_logits(item))
+
+    def abort(self):
+        """End now, dropping whatever is still queued, without waiting for
+        a pump to reach the end of the stream."""
+        while True:
+            try:
+                self.queue.get(block=False)
+            except queue.Empty:
+                break
+        self._end()
+
+    def _end(self):
+        with self._lock:
+            if self.ended:
+                return
+            self.ended = True
+        try:
+            self._on_end()
+        except Exception:
+            logger.exception("Session teardown failed")
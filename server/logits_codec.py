@@ -0,0 +1,106 @@
+"""Wire formats for logits streamed by on-device (logits-mode) clients.
+
+Dense float32 (frames, vocab) logits are ~10 KB per 500 ms chunk for the
+timit-phoneme vocab — a lot of upstream for kids on school Wi-Fi. A client
+names the encoding it will send in its `start` payload (`logits_encoding`,
+a string or a list in order of preference) and every logits_chunk payload
+then carries `frames` plus:
+
+    float32 – data: float32 bytes, (frames, vocab). The default.
+    float16 – data: float16 bytes, (frames, vocab). Half the bytes; decoded
+              without a copy and aligned as float16.
+    int8    – data: int8 bytes, (frames, vocab); scales: float32 bytes,
+              (frames,); optional offsets: float32 bytes, (frames,).
+              logit = data * scale + offset, per frame. A quarter of the bytes.
+    topk    – k: int; ids: uint16 bytes, (frames, k); values: float16 or
+              float32 bytes, (frames, k). Every other logit is -inf, which the
+              aligner already treats as "not this phoneme". k must be >= 3 so
+              the aligner's top-3 leniency check only ever sees real values.
+
+decode_logits_chunk raises ValueError (or KeyError/TypeError) on a malformed
+payload; the socket handler drops those chunks just like bad float32 ones.
+"""
+import numpy as np
+
+LOGITS_ENCODINGS = ("float32", "float16", "int8", "topk")
+DEFAULT_LOGITS_ENCODING = "float32"
+MIN_TOPK = 3
+
+
+def negotiate_encoding(requested):
+    """First encoding in the client's preference list that the server
+    supports, or float32 when there's nothing usable."""
+    if isinstance(requested, str):
+        requested = [requested]
+    if isinstance(requested, (list, tuple)):
+        for encoding in requested:
+            if encoding in LOGITS_ENCODINGS:
+                return encoding
+    return DEFAULT_LOGITS_ENCODING
+
+
+def _frames(data):
+    frames = int(data.get("frames", 0))
+    if frames <= 0:
+        raise ValueError("frames must be positive")
+    return frames
+
+
+def _dense(data, dtype):
+    frames = _frames(data)
+    arr = np.frombuffer(data["data"], dtype=dtype)
+    if arr.size == 0 or arr.size % frames != 0:
+        raise ValueError("data is not a whole number of frames")
+    return arr.reshape(frames, -1)
+
+
+def _per_frame(buf, frames, name):
+    arr = np.frombuffer(buf, dtype=np.float32)
+    if arr.size != frames:
+        raise ValueError(f"{name} must have one float32 per frame")
+    return arr[:, np.newaxis]
+
+
+def _int8(data):
+    q = _dense(data, np.int8)
+    frames = q.shape[0]
+    logits = np.multiply(q, _per_frame(data["scales"], frames, "scales"), dtype=np.float32)
+    if data.get("offsets") is not None:
+        logits += _per_frame(data["offsets"], frames, "offsets")
+    return logits
+
+
+def _topk(data, vocab_size):
+    frames = _frames(data)
+    k = int(data.get("k", 0))
+    if k < MIN_TOPK or vocab_size is None or k > vocab_size:
+        raise ValueError(f"k must be between {MIN_TOPK} and the vocab size")
+    ids = np.frombuffer(data["ids"], dtype=np.uint16)
+    if ids.size != frames * k:
+        raise ValueError("ids must be (frames, k)")
+    values_buf = data["values"]
+    values_dtype = np.float16 if len(values_buf) == frames * k * 2 else np.float32
+    values = np.frombuffer(values_buf, dtype=values_dtype)
+    if values.size != frames * k:
+        raise ValueError("values must be (frames, k)")
+    ids = ids.reshape(frames, k)
+    if ids.max() >= vocab_size:
+        raise ValueError("token id outside the vocab")
+    logits = np.full((frames, vocab_size), -np.inf, dtype=np.float32)
+    np.put_along_axis(logits, ids.astype(np.intp), values.reshape(frames, k), axis=1)
+    return logits
+
+
+def decode_logits_chunk(data, encoding=DEFAULT_LOGITS_ENCODING, vocab_size=None):
+    """Turn one logits_chunk payload into the (frames, vocab) array
+    stream_decode_logits consumes. float32/float16 are views over the
+    received bytes; int8/topk allocate exactly one output array."""
+    if encoding == "float32":
+        return _dense(data, np.float32)
+    if encoding == "float16":
+        return _dense(data, np.float16)
+    if encoding == "int8":
+        return _int8(data)
+    if encoding == "topk":
+        return _topk(data, vocab_size)
+    raise ValueError(f"unsupported logits encoding {encoding!r}")
@@ -1,3 +1,7 @@
+# Before anything else: under gevent this monkey-patches the stdlib.
+from runtime import in_loop, patch
+ASYNC_MODE = patch()
+
 import logging
 import eng_to_ipa as ipa
 import numpy as np
@@ -20,8 +24,23 @@ import threading
 import re
 import json
 import threading, queue
-from stream_decode_util import stream_decode_util, stream_decode_logits, prosody_event, normalize
-from prosody_eval import warmup_async
+import time
+from stream_decode_util import AudioLogitsStream
+from forced_align import make_aligner
+from prosody_eval import ProsodyAccumulator
+from prosody_pool import ProsodyPool
+from inference import load_backend, load_runtime_backend
+from inference_pool import INFERENCE_WORKERS
+from admission import ADMISSION_RETRY_AFTER_SECONDS, AdmissionController, BoundedChunkQueue
+from audio_buffer import memory_budget
+from logits_codec import decode_logits_chunk, negotiate_encoding
+from phoneme_vocab import phoneme_vocab
+from live_session import LiveSession, session_executor
+from session_reaper import SessionReaper
+from session_table import SessionTable
+from session_router import SOCKETIO_MESSAGE_QUEUE, make_router
+from drain import Drain
+from session_resume import SESSION_RESUME_GRACE_SECONDS, ResumeTable, new_resume_token
 
 load_dotenv()
 
@@ -49,7 +68,9 @@ app = Flask(__name__)
 socketio = SocketIO(
     app,
     cors_allowed_origins=ALLOWED_ORIGINS,
-    async_mode="threading"
+    async_mode=ASYNC_MODE,
+    # Shared with the other nodes when scaled out (see session_router).
+    message_queue=SOCKETIO_MESSAGE_QUEUE or None,
 )
 
 CORS(
@@ -86,13 +107,21 @@ print("========================\n")
 _processor = None
 _model = None
 _feedback_model = None
+# Weights loaded by preload() in a parent about to fork workers.
+_runtime_backend = None
 _device = None
 _load_lock = threading.Lock()
 
-warmup_async()
+prosody_pool = ProsodyPool()
+
+sessions = SessionTable()
+# Sockets with a lesson open (see handle_start): what every sentence of the
+# lesson reuses.
+lesson_table = SessionTable()
+router = make_router()
 
-sessions = {}
-sessions_lock = threading.Lock()
+admission = AdmissionController()
+audio_budget = memory_budget()
 
 WORD_FAIL_SCORE_THRESHOLD = 0.3
 
@@ -196,12 +225,7 @@ def _word_to_phonemes(word):
     if not ipa_str or "*" in ipa_str:
         return []
     tokenizer = _load_processor_once().tokenizer
-    special = set(tokenizer.all_special_tokens)
-    norm_vocab = {normalize(t) for t in tokenizer.get_vocab()
-                  if t not in special and t not in ("|", " ")}
-    return [p for p in tokenizer.tokenize(ipa_str)
-            if p not in special and p not in ("|", " ", "ˈ", "ˌ", "ː", "ˑ", "'")
-            and normalize(p) in norm_vocab]
+    return phoneme_vocab(tokenizer).g2p_phonemes(tokenizer.tokenize(ipa_str))
 
 def _load_processor_once():
     """Load only the processor (tokenizer + feature-extractor config).
@@ -247,7 +271,21 @@ def _warmup_asr_async():
             # surface the failure properly.
             logger.exception("ASR warmup failed")
 
-    threading.Thread(target=_warm, daemon=True).start()
+    session_executor().submit(_warm)
+
+
+def preload():
+    """Load the processor and model weights synchronously, before a forking
+    server (gunicorn, see gunicorn.conf.py) forks its workers, so every
+    worker shares one copy of them. Nothing that starts threads or worker
+    processes runs here; each worker builds its inference pool, batching
+    and everything in start_workers() after the fork."""
+    global _processor, _runtime_backend
+    from transformers import Wav2Vec2Processor
+
+    _processor = Wav2Vec2Processor.from_pretrained(MODEL)
+    if os.environ.get("WARMUP_ASR_MODEL", "1") != "0":
+        _runtime_backend = load_runtime_backend(_processor, MODEL)
 
 
 def _load_model_once():
@@ -255,15 +293,15 @@ def _load_model_once():
     if _processor is None or _model is None:
         with _load_lock:
             if _processor is None or _model is None:
-                import torch
-                from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+                from transformers import Wav2Vec2Processor
 
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-                _processor = Wav2Vec2Processor.from_pretrained(MODEL)
-                _model = Wav2Vec2ForCTC.from_pretrained(MODEL).eval()
-                _model.to(device)
+                if _processor is None:
+                    _processor = Wav2Vec2Processor.from_pretrained(MODEL)
+                # INFERENCE_BACKEND picks torch or onnxruntime — see inference.py.
+                _model = load_backend(_processor, MODEL, runtime=_runtime_backend)
+                admission.fit(_model)
                 _feedback_model = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-                _device = device
+                _device = _model.device
     return _processor, _model, _feedback_model, _device
 
 def _get_lesson(user_id, lesson_id):
@@ -641,10 +679,21 @@ def _generate_detailed_feedback(results, target_phoneme, avg, baseline=None):
         'tip': tip,
     }
 
-def finalize_session(sid):
-    with sessions_lock:
-        session = sessions.pop(sid, None)
-    if not session:
+def _emit_to(session, event, payload):
+    """Emit to the session's current socket, or hold the message while the
+    session is parked waiting for its client to resume."""
+    with session['emit_lock']:
+        if session['parked']:
+            session['held'].append((event, payload))
+            return
+        sid = session['sid']
+    socketio.emit(event, payload, to=sid)
+
+def finalize_session(session):
+    """Score the finished sentence and emit its result, unless the session
+    was detached from its socket (disconnected or aborted) first."""
+    sessions.remove(session['sid'], session)
+    if session.get('detached'):
         return
     results = session['results']
     target_phoneme = session.get('target_phoneme')
@@ -664,22 +713,48 @@ def finalize_session(sid):
         feedback_detail = {'text': "Great job!", 'phoneme': None, 'word': None, 'score': None, 'tip': None}
     else:
         feedback_detail = _generate_detailed_feedback(results, target_phoneme, avg, session.get('baseline'))
-    socketio.emit('result', {
+    _emit_to(session, 'result', {
         'score': avg,
         'passed': avg >= 0.8,
         'feedback': feedback_detail['text'],
         'feedback_detail': feedback_detail,
         'res': results,
-    }, to=sid)
+    })
 
 @socketio.on('connect')
 def handle_connect(auth=None):
     print(f"Client connected: {request.sid}")
 
+def _refuse_if_draining():
+    if drain.draining:
+        emit('busy', {'message': 'Server is restarting, please retry shortly',
+                      'reason': 'draining', 'retry_after': ADMISSION_RETRY_AFTER_SECONDS})
+        return True
+    return False
+
+def _is_sentence_payload(data):
+    return isinstance(data, dict) and isinstance(data.get('words_ipa'), list) and bool(data.get('sentence'))
+
+def _load_baseline(user_id):
+    baseline = {}
+    if user_id:
+        user = users_collection.find_one({"userId": user_id}, {"progress.phonemeScores": 1})
+        if user:
+            for entry in user.get("progress", {}).get("phonemeScores", []):
+                if entry.get("avgScore") is not None:
+                    baseline[entry["phoneme"]] = entry["avgScore"]
+    return baseline
+
 @socketio.on('start')
 def handle_start(data):
+    """Start scoring one sentence. With 'lesson': true this also opens a
+    lesson on the socket: the user is authenticated and their baseline
+    loaded once, here, and each later sentence arrives as a `next_sentence`
+    carrying only the sentence."""
     sid = request.sid
-    if not isinstance(data, dict) or not isinstance(data.get('words_ipa'), list) or not data.get('sentence'):
+    if _refuse_if_draining():
+        return
+    if not _is_sentence_payload(data):
         emit('error', {'message': 'Malformed start payload'})
         return
 
@@ -703,15 +778,78 @@ def handle_start(data):
             emit('error', {'message': 'Not authorized for this user'})
             return
 
+    # What every sentence of the session shares; the baseline is loaded by
+    # the first sentence that's admitted.
+    lesson = {'user_id': user_id, 'mode': data.get('mode', 'audio'),
+              'allow_downgrade': bool(data.get('allow_downgrade')),
+              'logits_encoding': data.get('logits_encoding'),
+              'negotiates_encoding': 'logits_encoding' in data,
+              'chunk_results': bool(data.get('chunk_results')),
+              'resumable': bool(data.get('resumable')),
+              'resume_token': new_resume_token()}
+    if lesson['resumable']:
+        router.claim(lesson['resume_token'])
+        emit('resume_token', {'token': lesson['resume_token'],
+                              'grace_seconds': SESSION_RESUME_GRACE_SECONDS})
+    if data.get('lesson'):
+        lesson_table.put(sid, lesson)
+        emit('lesson_open', {})
+    _start_sentence(sid, lesson, data)
+
+@socketio.on('next_sentence')
+def handle_next_sentence(data):
+    """The open lesson's next sentence: {'sentence', 'words_ipa',
+    'target_phoneme'}, optionally 'mode'."""
+    sid = request.sid
+    if _refuse_if_draining():
+        return
+    if not _is_sentence_payload(data):
+        emit('error', {'message': 'Malformed next_sentence payload'})
+        return
+    lesson = lesson_table.get(sid)
+    if not lesson:
+        emit('error', {'message': 'No lesson in progress'})
+        return
+    _start_sentence(sid, lesson, data)
+
+@socketio.on('end_lesson')
+def handle_end_lesson():
+    lesson_table.pop(request.sid)
+
+def _start_sentence(sid, lesson, data):
+    # A sentence the client moved on from without a `stop` still gets its
+    # result.
+    previous = sessions.get(sid)
+    if previous:
+        previous['queue'].put(None)
+        previous['live'].schedule()
+        # Its on_end releases the ticket too, but only once the pump winds
+        # down; a socket has one live sentence, so hand its slot over now.
+        admission.release(previous['admission'])
+
+    mode = data.get('mode', lesson['mode'])
+    ticket = admission.admit(mode, allow_downgrade=lesson['allow_downgrade'])
+    if not ticket:
+        emit('busy', {'message': 'Server is at capacity, please retry shortly',
+                      'reason': ticket.reason, 'retry_after': ticket.retry_after})
+        return
+    if ticket.mode != mode:
+        # Out of server-side inference capacity: the client said it can run
+        # wav2vec2 on-device, so have it stream logits instead of audio.
+        mode = ticket.mode
+        emit('session_mode', {'mode': mode, 'reason': ticket.reason})
+
+    logits_encoding = negotiate_encoding(lesson['logits_encoding'])
+    if mode == 'logits' and lesson['negotiates_encoding']:
+        emit('logits_encoding', {'encoding': logits_encoding})
+    # top-k chunks are expanded to the full vocab width server-side.
+    vocab_size = len(_load_processor_once().tokenizer) if logits_encoding == 'topk' else None
+
     words_ipa = data['words_ipa']
 
-    baseline = {}
-    if user_id:
-        user = users_collection.find_one({"userId": user_id}, {"progress.phonemeScores": 1})
-        if user:
-            for entry in user.get("progress", {}).get("phonemeScores", []):
-                if entry.get("avgScore") is not None:
-                    baseline[entry["phoneme"]] = entry["avgScore"]
+    if 'baseline' not in lesson:
+        lesson['baseline'] = _load_baseline(lesson['user_id'])
+    baseline = lesson['baseline']
 
     flat_phonemes = [p for w in words_ipa for p in w['phonemes']]
     position_to_word_idx = [
@@ -724,156 +862,338 @@ def handle_start(data):
     for w in words_ipa:
         word_start_position.append(_pos)
         _pos += len(w['phonemes'])
-    chunk_queue = queue.Queue()
-    mode = data.get('mode', 'audio')
+    chunk_queue = BoundedChunkQueue()
     sentence = data.get('sentence', '')
     target_phoneme = data.get('target_phoneme')
-    session = {'words_ipa': words_ipa, 'queue': chunk_queue, 'results': [],
-               'mode': mode, 'audio': [], 'target_phoneme': target_phoneme,
-               'baseline': baseline}
-    with sessions_lock:
-        sessions[sid] = session
-
-    def run():
-        word_phoneme_scores = [[None] * len(w['phonemes']) for w in words_ipa]
-        word_completed = [False] * len(words_ipa)
-        stream_ended = False
-
-        def drain():
-            nonlocal stream_ended
-            while (item := chunk_queue.get()) is not None:
-                yield item
-            stream_ended = True
+    word_phoneme_scores = [[None] * len(w['phonemes']) for w in words_ipa]
+    word_completed = [False] * len(words_ipa)
+
+    def start_alignment():
+        if mode == 'logits':
+            processor = _load_processor_once()
+            return make_aligner(flat_phonemes, processor.tokenizer), lambda logits: logits
+        processor, model, _, _ = _load_model_once()
+        stream = AudioLogitsStream(model, processor.tokenizer.pad_token_id)
+        return make_aligner(flat_phonemes, processor.tokenizer), stream.push
+
+    # Clients that send chunk_results: true get everything one chunk
+    # completes as a single 'chunk_results' message; older clients keep the
+    # per-word 'partial_result' / 'stats_update' pair.
+    coalesce = lesson['chunk_results']
+
+    def on_events(matches):
+        partial_results, stats_updates = [], []
+        for match in matches:
+            if match.label == 'insertion' or match.position is None:
+                continue
+            word_idx = position_to_word_idx[match.position]
+            if word_completed[word_idx]:
+                continue
+            local_idx = match.position - word_start_position[word_idx]
+            word_entry = words_ipa[word_idx]
+            if not (0 <= local_idx < len(word_entry['phonemes'])):
+                continue
+            word_phoneme_scores[word_idx][local_idx] = match
+            if all(s is not None for s in word_phoneme_scores[word_idx]):
+                word_completed[word_idx] = True
+                # The wire format, built once per word from the held events.
+                scores = [{'phoneme': e.phoneme, 'decoded': e.decoded, 'score': e.score}
+                          for e in word_phoneme_scores[word_idx]]
+                word_score = sum(p['score'] for p in scores) / len(scores)
+                result = {
+                    'word_index': word_idx,
+                    'word': word_entry['word'],
+                    'phonemes': scores,
+                    'score': word_score,
+                }
+                partial_results.append(result)
+
+                phoneme_deltas = []
+                for entry in scores:
+                    ph = entry['phoneme']
+                    base = baseline.get(ph)
+                    delta = None if base is None else entry['score'] - base
+                    if delta is None:
+                        status = 'new'
+                    elif delta > PHONEME_DELTA_MARGIN:
+                        status = 'improved'
+                    elif delta < -PHONEME_DELTA_MARGIN:
+                        status = 'worse'
+                    else:
+                        status = 'steady'
+                    phoneme_deltas.append({
+                        'phoneme': ph,
+                        'score': entry['score'],
+                        'baseline': base,
+                        'delta': delta,
+                        'status': status,
+                    })
+
+                stats_updates.append({
+                    'word_index': word_idx,
+                    'word': word_entry['word'],
+                    'score': word_score,
+                    'is_strike': word_score < WORD_FAIL_SCORE_THRESHOLD,
+                    'phoneme_deltas': phoneme_deltas,
+                })
+
+        if not partial_results:
+            return
+        with session['emit_lock']:
+            session['results'].extend(partial_results)
+            if session['parked']:
+                return  # the client gets every result so far with 'resumed'
+            to = session['sid']
+        if coalesce:
+            # partial_results[i] and stats_updates[i] are the same word.
+            socketio.emit('chunk_results', {'partial_results': partial_results,
+                                            'stats_updates': stats_updates}, to=to)
+            return
+        for result, stats in zip(partial_results, stats_updates):
+            socketio.emit('partial_result', result, to=to)
+            socketio.emit('stats_update', stats, to=to)
+
+    def on_end():
+        admission.release(ticket)
+        if chunk_queue.dropped:
+            logger.warning("Session %s dropped %d chunk(s) under backpressure",
+                           session['sid'], chunk_queue.dropped)
+        finalize_session(session)
+
+        # Scored off this worker (see prosody_pool); the message carries a
+        # status saying whether the scores made it in time.
+        if prosody.samples:
+            def on_prosody(message):
+                audio_budget.release(prosody.nbytes)
+                _emit_to(session, 'prosody', message)
+            prosody_pool.submit(prosody, sentence, in_loop(on_prosody))
+        else:
+            audio_budget.release(prosody.nbytes)
+
+    # The session's audio buffers are allocated up front and counted against
+    # the process-wide budget (see audio_buffer).
+    prosody = ProsodyAccumulator()
+    if not audio_budget.reserve(prosody.nbytes):
+        admission.release(ticket)
+        emit('busy', {'message': 'Server is at capacity, please retry shortly',
+                      'reason': 'audio_memory', 'retry_after': ADMISSION_RETRY_AFTER_SECONDS})
+        return
 
-        try:
-            if mode == 'logits':
-                processor = _load_processor_once()
-                matches = stream_decode_logits(drain(), flat_phonemes, processor.tokenizer)
-            else:
-                processor, model, _, device = _load_model_once()
-                matches = stream_decode_util(drain(), flat_phonemes, processor, model, device)
-
-            for match in matches:
-                if match['label'] == 'insertion' or match['position'] is None:
-                    continue
-                word_idx = position_to_word_idx[match['position']]
-                if word_completed[word_idx]:
-                    continue
-                local_idx = match['position'] - word_start_position[word_idx]
-                word_entry = words_ipa[word_idx]
-                if not (0 <= local_idx < len(word_entry['phonemes'])):
-                    continue
-                word_phoneme_scores[word_idx][local_idx] = {'phoneme': match['phoneme'], 'decoded': match['decoded'], 'score': match['score']}
-                if all(s is not None for s in word_phoneme_scores[word_idx]):
-                    word_completed[word_idx] = True
-                    scores = word_phoneme_scores[word_idx]
-                    word_score = sum(p['score'] for p in scores) / len(scores)
-                    result = {
-                        'word_index': word_idx,
-                        'word': word_entry['word'],
-                        'phonemes': scores,
-                        'score': word_score,
-                    }
-                    session['results'].append(result)
-                    socketio.emit('partial_result', result, to=sid)
-
-                    phoneme_deltas = []
-                    for entry in scores:
-                        ph = entry['phoneme']
-                        base = baseline.get(ph)
-                        delta = None if base is None else entry['score'] - base
-                        if delta is None:
-                            status = 'new'
-                        elif delta > PHONEME_DELTA_MARGIN:
-                            status = 'improved'
-                        elif delta < -PHONEME_DELTA_MARGIN:
-                            status = 'worse'
-                        else:
-                            status = 'steady'
-                        phoneme_deltas.append({
-                            'phoneme': ph,
-                            'score': entry['score'],
-                            'baseline': base,
-                            'delta': delta,
-                            'status': status,
-                        })
-
-                    socketio.emit('stats_update', {
-                        'word_index': word_idx,
-                        'word': word_entry['word'],
-                        'score': word_score,
-                        'is_strike': word_score < WORD_FAIL_SCORE_THRESHOLD,
-                        'phoneme_deltas': phoneme_deltas,
-                    }, to=sid)
-
-            if not stream_ended:
-                for _ in drain():
-                    pass
-        except Exception:
-            logger.exception("Stream decode failed")
-        finally:
-            finalize_session(sid)
-
-        if session['audio']:
-            try:
-                event = prosody_event(np.concatenate(session['audio']), sentence)
-                socketio.emit('prosody', {k: event[k] for k in
-                                          ('monotony_score', 'rhythm_score',
-                                           'boundary_score', 'speaking_rate')}, to=sid)
-            except Exception:
-                logger.exception("Prosody evaluation failed")
-
-    threading.Thread(target=run, daemon=True).start()
+    session = {'sid': sid, 'lesson': lesson, 'words_ipa': words_ipa, 'queue': chunk_queue,
+               'results': [], 'chunks': 0, 'logits_chunks': 0,
+               'emit_lock': threading.Lock(), 'parked': False, 'held': [],
+               'mode': mode, 'prosody': prosody, 'target_phoneme': target_phoneme,
+               'baseline': baseline, 'admission': ticket,
+               'logits_encoding': logits_encoding, 'vocab_size': vocab_size,
+               # The pump runs on a native worker thread; what it reports
+               # back is emitted from the event loop (see runtime).
+               'live': LiveSession(chunk_queue, start_alignment, in_loop(on_events),
+                                   in_loop(on_end)),
+               'started': time.monotonic(), 'last_active': time.monotonic()}
+    sessions.put(sid, session)
     print(f"Session started for {sid}: {sentence}")
 
+def _session_elsewhere(token):
+    """A resume token this node doesn't hold. If another node has the
+    session parked, tell the client which one, so it can reconnect there."""
+    owner = router.elsewhere(token)
+    if owner:
+        logger.warning("Resume of a session parked on node %s", owner)
+        emit('session_moved', {'node': owner})
+
+def _live_resume_tokens():
+    """Tokens of this node's resumable sessions, for the router to keep
+    alive."""
+    contexts = lesson_table.values() + [s['lesson'] for s in sessions.values()]
+    return {c['resume_token'] for c in contexts if c['resumable']} | set(resumable.tokens())
+
 @socketio.on('chunk')
 def handle_chunk(data):
-    with sessions_lock:
-        session = sessions.get(request.sid)
+    session = sessions.get(request.sid)
     if not session:
         return
+    session['chunks'] += 1
+    session['last_active'] = time.monotonic()
     arr = np.frombuffer(data, dtype=np.float32)
-    session['audio'].append(arr)
+    session['prosody'].push(arr)
+    if session['prosody'].tracker == 'yin':
+        # YIN's FFTs stay off the socket handler (the event loop under
+        # gevent).
+        session_executor().submit(session['prosody'].track)
     if session.get('mode') != 'logits':
         session['queue'].put(arr)
+        session['live'].schedule()
 
 @socketio.on('logits_chunk')
 def handle_logits_chunk(data):
-    """Receive precomputed wav2vec2 logits for one audio chunk.
-    Payload: {'frames': int, 'data': float32 bytes of shape (frames, vocab)}."""
-    with sessions_lock:
-        session = sessions.get(request.sid)
-    if not session or session.get('mode') != 'logits':
+    """Receive precomputed wav2vec2 logits for one audio chunk, in the
+    encoding negotiated at `start` (see logits_codec). Default payload:
+    {'frames': int, 'data': float32 bytes of shape (frames, vocab)}."""
+    session = sessions.get(request.sid)
+    if not session:
         return
-    try:
-        frames = int(data.get('frames', 0))
-        arr = np.frombuffer(data['data'], dtype=np.float32)
-    except (TypeError, KeyError, ValueError):
+    session['logits_chunks'] += 1
+    if session.get('mode') != 'logits':
         return
-    if frames <= 0 or arr.size == 0 or arr.size % frames != 0:
+    session['last_active'] = time.monotonic()
+    try:
+        logits = decode_logits_chunk(data, session['logits_encoding'], session['vocab_size'])
+    except (AttributeError, TypeError, KeyError, ValueError):
         return
-    session['queue'].put(arr.reshape(frames, -1))
+    session['queue'].put(logits)
+    session['live'].schedule()
 
 @socketio.on('stop')
 def handle_stop():
-    with sessions_lock:
-        session = sessions.get(request.sid)
-    if session:
-        session['queue'].put(None)
+    session = sessions.get(request.sid)
+    if not session:
+        return
+    session['queue'].put(None)
+    session['live'].schedule()
 
 @socketio.on('disconnect')
-def handle_disconnect():
-    with sessions_lock:
-        session = sessions.pop(request.sid, None)
+def handle_disconnect(reason=None):
+    # reason is passed by python-socketio 5.12+ (pinned in requirements).
+    sid = request.sid
+    lesson = lesson_table.pop(sid)
+    session = sessions.pop(sid)
+    context = lesson or (session['lesson'] if session else None)
+    if (context and context['resumable']
+            and reason != socketio.server.reason.CLIENT_DISCONNECT):
+        # Dropped, not closed: keep it for the client to resume (see
+        # session_resume).
+        if session:
+            with session['emit_lock']:
+                session['parked'] = True
+        resumable.park(context['resume_token'], lesson, session)
+        return
+    if context and context['resumable']:
+        router.release(context['resume_token'])
     if session:
+        session['detached'] = True
         session['queue'].put(None)
+        session['live'].schedule()
+
+@socketio.on('resume')
+def handle_resume(data):
+    """Move a parked session to this socket: {'token'}. Replies 'resumed'
+    with whether a lesson is open, how many 'chunk' and 'logits_chunk'
+    messages the server already has (the client resends the rest) and
+    every word scored so far; anything held while parked follows."""
+    token = data.get('token') if isinstance(data, dict) else None
+    entry = resumable.resume(token) if token else None
+    if entry is None:
+        if token:
+            _session_elsewhere(token)
+        emit('resume_failed', {'reason': 'expired'})
+        return
+    router.claim(token)
+    sid = request.sid
+    lesson, session = entry
+    if lesson:
+        lesson_table.put(sid, lesson)
+    reply = {'lesson': lesson is not None, 'chunks': 0, 'logits_chunks': 0, 'results': []}
+    if session is None:
+        emit('resumed', reply)
+        return
+    with session['emit_lock']:
+        session['sid'] = sid
+        if not session['live'].ended:
+            session['last_active'] = time.monotonic()
+            sessions.put(sid, session)
+        reply.update(chunks=session['chunks'], logits_chunks=session['logits_chunks'],
+                     results=list(session['results']))
+        emit('resumed', reply)
+        for event, payload in session['held']:
+            emit(event, payload)
+        session['held'] = []
+        session['parked'] = False
+
+def _expire_parked(token, lesson, session):
+    router.release(token)
+    if session:
+        session['detached'] = True
+        session['queue'].put(None)
+        session['live'].schedule()
+
+resumable = ResumeTable(_expire_parked)
+
+def _end_reaped_session(sid, session, reason):
+    socketio.emit('session_timeout', {'reason': reason}, to=sid)
+    session['queue'].put(None)
+    session['live'].schedule()
+
+def _abort_reaped_session(sid, session):
+    sessions.remove(sid, session)
+    session['detached'] = True
+    session['live'].abort()
+
+reaper = SessionReaper(sessions, _end_reaped_session, _abort_reaped_session)
+
+def _end_drained_session(sid, session):
+    socketio.emit('server_draining', {}, to=sid)
+    session['queue'].put(None)
+    session['live'].schedule()
+
+drain = Drain(sessions, _end_drained_session,
+              pending=lambda: prosody_pool.stats()['in_flight'] + len(resumable),
+              sleep=socketio.sleep)
+
+def _drain_and_disconnect():
+    try:
+        logger.info("Drained: %s", drain.run())
+    finally:
+        # Idle clients would otherwise hold this process open until the
+        # server's own timeout; they reconnect to another worker.
+        for client_sid, _ in list(socketio.server.manager.get_participants('/', None)):
+            socketio.server.disconnect(client_sid, ignore_queue=True)
+
+def start_drain():
+    """Begin a graceful shutdown in the background (see drain)."""
+    if not drain.draining:
+        drain.draining = True
+        socketio.start_background_task(_drain_and_disconnect)
+
+def start_workers():
+    """Start this serving process's pools and background tasks. Called by
+    `python main.py` before it serves and, under gunicorn, in each worker
+    after the fork (gunicorn.conf.py); importing this module starts
+    nothing."""
+    # First, while the process has no other threads: the pools fork.
+    prosody_pool.start()
+    if INFERENCE_WORKERS > 0:
+        # Built here rather than lazily on a session thread, which would
+        # fork the inference workers out of a process full of threads.
+        _load_model_once()
+    socketio.start_background_task(reaper.run)
+    socketio.start_background_task(router.run, _live_resume_tokens)
+    socketio.start_background_task(resumable.run)
+    _warmup_asr_async()
 
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({"service": "talky-api", "status": "ok"})
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    live = sessions.values()
+    return jsonify({
+        "sessions": len(live),
+        "lessons": len(lesson_table),
+        "queued_chunks": sum(s['queue'].qsize() for s in live),
+        "admission": admission.stats(),
+        "prosody": prosody_pool.stats(),
+        "audio_memory": audio_budget.stats(),
+        "reaped": reaper.stats(),
+        "routing": router.stats(),
+        "resume": resumable.stats(),
+        "draining": drain.draining,
+    })
+
 @app.route("/health", methods=["GET", "HEAD"])
 def health():
+    if drain.draining:
+        return jsonify({"status": "draining"}), 503
     try:
         client.admin.command('ping')
     except Exception:
@@ -881,8 +1201,12 @@ def health():
         return jsonify({"status": "unhealthy", "reason": "database unavailable"}), 503
     return jsonify({"status": "ok"})
 
-_warmup_asr_async()
+# gunicorn.conf.py sets PRELOAD_BEFORE_FORK for the master, which imports
+# this module once and forks it into workers.
+if os.environ.get("PRELOAD_BEFORE_FORK") == "1":
+    preload()
 
 if __name__ == '__main__':
+    start_workers()
     port = int(os.environ.get('PORT', 8080))
     socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
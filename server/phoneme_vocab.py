@@ -0,0 +1,90 @@
+"""The wav2vec2 tokenizer's phoneme vocabulary, indexed once per tokenizer.
+
+Both lesson generation (_word_to_phonemes in main.py, which filters G2P output
+down to phonemes the model can emit) and the aligner (stream_decode_logits)
+need the same derived views of the vocab: which ids/tokens are special, how
+tokens normalize, and which ids share a normalized phoneme. phoneme_vocab()
+builds those once per tokenizer object and hands every caller the same
+read-only PhonemeVocab.
+"""
+import functools
+import threading
+import weakref
+
+import numpy as np
+
+_NORM_MAP = [("ɹ", "r"), ("ʌ", "ə"), ("v", "f"), ("ɔ", "ɑ"), ("ʒ", "ʃ"), ("ɚ", "ɝ")]
+
+# Tokens that separate words rather than name a phoneme.
+WORD_SEPARATORS = frozenset(("|", " "))
+# Stress/length marks and apostrophes eng_to_ipa emits between phonemes.
+G2P_MARKS = frozenset(("ˈ", "ˌ", "ː", "ˑ", "'"))
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(phoneme):
+    for src, dst in _NORM_MAP:
+        phoneme = phoneme.replace(src, dst)
+    return phoneme
+
+
+class PhonemeVocab:
+    """Normalized-phoneme view of a CTC tokenizer's vocab.
+
+    Phoneme tokens are grouped by normalized form, so a reference "r" reads
+    the best of the model's "r" and "ɹ" logits. norm_of_id maps a token id to
+    its group (-1 for blank/special/word-separator tokens); group_cols lists
+    phoneme ids sorted by group, with group_starts marking each group's
+    first column, ready for np.maximum.reduceat.
+    """
+
+    def __init__(self, tokenizer):
+        vocab = tokenizer.get_vocab()
+        self.special_ids = frozenset(tokenizer.all_special_ids)
+        self.special_tokens = frozenset(getattr(tokenizer, "all_special_tokens", ())).union(
+            tok for tok, tid in vocab.items() if tid in self.special_ids)
+        self.norm_names = []
+        self.norm_index = {}
+        self.norm_of_id = np.full(max(vocab.values(), default=-1) + 1, -1, dtype=np.intp)
+        for tok, tid in vocab.items():
+            if tid in self.special_ids or tok in WORD_SEPARATORS:
+                continue
+            norm = normalize(tok)
+            if norm not in self.norm_index:
+                self.norm_index[norm] = len(self.norm_names)
+                self.norm_names.append(norm)
+            self.norm_of_id[tid] = self.norm_index[norm]
+        self.norm_of_id.setflags(write=False)
+        self.norm_vocab = frozenset(self.norm_index)
+
+        phoneme_ids = np.flatnonzero(self.norm_of_id >= 0)
+        order = np.argsort(self.norm_of_id[phoneme_ids], kind="stable")
+        self.group_cols = phoneme_ids[order]
+        groups = self.norm_of_id[self.group_cols]
+        self.group_starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+    def norm_id(self, phoneme):
+        """Group index of an IPA phoneme's normalized form, or -1 when the
+        model has no token for it."""
+        return self.norm_index.get(normalize(phoneme), -1)
+
+    def g2p_phonemes(self, tokens):
+        """Keep the tokenized G2P output the model can actually emit: no
+        special tokens, separators or stress marks, and only phonemes whose
+        normalized form is in the vocab."""
+        return [p for p in tokens
+                if p not in self.special_tokens and p not in WORD_SEPARATORS
+                and p not in G2P_MARKS and normalize(p) in self.norm_vocab]
+
+
+_vocabs = weakref.WeakKeyDictionary()
+_vocabs_lock = threading.Lock()
+
+
+def phoneme_vocab(tokenizer):
+    """The shared PhonemeVocab for tokenizer, built on first use."""
+    with _vocabs_lock:
+        vocab = _vocabs.get(tokenizer)
+        if vocab is None:
+            vocab = _vocabs[tokenizer] = PhonemeVocab(tokenizer)
+        return vocab
@@ -4,50 +4,181 @@
 Scores the full utterance once the stream ends: pitch variability (monotony),
 rhythm (nPVI over voiced-region durations), boundary tone (rising vs falling
 against whether the sentence is a question), and approximate speaking rate.
+Live sessions feed a ProsodyAccumulator as audio arrives instead. With the
+yin tracker most of the pitch tracking is then done by the time the stream
+ends; with pyin (the default) nothing can be tracked early, and the
+accumulator only buffers the audio for scores().
+
+Pitch comes from a pluggable tracker, picked with PITCH_TRACKER:
+  pyin  librosa.pyin (default). Probabilistic YIN with HMM smoothing; slow
+        per call and needs a ~5 s numba JIT warmup (warmup_async). It only
+        runs over a whole utterance, so live sessions don't track pitch
+        incrementally with it.
+  yin   yin() below: plain YIN in NumPy, vectorized over frames, with no
+        warmup. Live sessions track it chunk by chunk. Pitch on frames both trackers call voiced agrees to a few
+        cents; voicing is stricter than pyin's, which tends to carry voicing
+        into the silence after the last word.
 """
+import copy
+import os
 import threading
 
 import numpy as np
 import librosa
 
+from audio_buffer import SESSION_AUDIO_MAX_SECONDS, AudioRingBuffer, RingBuffer
+
+PITCH_TRACKER = os.environ.get("PITCH_TRACKER", "pyin")
+
 _HOP = 512
+_FRAME = 2048
+_FMIN, _FMAX = 75, 300
+# yin(): frames whose best trough in the cumulative mean normalized
+# difference is above this are unvoiced.
+_YIN_TROUGH = 0.1
+_YIN_APERIODICITY = 0.5
+# yin(): frames this far below the loudest frame are unvoiced, and unvoiced
+# gaps this short inside speech are bridged, roughly as pyin's voicing HMM does.
+_YIN_SILENCE_DB = 30.0
+_YIN_MAX_GAP_S = 0.15
+
 _warmed = False
 
 
+def warmup():
+    """Pay librosa.pyin's first-call numba JIT (~5 s) now. Warm up on noise,
+    not silence — the all-unvoiced path compiles far slower. Nothing to do
+    when PITCH_TRACKER is yin."""
+    if PITCH_TRACKER != "pyin":
+        return
+    noise = np.random.default_rng().standard_normal(2048, dtype=np.float32)
+    librosa.pyin(noise, fmin=_FMIN, fmax=_FMAX, sr=16000, hop_length=_HOP)
+
+
 def warmup_async():
-    """Pre-trigger librosa.pyin's first-call numba JIT (~5 s) in a background
-    thread, so evaluate_prosody doesn't stall at the end of a stream.
-    Warm up on noise, not silence — the all-unvoiced path compiles far slower.
+    """warmup() in a background thread, so evaluate_prosody doesn't stall at
+    the end of a stream. Even resolving the librosa.pyin attribute triggers
+    the slow lazy imports, so everything happens inside the thread.
     """
     global _warmed
-    if _warmed:
+    if _warmed or PITCH_TRACKER != "pyin":
         return
     _warmed = True
+    threading.Thread(target=warmup, daemon=True).start()
+
+
+def _pyin(audio, sr):
+    f0, voiced_flag, _ = librosa.pyin(audio, fmin=_FMIN, fmax=_FMAX, sr=sr, hop_length=_HOP)
+    return f0, voiced_flag
+
+
+def _cmnd(frames, min_period, max_period):
+    """YIN's cumulative mean normalized difference for every frame at once,
+    lags min_period..max_period (same definition as librosa's pyin uses)."""
+    n_fft = 1 << (2 * frames.shape[1] - 2).bit_length()
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft, axis=1)[:, :max_period + 1]
+    energy = np.cumsum(frames[:, :max_period] ** 2, axis=1)
+    diff = 2 * (acf[:, :1] - acf[:, 1:]) - energy
+    cumulative_mean = np.cumsum(diff, axis=1) / np.arange(1, max_period + 1)
+    return diff[:, min_period - 1:] / (cumulative_mean[:, min_period - 1:]
+                                       + np.finfo(np.float64).tiny)
+
+
+def _bridge_gaps(voiced_flag, max_gap):
+    """voiced_flag with unvoiced runs of at most max_gap frames between two
+    voiced regions filled in."""
+    regions = _voiced_regions(voiced_flag)
+    gap_starts, gap_ends = regions[:-1, 1], regions[1:, 0]
+    short = gap_ends - gap_starts <= max_gap
+    edges = np.zeros(len(voiced_flag) + 1, dtype=np.int64)
+    np.add.at(edges, gap_starts[short], 1)
+    np.add.at(edges, gap_ends[short], -1)
+    return voiced_flag | (np.cumsum(edges[:-1]) > 0)
+
+
+def _yin_frames(frames, sr, fmin=_FMIN, fmax=_FMAX):
+    """(f0, aperiodicity, rms) for each row of frames, independently."""
+    min_period = max(1, int(np.floor(sr / fmax)))
+    max_period = min(int(np.ceil(sr / fmin)), frames.shape[1] - 1)
+    cmnd = _cmnd(frames, min_period, max_period)
+
+    # First trough under _YIN_TROUGH, else the global minimum.
+    trough = np.zeros(cmnd.shape, dtype=bool)
+    trough[:, 1:-1] = (cmnd[:, 1:-1] < cmnd[:, :-2]) & (cmnd[:, 1:-1] <= cmnd[:, 2:])
+    trough &= cmnd < _YIN_TROUGH
+    lag = np.where(trough.any(axis=1), trough.argmax(axis=1), cmnd.argmin(axis=1))
+
+    # Parabolic interpolation around the chosen lag.
+    rows = np.arange(len(cmnd))
+    inner = np.clip(lag, 1, cmnd.shape[1] - 2)
+    left, mid, right = cmnd[rows, inner - 1], cmnd[rows, inner], cmnd[rows, inner + 1]
+    curvature = left - 2 * mid + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(curvature > 0, 0.5 * (left - right) / curvature, 0.0)
+    shift = np.where(lag == inner, np.clip(shift, -1.0, 1.0), 0.0)
+    f0 = sr / (min_period + lag + shift)
+    return f0, cmnd[rows, lag], np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def _yin_voicing(f0, aperiodicity, rms, sr, hop_length=_HOP):
+    """(f0, voiced_flag) from per-frame YIN output. Needs every frame of
+    the utterance: the silence floor is relative to the loudest one."""
+    floor = (rms.max() if len(rms) else 0.0) * 10 ** (-_YIN_SILENCE_DB / 20)
+    voiced_flag = (aperiodicity < _YIN_APERIODICITY) & (rms > floor)
+    voiced_flag = _bridge_gaps(voiced_flag, int(round(_YIN_MAX_GAP_S * sr / hop_length)))
+    return np.where(voiced_flag, f0, np.nan), voiced_flag
+
+
+def _frames(audio, frame_length, hop_length):
+    """Every complete frame_length window of audio on the hop grid."""
+    if len(audio) < frame_length:
+        return np.empty((0, frame_length))
+    return np.lib.stride_tricks.sliding_window_view(audio, frame_length)[::hop_length]
+
+
+def yin(audio, sr, fmin=_FMIN, fmax=_FMAX, frame_length=_FRAME, hop_length=_HOP):
+    """(f0, voiced_flag) per frame, framed like librosa.pyin (centered,
+    zero-padded) so the two are interchangeable. f0 is NaN where unvoiced."""
+    audio = np.pad(np.asarray(audio, dtype=np.float64), frame_length // 2)
+    if len(audio) < frame_length:
+        audio = np.pad(audio, (0, frame_length - len(audio)))
+    f0, aperiodicity, rms = _yin_frames(_frames(audio, frame_length, hop_length), sr, fmin, fmax)
+    return _yin_voicing(f0, aperiodicity, rms, sr, hop_length)
 
-    def _warm():
-        # Even resolving the librosa.pyin attribute triggers the slow lazy
-        # imports, so everything must happen inside the thread.
-        noise = np.random.default_rng().standard_normal(2048, dtype=np.float32)
-        librosa.pyin(noise, fmin=75, fmax=300, sr=16000, hop_length=_HOP)
 
-    threading.Thread(target=_warm, daemon=True).start()
+_TRACKERS = {"pyin": _pyin, "yin": yin}
+
+
+def pitch_tracker(name=None):
+    """The (audio, sr) -> (f0, voiced_flag) function for the configured
+    PITCH_TRACKER."""
+    name = name or PITCH_TRACKER
+    try:
+        return _TRACKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PITCH_TRACKER {name!r}") from None
 
 
 def _voiced_regions(voiced_flag):
-    regions, in_region, start = [], False, 0
-    for i, v in enumerate(voiced_flag):
-        if v and not in_region:
-            start, in_region = i, True
-        elif not v and in_region:
-            regions.append((start, i))
-            in_region = False
-    if in_region:
-        regions.append((start, len(voiced_flag)))
-    return regions
-
-
-def evaluate_prosody(audio, text, sr=16000):
-    f0, voiced_flag, _ = librosa.pyin(audio, fmin=75, fmax=300, sr=sr, hop_length=_HOP)
+    """(regions, 2) array of [start, end) frame ranges of voiced runs."""
+    flag = np.asarray(voiced_flag, dtype=np.int8)
+    return np.flatnonzero(np.diff(flag, prepend=0, append=0)).reshape(-1, 2)
+
+
+def _npvi(durations):
+    """Normalized pairwise variability index over successive durations."""
+    a, b = durations[:-1], durations[1:]
+    pairs = a + b > 0
+    return 100 * float(np.mean(np.abs(a - b)[pairs] / ((a + b)[pairs] / 2)))
+
+
+def evaluate_prosody(audio, text, sr=16000, tracker=None):
+    f0, voiced_flag = pitch_tracker(tracker)(audio, sr)
+    return _score(f0, voiced_flag, len(audio) / sr, text)
+
+
+def _score(f0, voiced_flag, seconds, text):
     regions = _voiced_regions(voiced_flag)
     voiced_f0 = f0[voiced_flag & np.isfinite(f0)]
 
@@ -55,10 +186,9 @@ def evaluate_prosody(audio, text, sr=16000):
     monotony_score = float(np.clip(np.std(voiced_f0) / 40.0, 0.0, 1.0)) if len(voiced_f0) > 1 else 0.0
 
     # Rhythm: nPVI over voiced region durations (English native ~50–60)
-    durations = [e - s for s, e in regions]
+    durations = regions[:, 1] - regions[:, 0]
     if len(durations) >= 2:
-        npvi = 100 * float(np.mean([abs(a - b) / ((a + b) / 2) for a, b in zip(durations, durations[1:]) if a + b > 0]))
-        rhythm_score = float(np.clip(npvi / 50.0, 0.0, 1.0))
+        rhythm_score = float(np.clip(_npvi(durations) / 50.0, 0.0, 1.0))
     else:
         rhythm_score = None
 
@@ -73,5 +203,122 @@ def evaluate_prosody(audio, text, sr=16000):
         "monotony_score": round(monotony_score, 3),
         "rhythm_score": round(rhythm_score, 3) if rhythm_score is not None else None,
         "boundary_score": boundary_score,
-        "speaking_rate": round(len(regions) / (len(audio) / sr), 2),  # approx syllables/sec
-    }
\ No newline at end of file
+        "speaking_rate": round(len(regions) / seconds, 2),  # approx syllables/sec
+    }
+
+
+class ProsodyAccumulator:
+    """Prosody scored as audio arrives, so the end of a stream only has the
+    last few frames left to do.
+
+    With the yin tracker, push() only queues the new audio, and track()
+    runs YIN on every frame it completes and keeps just its (f0,
+    aperiodicity, rms) — three numbers per hop instead of 512 samples — plus
+    the samples the next frame still needs. push() is cheap enough for a
+    socket handler; track() does FFTs and belongs on a native worker thread
+    (main schedules it on the session executor after each push). scores()
+    tracks whatever is still queued, then decides voicing over the whole
+    utterance (the silence floor and gap bridging need every frame) and
+    scores it; the result is identical to evaluate_prosody on the
+    concatenated audio.
+
+    pyin decodes voicing with an HMM over the whole utterance, so with that
+    tracker (the default) the audio is buffered, track() has nothing to do
+    and everything is tracked in scores(), as before.
+
+    Either way only the most recent max_seconds are kept, in ring buffers
+    allocated up front (see audio_buffer); nbytes is what they take.
+
+    push() and track() may be called from concurrent threads; chunks are
+    tracked in the order they're pushed. Accumulators pickle (as a snapshot),
+    so scores() can run in another process (see prosody_pool).
+    """
+
+    def __init__(self, sr=16000, tracker=None, max_seconds=SESSION_AUDIO_MAX_SECONDS):
+        self.sr = sr
+        self.tracker = tracker or PITCH_TRACKER
+        pitch_tracker(self.tracker)  # fail fast on an unknown tracker
+        self.samples = 0
+        self._lock = threading.Lock()
+        # Held while tracking, so queued chunks are tracked in order.
+        self._track_lock = threading.Lock()
+        self._queued = []
+        if self.tracker != "yin":
+            self._audio = AudioRingBuffer(sr, max_seconds)
+            self._tracked = ()
+        else:
+            self._audio = None
+            capacity = int(np.ceil(max_seconds * sr / _HOP))
+            self._tracked = tuple(RingBuffer(capacity) for _ in range(3))  # f0, aperiodicity, rms
+        # Unframed samples, starting with librosa-style centering padding.
+        self._pending = np.zeros(_FRAME // 2)
+
+    @property
+    def nbytes(self):
+        if self._audio is not None:
+            return self._audio.nbytes
+        return sum(ring.nbytes for ring in self._tracked)
+
+    def __getstate__(self):
+        with self._track_lock:
+            self._track_queued()
+            with self._lock:
+                return {key: copy.deepcopy(value) for key, value in self.__dict__.items()
+                        if key not in ("_lock", "_track_lock")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._track_lock = threading.Lock()
+
+    def push(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        with self._lock:
+            self.samples += len(audio)
+            if self._audio is not None:
+                self._audio.write(audio)
+                return
+            self._queued.append(audio)
+
+    def track(self):
+        """Run YIN over everything pushed so far (yin tracker only)."""
+        with self._track_lock:
+            self._track_queued()
+
+    def _track_queued(self):
+        with self._lock:
+            queued, self._queued = self._queued, []
+        if not queued:
+            return
+        audio = np.concatenate([self._pending, *queued])
+        frames = _frames(audio, _FRAME, _HOP)
+        if len(frames):
+            for ring, values in zip(self._tracked, _yin_frames(frames, self.sr)):
+                ring.extend(values)
+        self._pending = audio[len(frames) * _HOP:]
+
+    def scores(self, text):
+        """evaluate_prosody's scores for everything pushed so far (the most
+        recent max_seconds of it)."""
+        if self._audio is not None:
+            with self._lock:
+                audio = self._audio.audio()
+                f0, voiced_flag = pitch_tracker(self.tracker)(audio, self._audio.sr)
+                return _score(f0, voiced_flag, len(audio) / self._audio.sr, text)
+        with self._track_lock:
+            self._track_queued()
+            with self._lock:
+                seconds = self.samples / self.sr
+                if self._tracked[0].overwritten:
+                    seconds = len(self._tracked[0]) * _HOP / self.sr
+                tracked = [ring.values() for ring in self._tracked]
+                # Trailing centering padding, without consuming it: more
+                # audio may still be pushed.
+                tail = np.pad(self._pending, (0, _FRAME // 2))
+                if not self._tracked[0].written and len(tail) < _FRAME:
+                    tail = np.pad(tail, (0, _FRAME - len(tail)))
+        frames = _frames(tail, _FRAME, _HOP)
+        if len(frames):
+            tracked = [np.concatenate(pair) for pair in zip(tracked, _yin_frames(frames, self.sr))]
+        f0, voiced_flag = _yin_voicing(*tracked, self.sr)
+        return _score(f0, voiced_flag, seconds, text)
@@ -0,0 +1,200 @@
+"""Prosody scoring in a small, bounded process pool.
+
+Prosody used to be scored inline on the session's worker once the stream
+ended: librosa's pitch tracking holds the GIL and the cores live inference
+needs, and when many sentences finish at once every one of those workers is
+busy with it at the same time. ProsodyPool runs ProsodyAccumulator.scores()
+in PROSODY_WORKERS separate processes instead, niced by PROSODY_NICE so the
+kernel favours live inference, with two limits:
+
+  * At most PROSODY_QUEUE_MAX jobs wait for a worker. Past that a job is
+    refused straight away and reported as dropped, rather than queued behind
+    work it couldn't finish in time anyway.
+  * Each job has PROSODY_DEADLINE_SECONDS from submission. One that isn't
+    done by then is reported as late (and cancelled if it hasn't started);
+    scores that arrive after that are discarded.
+
+Every job's callback gets exactly one message: the four prosody scores and
+status "ok", or the scores as None and status "late", "dropped" or "failed".
+
+PROSODY_WORKERS=0 scores inline on the caller's thread, as before.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from prosody_eval import warmup, warmup_async
+
+logger = logging.getLogger(__name__)
+
+PROSODY_WORKERS = int(os.environ.get("PROSODY_WORKERS", "2"))
+PROSODY_QUEUE_MAX = int(os.environ.get("PROSODY_QUEUE_MAX", "16"))
+PROSODY_DEADLINE_SECONDS = float(os.environ.get("PROSODY_DEADLINE_SECONDS", "5"))
+PROSODY_NICE = int(os.environ.get("PROSODY_NICE", "10"))
+
+SCORE_KEYS = ("monotony_score", "rhythm_score", "boundary_score", "speaking_rate")
+STATUSES = ("ok", "late", "dropped", "failed")
+
+
+def prosody_message(status, scores=None):
+    """The 'prosody' socket message: scores (None unless status is "ok")
+    plus status."""
+    message = {key: (scores or {}).get(key) for key in SCORE_KEYS}
+    message["status"] = status
+    return message
+
+
+def _init_worker(nice):
+    if nice:
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+    # Pay pyin's JIT compile here rather than inside the first job's deadline.
+    warmup()
+
+
+def _score(accumulator, text):
+    return accumulator.scores(text)
+
+
+class _Job:
+    def __init__(self, pool, callback):
+        self._pool = pool
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._reported = False
+        self.timer = None
+
+    def report(self, status, scores=None):
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        self._pool._count(status)
+        try:
+            self._callback(prosody_message(status, scores))
+        except Exception:
+            logger.exception("Prosody callback failed")
+
+    def expire(self, future):
+        future.cancel()
+        self.report("late")
+
+    def done(self, future):
+        if self.timer is not None:
+            self.timer.cancel()
+        self._pool._finished()
+        if future.cancelled():
+            return
+        try:
+            scores = future.result()
+        except BrokenProcessPool:
+            logger.error("Prosody worker died, restarting the pool")
+            self._pool._reset()
+            self.report("failed")
+            return
+        except Exception:
+            logger.exception("Prosody scoring failed")
+            self.report("failed")
+            return
+        self.report("ok", scores)
+
+
+class ProsodyPool:
+    """Scores finished sessions' prosody off the live-session workers.
+
+    Args:
+        workers: worker processes; 0 scores inline in submit().
+        max_queue: jobs allowed to wait for a worker before new ones are
+                   dropped.
+        deadline: seconds from submit() before a job is reported late.
+        executor: run jobs here instead of a process pool of our own (the
+                  pool still applies the queue limit and deadlines).
+    """
+
+    def __init__(self, workers=PROSODY_WORKERS, max_queue=PROSODY_QUEUE_MAX,
+                 deadline=PROSODY_DEADLINE_SECONDS, nice=PROSODY_NICE, executor=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.nice = nice
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counts = dict.fromkeys(STATUSES, 0)
+
+    def start(self):
+        """Start and warm up the worker processes now rather than on the
+        first submit() (or, inline, warm up this process in the background)."""
+        if not self.workers:
+            warmup_async()
+            return None
+        with self._lock:
+            if self._executor is None:
+                # fork, like inference_pool: spawn would re-import main.py in
+                # every worker. Call start() early, before the server's
+                # threads are running.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_worker, initargs=(self.nice,))
+                for _ in range(self.workers):
+                    self._executor.submit(os.getpid)
+            return self._executor
+
+    def submit(self, accumulator, text, callback):
+        """Score accumulator for text; callback(message) is called exactly
+        once, possibly before this returns, from whichever thread settles
+        the job."""
+        job = _Job(self, callback)
+        if not self.workers:
+            try:
+                scores = accumulator.scores(text)
+            except Exception:
+                logger.exception("Prosody scoring failed")
+                job.report("failed")
+                return
+            job.report("ok", scores)
+            return
+
+        executor = self.start()
+        with self._lock:
+            full = self._in_flight >= self.workers + self.max_queue
+            if not full:
+                self._in_flight += 1
+        if full:
+            job.report("dropped")
+            return
+        try:
+            future = executor.submit(_score, accumulator, text)
+        except (BrokenProcessPool, RuntimeError):
+            logger.exception("Prosody pool unavailable, restarting it")
+            self._finished()
+            self._reset()
+            job.report("failed")
+            return
+        job.timer = threading.Timer(self.deadline, job.expire, (future,))
+        job.timer.daemon = True
+        job.timer.start()
+        future.add_done_callback(job.done)
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _count(self, status):
+        with self._lock:
+            self._counts[status] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "in_flight": self._in_flight, **self._counts}
@@ -0,0 +1,84 @@
+"""Which concurrency model the Socket.IO server runs on, and how CPU work
+and worker-side emits cross between it and the native worker threads.
+
+With async_mode="threading" every connected socket holds an OS thread for
+as long as it's open, so a node could only keep as many clients connected
+as it could hold threads, however idle they were. SOCKETIO_ASYNC_MODE=gevent
+runs each connection as a greenlet on one event loop instead, so idle
+connections cost a few KB each; "threading" stays the default (and what
+`python main.py` uses unless told otherwise).
+
+Under gevent, CPU-bound work (wav2vec2 inference, alignment) must not run
+on the loop or every connection stalls behind it, so:
+
+  * native_executor() is a pool of real OS threads — the hub's native
+    threadpool under gevent, a plain ThreadPoolExecutor otherwise. The
+    session pumps (live_session) run there; prosody already has its own
+    processes (prosody_pool).
+  * start_native_thread() runs a long-lived loop (the inference batcher) on
+    a daemon OS thread; threading.Thread would be a greenlet once patched.
+  * in_loop(fn) wraps a callback those threads invoke so that it runs on
+    the event loop, where emitting to a socket is safe. Under threading
+    it's fn itself.
+
+patch() has to run before anything else is imported (main.py calls it
+first); it monkey-patches the standard library for gevent and captures the
+loop in_loop() posts to.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# "threading" or "gevent".
+SOCKETIO_ASYNC_MODE = os.environ.get("SOCKETIO_ASYNC_MODE", "threading")
+ASYNC_MODES = ("threading", "gevent")
+
+_hub = None
+
+
+def _check(mode):
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"Unknown SOCKETIO_ASYNC_MODE {mode!r}")
+
+
+def patch(mode=SOCKETIO_ASYNC_MODE):
+    """Prepare the process for `mode`. Returns the async_mode to hand to
+    SocketIO."""
+    global _hub
+    _check(mode)
+    if mode == "gevent":
+        from gevent import get_hub, monkey
+        monkey.patch_all()
+        _hub = get_hub()
+    return mode
+
+
+def native_executor(max_workers, thread_name_prefix="", mode=SOCKETIO_ASYNC_MODE):
+    """An executor whose workers are OS threads in every mode."""
+    _check(mode)
+    if mode == "gevent":
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+def start_native_thread(target, name="", mode=SOCKETIO_ASYNC_MODE):
+    """Run target() on a daemon OS thread in every mode: it never holds up
+    interpreter exit, so it suits loops that never return."""
+    _check(mode)
+    if mode == "gevent":
+        from gevent import monkey
+        monkey.get_original("_thread", "start_new_thread")(target, ())
+        return
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+
+def in_loop(fn):
+    """fn, but when called from a native thread under gevent it's queued to
+    run on the event loop instead (and returns None)."""
+    if _hub is None:
+        return fn
+
+    def call(*args):
+        _hub.loop.run_callback_threadsafe(fn, *args)
+    return call
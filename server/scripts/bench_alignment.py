@@ -0,0 +1,241 @@
+"""Alignment throughput benchmarks on synthetic CTC logits.
+
+Sweeps reference sentence length, chunk size (and so chunk count),
+mispronunciation/omission rates, vocab size and alignment engine. Each
+configuration streams random sentences through the engine's feed() in
+chunk-sized pieces and reports events/sec, per-chunk feed() latency
+percentiles and, in a separate tracemalloc pass so tracing doesn't skew the
+timings, peak traced memory and blocks left allocated per sentence.
+
+Logits come from the same kind of generator as tests/unit/test_alignment.py:
+each decoded phoneme peaks on its own frames, held for a few frames between
+blanks, with some phonemes substituted or left out. "tiny" is that test's
+FakeTokenizer vocab; any number is a synthetic vocab with that many phoneme
+tokens (the timit-phoneme tokenizer has about 40).
+
+Results are written as JSON (with the git commit they were measured at) so
+runs can be compared across commits:
+
+    python server/scripts/bench_alignment.py --out before.json
+    ... change something ...
+    python server/scripts/bench_alignment.py --out after.json --compare before.json
+
+Usage (from the repo root):
+    python server/scripts/bench_alignment.py
+    python server/scripts/bench_alignment.py --lengths 10 120 --chunk-ms 200 500 \\
+        --error-rates 0:0 0.1:0.05 0.3:0.1 --vocab tiny 40 --engines greedy viterbi
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVER_DIR))
+
+from forced_align import make_aligner  # noqa: E402
+from tests.unit.test_alignment import FakeTokenizer  # noqa: E402
+
+FRAMES_PER_SECOND = 50  # wav2vec2: one logit frame per 20 ms
+ENGINES = ("greedy", "viterbi")
+
+
+class SyntheticTokenizer:
+    """Blank, a few special tokens, a word separator and n_phonemes phonemes."""
+
+    pad_token_id = 0
+    all_special_ids = [0, 1, 2, 3]
+
+    def __init__(self, n_phonemes):
+        tokens = ["<pad>", "<s>", "</s>", "<unk>", "|"]
+        tokens += [f"p{i}" for i in range(n_phonemes)]
+        self._vocab = {t: i for i, t in enumerate(tokens)}
+
+    def get_vocab(self):
+        return dict(self._vocab)
+
+
+def make_tokenizer(vocab):
+    return FakeTokenizer() if vocab == "tiny" else SyntheticTokenizer(int(vocab))
+
+
+def phoneme_tokens(tokenizer):
+    special = set(tokenizer.all_special_ids)
+    return [t for t, i in tokenizer.get_vocab().items()
+            if i not in special and t not in ("|", " ") and not t.startswith("_f")]
+
+
+def synthetic_logits(rng, reference, vocab, phoneme_ids, substitute, omit):
+    """(frames, vocab) CTC logits for one reading of reference: each phoneme
+    held for 2-4 frames after 1-3 blanks, swapped for a random phoneme with
+    probability substitute or left out with probability omit."""
+    frames = []
+    for phoneme in reference:
+        frames += [0] * int(rng.integers(1, 4))
+        roll = rng.random()
+        if roll < omit:
+            continue
+        token = vocab[phoneme]
+        if roll < omit + substitute:
+            token = int(rng.choice(phoneme_ids))
+        frames += [token] * int(rng.integers(2, 5))
+    frames += [0] * 3
+    logits = rng.normal(0.0, 1.0, size=(len(frames), len(vocab))).astype(np.float32)
+    logits[np.arange(len(frames)), frames] += 12.0
+    return logits
+
+
+def sentences(seed, tokenizer, length, count, substitute, omit, chunk_frames):
+    """Deterministic (reference, chunks) pairs for one configuration."""
+    rng = np.random.default_rng(seed)
+    vocab = tokenizer.get_vocab()
+    phonemes = phoneme_tokens(tokenizer)
+    phoneme_ids = [vocab[p] for p in phonemes]
+    for _ in range(count):
+        reference = [str(p) for p in rng.choice(phonemes, size=length)]
+        logits = synthetic_logits(rng, reference, vocab, phoneme_ids, substitute, omit)
+        chunks = [logits[i:i + chunk_frames] for i in range(0, len(logits), chunk_frames)]
+        yield reference, chunks
+
+
+def align(engine, tokenizer, reference, chunks, timings=None):
+    aligner = make_aligner(reference, tokenizer, engine=engine)
+    events = 0
+    for chunk in chunks:
+        start = time.perf_counter()
+        events += len(aligner.feed(chunk))
+        if timings is not None:
+            timings.append(time.perf_counter() - start)
+    return events + len(aligner.finish())
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench(config, count, seed, repeats):
+    tokenizer = make_tokenizer(config["vocab"])
+    chunk_frames = max(1, config["chunk_ms"] * FRAMES_PER_SECOND // 1000)
+    data = list(sentences(seed, tokenizer, config["length"], count,
+                          config["substitute"], config["omit"], chunk_frames))
+
+    for reference, chunks in data[:1]:  # warm up caches before timing
+        align(config["engine"], tokenizer, reference, chunks)
+    timings, events = [], 0
+    for _ in range(repeats):
+        for reference, chunks in data:
+            events += align(config["engine"], tokenizer, reference, chunks, timings)
+    total = sum(timings)
+    ms = sorted(t * 1000 for t in timings)
+
+    tracemalloc.start()
+    blocks, peaks = 0, []
+    for reference, chunks in data:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        align(config["engine"], tokenizer, reference, chunks)
+        after = tracemalloc.take_snapshot()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        blocks += sum(max(0, s.count_diff) for s in after.compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    return {
+        **config,
+        "chunks_per_sentence": statistics.fmean(len(c) for _, c in data),
+        "events_per_sec": events / total if total else 0.0,
+        "chunk_ms_mean": statistics.fmean(ms),
+        "chunk_ms_p50": percentile(ms, 0.50),
+        "chunk_ms_p95": percentile(ms, 0.95),
+        "chunk_ms_p99": percentile(ms, 0.99),
+        "retained_blocks_per_sentence": blocks / len(data),
+        "peak_kib_per_sentence": statistics.fmean(peaks) / 1024,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def config_key(result):
+    return (result["engine"], str(result["vocab"]), result["length"], result["chunk_ms"],
+            result["substitute"], result["omit"])
+
+
+def print_results(results, baseline=None):
+    base = {config_key(r): r for r in (baseline or [])}
+    header = (f"{'engine':>8} {'vocab':>5} {'len':>4} {'chunk':>5} {'sub':>4} {'omit':>4} "
+              f"{'events/s':>10} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'kept':>7} {'KiB':>6}")
+    print(header + ("  vs base p95" if base else ""))
+    for r in results:
+        line = (f"{r['engine']:>8} {r['vocab']:>5} {r['length']:>4} {r['chunk_ms']:>5} "
+                f"{r['substitute']:>4} {r['omit']:>4} {r['events_per_sec']:>10.0f} "
+                f"{r['chunk_ms_p50']:>7.3f} {r['chunk_ms_p95']:>7.3f} {r['chunk_ms_p99']:>7.3f} "
+                f"{r['retained_blocks_per_sentence']:>7.0f} {r['peak_kib_per_sentence']:>6.1f}")
+        old = base.get(config_key(r))
+        if old and old["chunk_ms_p95"]:
+            line += f"  {r['chunk_ms_p95'] / old['chunk_ms_p95']:>10.2f}x"
+        print(line)
+
+
+def error_rate(value):
+    substitute, _, omit = value.partition(":")
+    return float(substitute), float(omit or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 30, 120],
+                        help="reference sentence lengths, in phonemes")
+    parser.add_argument("--chunk-ms", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--error-rates", type=error_rate, nargs="+",
+                        default=[(0.0, 0.0), (0.1, 0.05), (0.3, 0.1)],
+                        help="substitution:omission rate pairs, e.g. 0.1:0.05")
+    parser.add_argument("--vocab", nargs="+", default=["tiny", "40"],
+                        help='"tiny" (FakeTokenizer) or a number of phoneme tokens')
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--sentences", type=int, default=10,
+                        help="random sentences per configuration")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="timed passes over each configuration's sentences")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for engine, vocab, length, chunk_ms, (substitute, omit) in itertools.product(
+            args.engines, args.vocab, args.lengths, args.chunk_ms, args.error_rates):
+        config = {"engine": engine, "vocab": vocab, "length": length, "chunk_ms": chunk_ms,
+                  "substitute": substitute, "omit": omit}
+        results.append(bench(config, args.sentences, args.seed, args.repeats))
+
+    baseline = json.loads(args.compare.read_text())["results"] if args.compare else None
+    print_results(results, baseline)
+    if args.out:
+        args.out.write_text(json.dumps({
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Load benchmark for a running server: many idle sockets plus live sessions.
+
+Opens --idle connections that just stay connected (kids sitting on the
+lesson page) and --active concurrent sessions that each `start` a sentence,
+stream the bundled test wav in --chunk-ms chunks at real-time pace (or as
+fast as possible with --no-realtime) and `stop`, for --rounds sentences
+each. Reports, as JSON:
+
+  * connect: time to open a socket, p50/p95/max, and how many failed;
+  * first_result: `start` to the first scored word;
+  * stop_to_result: `stop` to the final `result` — what a kid waits for;
+  * busy: sessions turned away, by reason;
+  * the server's /metrics afterwards.
+
+Used to size workers (see the README's "Production server" section): raise
+--idle and --active against one worker until stop_to_result p95 or busy
+climbs.
+
+Needs aiohttp for the asyncio Socket.IO client (pip install aiohttp).
+
+Usage (from the repo root, with the server running):
+    python server/scripts/bench_load.py --url http://localhost:8080 --idle 1000 --active 20
+    python server/scripts/bench_load.py --idle 0 --active 50 --no-realtime --rounds 1
+
+Only audio mode is exercised; logits mode would need wav2vec2 on the client.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.request import urlopen
+
+import numpy as np
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVER_DIR))
+
+import librosa  # noqa: E402
+import socketio  # noqa: E402
+
+# The tracked copy at the repo root; server/testfiles is git-ignored.
+TEST_WAV = SERVER_DIR.parent / "testfiles" / "uploaded_test.wav"
+SR = 16000
+
+# The lesson fixture the e2e test uses; what's said in the wav doesn't
+# matter for load, every chunk is inferred and aligned either way.
+SENTENCE = "the quick brown fox"
+WORDS_IPA = [
+    {"word": "the", "phonemes": ["ð", "ə"]},
+    {"word": "quick", "phonemes": ["k", "w", "ɪ", "k"]},
+    {"word": "brown", "phonemes": ["b", "ɹ", "aʊ", "n"]},
+    {"word": "fox", "phonemes": ["f", "ɑ", "k", "s"]},
+]
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "n": len(values),
+        "p50_ms": round(1000 * statistics.median(values), 1),
+        "p95_ms": round(1000 * values[min(len(values) - 1, int(0.95 * len(values)))], 1),
+        "max_ms": round(1000 * values[-1], 1),
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.connect = []
+        self.connect_failed = 0
+        self.first_result = []
+        self.stop_to_result = []
+        self.busy = Counter()
+        self.errors = Counter()
+
+
+async def connect(url, transports, stats):
+    client = socketio.AsyncClient(reconnection=False)
+    started = time.perf_counter()
+    try:
+        await client.connect(url, transports=transports)
+    except Exception:
+        stats.connect_failed += 1
+        return None
+    stats.connect.append(time.perf_counter() - started)
+    return client
+
+
+async def run_session(client, chunks, chunk_seconds, realtime, stats, timeout):
+    loop = asyncio.get_running_loop()
+    first, done = loop.create_future(), loop.create_future()
+
+    def settle(future, value):
+        if not future.done():
+            future.set_result(value)
+
+    client.on("chunk_results", lambda data: settle(first, time.perf_counter()))
+    client.on("partial_result", lambda data: settle(first, time.perf_counter()))
+    client.on("result", lambda data: settle(done, time.perf_counter()))
+    client.on("busy", lambda data: settle(done, ("busy", data.get("reason"))))
+    client.on("error", lambda data: settle(done, ("error", data.get("message"))))
+
+    started = time.perf_counter()
+    await client.emit("start", {"userId": "demo", "sentence": SENTENCE,
+                                "words_ipa": WORDS_IPA, "chunk_results": True})
+    for chunk in chunks:
+        if done.done():
+            break
+        await client.emit("chunk", chunk.tobytes())
+        if realtime:
+            await asyncio.sleep(chunk_seconds)
+    stopped = time.perf_counter()
+    await client.emit("stop")
+    try:
+        outcome = await asyncio.wait_for(done, timeout)
+    except asyncio.TimeoutError:
+        stats.errors["timeout"] += 1
+        return
+    if isinstance(outcome, tuple):
+        kind, reason = outcome
+        (stats.busy if kind == "busy" else stats.errors)[reason] += 1
+        return
+    stats.stop_to_result.append(outcome - stopped)
+    if first.done():
+        stats.first_result.append(first.result() - started)
+
+
+async def active_client(args, chunks, stats):
+    client = await connect(args.url, args.transports, stats)
+    if client is None:
+        return
+    try:
+        for _ in range(args.rounds):
+            await run_session(client, chunks, args.chunk_ms / 1000, args.realtime, stats,
+                              args.timeout)
+    finally:
+        await client.disconnect()
+
+
+async def main_async(args):
+    audio, _ = librosa.load(TEST_WAV, sr=SR)
+    step = int(SR * args.chunk_ms / 1000)
+    chunks = [audio[i:i + step].astype(np.float32) for i in range(0, len(audio), step)]
+    stats = Stats()
+
+    idle = []
+    for batch_start in range(0, args.idle, args.connect_batch):
+        batch = range(batch_start, min(args.idle, batch_start + args.connect_batch))
+        idle.extend(await asyncio.gather(*(connect(args.url, args.transports, stats)
+                                           for _ in batch)))
+    idle_connect = list(stats.connect)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(active_client(args, chunks, stats) for _ in range(args.active)))
+    elapsed = time.perf_counter() - started
+
+    with urlopen(args.url.rstrip("/") + "/metrics") as response:
+        metrics = json.load(response)
+    await asyncio.gather(*(client.disconnect() for client in idle if client is not None))
+
+    return {
+        "idle": args.idle,
+        "active": args.active,
+        "rounds": args.rounds,
+        "chunk_ms": args.chunk_ms,
+        "realtime": args.realtime,
+        "elapsed_s": round(elapsed, 2),
+        "connect": {**(percentiles(idle_connect) or {}), "failed": stats.connect_failed},
+        "first_result": percentiles(stats.first_result),
+        "stop_to_result": percentiles(stats.stop_to_result),
+        "busy": dict(stats.busy),
+        "errors": dict(stats.errors),
+        "server_metrics": metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--idle", type=int, default=100)
+    parser.add_argument("--active", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3, help="sentences per active client")
+    parser.add_argument("--chunk-ms", type=int, default=250)
+    parser.add_argument("--no-realtime", dest="realtime", action="store_false")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--connect-batch", type=int, default=100,
+                        help="idle sockets opened at once")
+    parser.add_argument("--transports", nargs="+", default=["websocket"])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Prosody scoring latency per pitch tracker.
+
+Times evaluate_prosody end to end (pitch tracking plus scoring) on the
+bundled test wav and on synthetic utterances of increasing length, once per
+PITCH_TRACKER. The first call per tracker is reported separately: for pyin in
+a fresh environment it includes numba's JIT compile, which warmup_async
+otherwise hides at startup.
+
+Synthetic utterances come from tests/unit/test_prosody_eval.py's generator.
+
+Usage (from the repo root):
+    python server/scripts/bench_prosody.py
+    python server/scripts/bench_prosody.py --seconds 2 5 10 --trackers yin --repeats 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SERVER_DIR))
+
+import librosa  # noqa: E402
+
+from prosody_eval import _TRACKERS, evaluate_prosody  # noqa: E402
+from tests.unit.test_prosody_eval import SR, TEST_WAV, synthetic_utterance  # noqa: E402
+
+
+def utterance(seconds, seed):
+    """About `seconds` of alternating rising/falling syllables."""
+    rng = np.random.default_rng(seed)
+    syllables, total = [], 0.4
+    while total < seconds:
+        length = float(rng.uniform(0.12, 0.35))
+        start = float(rng.uniform(120, 260))
+        syllables.append((length, start, start * float(rng.uniform(0.85, 1.15))))
+        total += length + 0.12
+    return synthetic_utterance(syllables, seed=seed)
+
+
+def bench(tracker, name, audio, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        evaluate_prosody(audio, "Is it?", sr=SR, tracker=tracker)
+        timings.append(time.perf_counter() - start)
+    ms = sorted(t * 1000 for t in timings)
+    seconds = len(audio) / SR
+    return {
+        "tracker": tracker,
+        "audio": name,
+        "seconds": round(seconds, 2),
+        "ms_p50": ms[len(ms) // 2],
+        "ms_p95": ms[min(len(ms) - 1, int(0.95 * len(ms)))],
+        "ms_mean": statistics.fmean(ms),
+        "real_time_factor": statistics.fmean(timings) / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2.0, 5.0, 10.0],
+                        help="synthetic utterance lengths")
+    parser.add_argument("--trackers", nargs="+", choices=sorted(_TRACKERS),
+                        default=sorted(_TRACKERS))
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    inputs = [("uploaded_test.wav", librosa.load(TEST_WAV, sr=SR)[0])] if os.path.exists(TEST_WAV) else []
+    inputs += [(f"synthetic {s:g}s", utterance(s, args.seed)) for s in args.seconds]
+
+    results, first_calls = [], {}
+    for tracker in args.trackers:
+        start = time.perf_counter()
+        evaluate_prosody(inputs[0][1], "Hi.", sr=SR, tracker=tracker)
+        first_calls[tracker] = (time.perf_counter() - start) * 1000
+        results += [bench(tracker, name, audio, args.repeats) for name, audio in inputs]
+
+    for tracker, ms in first_calls.items():
+        print(f"{tracker:>5} first call: {ms:.0f} ms")
+    print(f"{'tracker':>7} {'audio':>20} {'sec':>5} {'p50 ms':>8} {'p95 ms':>8} {'RTF':>7}")
+    for r in results:
+        print(f"{r['tracker']:>7} {r['audio']:>20} {r['seconds']:>5} {r['ms_p50']:>8.1f} "
+              f"{r['ms_p95']:>8.1f} {r['real_time_factor']:>7.4f}")
+    if args.out:
+        args.out.write_text(json.dumps({"args": {k: (str(v) if isinstance(v, Path) else v)
+                                                 for k, v in vars(args).items()},
+                                        "first_call_ms": first_calls,
+                                        "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
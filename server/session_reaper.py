@@ -0,0 +1,104 @@
+"""Idle and lifetime limits for live sessions.
+
+A session only ends when its client sends `stop` or disconnects, so a
+half-open socket (a phone that lost signal, a tab the OS froze) kept its
+sessions entry, queue, audio buffers, admission slot and memory reservation
+until the process restarted. SessionReaper sweeps the session table every
+SESSION_REAP_INTERVAL_SECONDS and ends any session that has had no chunk for
+SESSION_IDLE_TIMEOUT_SECONDS or has run for longer than SESSION_MAX_SECONDS:
+
+  * first the normal way, as if the client had sent `stop`, so whatever was
+    scored so far is finalized and everything is released by the session's
+    own teardown;
+  * then, if the session is still in the table SESSION_REAP_GRACE_SECONDS
+    later (its teardown never ran), by aborting it outright.
+
+Reaps are counted by reason ("idle", "max_duration", and "aborted" for the
+second step) and reported on /metrics.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.environ.get("SESSION_IDLE_TIMEOUT_SECONDS", "30"))
+SESSION_MAX_SECONDS = float(os.environ.get("SESSION_MAX_SECONDS", "300"))
+SESSION_REAP_INTERVAL_SECONDS = float(os.environ.get("SESSION_REAP_INTERVAL_SECONDS", "5"))
+SESSION_REAP_GRACE_SECONDS = float(os.environ.get("SESSION_REAP_GRACE_SECONDS", "15"))
+
+REAP_REASONS = ("idle", "max_duration", "aborted")
+
+
+class SessionReaper:
+    """Ends sessions that went quiet or ran too long.
+
+    Args:
+        sessions: the session table (a session_table.SessionTable, or
+                  anything with a snapshotting items()). Sessions need
+                  'started' and 'last_active' (time.monotonic() values, the
+                  latter refreshed on every chunk).
+        end: end(sid, session, reason) — wind the session down as a stop
+             would.
+        abort: abort(sid, session) — tear it down now; must remove it from
+               the table.
+    """
+
+    def __init__(self, sessions, end, abort, idle_timeout=SESSION_IDLE_TIMEOUT_SECONDS,
+                 max_duration=SESSION_MAX_SECONDS, interval=SESSION_REAP_INTERVAL_SECONDS,
+                 grace=SESSION_REAP_GRACE_SECONDS, clock=time.monotonic):
+        self._sessions = sessions
+        self._end = end
+        self._abort = abort
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.interval = interval
+        self.grace = grace
+        self._clock = clock
+        self._counts = dict.fromkeys(REAP_REASONS, 0)
+        self._counts_lock = threading.Lock()
+
+    def run(self, sleep=time.sleep):
+        """Sweep forever; run it as a background task."""
+        while True:
+            sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Session reaper sweep failed")
+
+    def sweep(self):
+        """One pass over the table. Returns [(sid, reason), ...] reaped."""
+        now = self._clock()
+        reaped = []
+        for sid, session in self._sessions.items():
+            reaped_at = session.get('reaped_at')
+            if reaped_at is not None:
+                if now - reaped_at >= self.grace:
+                    reaped.append((sid, "aborted"))
+                    self._reap(sid, "aborted", self._abort, sid, session)
+                continue
+            if now - session['started'] >= self.max_duration:
+                reason = "max_duration"
+            elif now - session['last_active'] >= self.idle_timeout:
+                reason = "idle"
+            else:
+                continue
+            session['reaped_at'] = now
+            reaped.append((sid, reason))
+            self._reap(sid, reason, self._end, sid, session, reason)
+        return reaped
+
+    def _reap(self, sid, reason, action, *args):
+        logger.info("Reaping session %s (%s)", sid, reason)
+        with self._counts_lock:
+            self._counts[reason] += 1
+        try:
+            action(*args)
+        except Exception:
+            logger.exception("Reaping session %s failed", sid)
+
+    def stats(self):
+        with self._counts_lock:
+            return dict(self._counts)
@@ -0,0 +1,104 @@
+"""Resuming a live session after a transient disconnect.
+
+A dropped socket used to end its session on the spot: the words already
+scored were lost and the kid had to record the sentence again, inferring
+all of it a second time. A session started with resumable: true is given a
+resume token instead, and when its socket drops for any reason other than
+the client closing it, the session — and the lesson it belongs to — is
+parked under that token for SESSION_RESUME_GRACE_SECONDS:
+
+  * its aligner, model stream, queued chunks, audio buffers and results
+    stay as they are; queued chunks keep being scored;
+  * whatever it would have sent meanwhile is held, not lost.
+
+A client that reconnects in time sends `resume` with the token and the
+session moves to the new socket. The reply says how many chunks the server
+already has so the client resends only the ones that never arrived. Once
+the grace period is over the session is ended as a disconnect always was.
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+
+from session_reaper import SESSION_REAP_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SESSION_RESUME_GRACE_SECONDS = float(os.environ.get("SESSION_RESUME_GRACE_SECONDS", "30"))
+
+
+def new_resume_token():
+    return secrets.token_urlsafe(18)
+
+
+class ResumeTable:
+    """Parked sessions by resume token.
+
+    Args:
+        expire: expire(token, lesson, session) — called once, off the lock,
+                for an entry nobody resumed within the grace period.
+    """
+
+    def __init__(self, expire, grace=SESSION_RESUME_GRACE_SECONDS,
+                 interval=SESSION_REAP_INTERVAL_SECONDS, clock=time.monotonic):
+        self._expire = expire
+        self.grace = grace
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._parked = {}  # token -> (lesson, session, parked_at)
+        self._counts = {"resumed": 0, "expired": 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._parked)
+
+    def park(self, token, lesson, session):
+        with self._lock:
+            self._parked[token] = (lesson, session, self._clock())
+
+    def tokens(self):
+        with self._lock:
+            return list(self._parked)
+
+    def resume(self, token):
+        """(lesson, session) parked under token, or None if there's nothing
+        (left) to resume."""
+        with self._lock:
+            entry = self._parked.pop(token, None)
+            if entry is None:
+                return None
+            self._counts["resumed"] += 1
+        return entry[:2]
+
+    def run(self, sleep=time.sleep):
+        """Expire entries forever; run it as a background task."""
+        while True:
+            sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Resume table sweep failed")
+
+    def sweep(self):
+        """Expire everything parked longer than the grace period. Returns
+        the expired tokens."""
+        now = self._clock()
+        with self._lock:
+            expired = [(token, entry) for token, entry in self._parked.items()
+                       if now - entry[2] >= self.grace]
+            for token, _ in expired:
+                del self._parked[token]
+            self._counts["expired"] += len(expired)
+        for token, (lesson, session, _) in expired:
+            try:
+                self._expire(token, lesson, session)
+            except Exception:
+                logger.exception("Expiring parked session failed")
+        return [token for token, _ in expired]
+
+    def stats(self):
+        with self._lock:
+            return {"parked": len(self._parked), **self._counts}
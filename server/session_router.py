@@ -0,0 +1,210 @@
+"""Running several server processes behind one load balancer.
+
+Two things stop a second process from just working:
+
+  * Results are emitted with socketio.emit(to=sid), which only reaches
+    sockets connected to the emitting process. SOCKETIO_MESSAGE_QUEUE (e.g.
+    redis://redis:6379/0) hands Flask-SocketIO a shared queue, so any
+    process can emit to any client and the owning node can report results
+    wherever its client is connected now.
+  * The session table is per process. A session lives on the node that got
+    its `start` (its aligner state, model stream and audio are there), so
+    that node has to see every `chunk` and `stop`. The load balancer must
+    keep a client's socket on one node, which Socket.IO needs anyway: a
+    sid exists only on the node its connection was opened on. What does
+    outlive a connection is a resumable session's resume token (see
+    session_resume), and the client may reconnect to another node with it.
+    The session router records which node holds each token, so that node
+    can tell the client where its session is parked instead of reporting
+    it expired.
+
+The router is in-process by default (one node). SESSION_ROUTER_URL=redis://…
+shares it between nodes: each claim is a key holding the owner's node id
+with a SESSION_ROUTE_TTL_SECONDS expiry, refreshed while the session is
+live, so routes of a node that crashed expire on their own. NODE_ID names
+this process (default host:pid).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")
+SESSION_ROUTER_URL = os.environ.get("SESSION_ROUTER_URL", "")
+SESSION_ROUTE_TTL_SECONDS = float(os.environ.get("SESSION_ROUTE_TTL_SECONDS", "60"))
+NODE_ID = os.environ.get("NODE_ID", "")
+
+_KEY_PREFIX = "talky:session:"
+
+
+def node_id():
+    """This process's node id. Not cached: a worker forked from a preloaded
+    parent gets its own pid."""
+    return NODE_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionRouter:
+    """Resume token -> owning node. Subclasses store the routes."""
+
+    backend = None
+
+    def __init__(self, ttl=SESSION_ROUTE_TTL_SECONDS, node=None):
+        self.ttl = ttl
+        self._node = node
+        self._claimed = 0
+        self._moved = 0
+        self._counts_lock = threading.Lock()
+
+    @property
+    def node(self):
+        return self._node or node_id()
+
+    def claim(self, key):
+        """Record this node as key's owner."""
+        self._set(key)
+        with self._counts_lock:
+            self._claimed += 1
+
+    def owner(self, key):
+        """The owning node's id, or None if nothing holds key."""
+        return self._get(key)
+
+    def elsewhere(self, key):
+        """The owning node's id if another node owns key, else None."""
+        owner = self.owner(key)
+        if owner is None or owner == self.node:
+            return None
+        with self._counts_lock:
+            self._moved += 1
+        return owner
+
+    def release(self, key):
+        """Forget key, if this node still owns it."""
+        self._delete_if_owned(key)
+
+    def run(self, live, sleep=time.sleep):
+        """Keep the routes this node still holds from expiring; run it as a
+        background task. live() returns their keys."""
+        while True:
+            sleep(self.ttl / 3)
+            try:
+                self.refresh(list(live()))
+            except Exception:
+                logger.exception("Session route refresh failed")
+
+    def refresh(self, keys):
+        raise NotImplementedError
+
+    def stats(self):
+        with self._counts_lock:
+            return {"node": self.node, "backend": self.backend,
+                    "claimed": self._claimed, "moved": self._moved}
+
+    def _set(self, key):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _delete_if_owned(self, key):
+        raise NotImplementedError
+
+
+class MemoryRouter(SessionRouter):
+    """Routes for a single node."""
+
+    backend = "memory"
+
+    def __init__(self, ttl=SESSION_ROUTE_TTL_SECONDS, node=None, clock=time.monotonic):
+        super().__init__(ttl, node)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._routes = {}  # key -> (node, expires_at)
+
+    def refresh(self, keys):
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            for key in keys:
+                if key in self._routes:
+                    self._routes[key] = (self._routes[key][0], expires_at)
+
+    def _set(self, key):
+        with self._lock:
+            self._routes[key] = (self.node, self._clock() + self.ttl)
+
+    def _get(self, key):
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                return None
+            if route[1] <= self._clock():
+                del self._routes[key]
+                return None
+            return route[0]
+
+    def _delete_if_owned(self, key):
+        with self._lock:
+            route = self._routes.get(key)
+            if route is not None and route[0] == self.node:
+                del self._routes[key]
+
+
+class RedisRouter(SessionRouter):
+    """Routes shared by every node through Redis (or anything speaking its
+    protocol)."""
+
+    backend = "redis"
+
+    def __init__(self, client, ttl=SESSION_ROUTE_TTL_SECONDS, node=None):
+        super().__init__(ttl, node)
+        self._client = client
+
+    def refresh(self, keys):
+        if not keys:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.expire(_KEY_PREFIX + key, int(self.ttl))
+        pipe.execute()
+
+    def _set(self, key):
+        self._client.set(_KEY_PREFIX + key, self.node, ex=int(self.ttl))
+
+    def _get(self, key):
+        owner = self._client.get(_KEY_PREFIX + key)
+        if owner is None:
+            return None
+        return owner.decode() if isinstance(owner, bytes) else owner
+
+    def _delete_if_owned(self, key):
+        from redis.exceptions import WatchError
+
+        name = _KEY_PREFIX + key
+        with self._client.pipeline() as pipe:
+            try:
+                pipe.watch(name)
+                owner = pipe.get(name)
+                if isinstance(owner, bytes):
+                    owner = owner.decode()
+                if owner != self.node:
+                    pipe.unwatch()
+                    return
+                pipe.multi()
+                pipe.delete(name)
+                pipe.execute()
+            except WatchError:
+                # Claimed again (by a resumed or restarted session) since
+                # we read it; it isn't ours to delete.
+                pass
+
+
+def make_router(url=SESSION_ROUTER_URL):
+    """MemoryRouter for "", RedisRouter for a redis:// URL."""
+    if not url:
+        return MemoryRouter()
+    import redis
+
+    return RedisRouter(redis.Redis.from_url(url))
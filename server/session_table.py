@@ -0,0 +1,76 @@
+"""The live session table, sharded so handlers don't serialize on one lock.
+
+Every `chunk`, `logits_chunk` and `stop` looks its session up, and the
+reaper and /metrics walk the whole table, all under the single
+sessions_lock — with thousands of connected clients that lock is on every
+message's path. SessionTable splits the table into SESSION_TABLE_SHARDS
+dicts keyed by hash(sid), each with its own lock, so lookups for different
+sessions only contend when they land in the same shard. Walks (items(),
+values(), len()) take one shard at a time and return a snapshot.
+"""
+import os
+import threading
+
+SESSION_TABLE_SHARDS = int(os.environ.get("SESSION_TABLE_SHARDS", "64"))
+
+
+class _Shard:
+    __slots__ = ("lock", "sessions")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+
+class SessionTable:
+    """sid -> session, split across `shards` independently locked dicts."""
+
+    def __init__(self, shards=SESSION_TABLE_SHARDS):
+        self._shards = [_Shard() for _ in range(max(1, int(shards)))]
+
+    def _shard(self, sid):
+        return self._shards[hash(sid) % len(self._shards)]
+
+    def get(self, sid):
+        shard = self._shard(sid)
+        with shard.lock:
+            return shard.sessions.get(sid)
+
+    def put(self, sid, session):
+        shard = self._shard(sid)
+        with shard.lock:
+            shard.sessions[sid] = session
+
+    def pop(self, sid):
+        """Remove and return sid's session, or None."""
+        shard = self._shard(sid)
+        with shard.lock:
+            return shard.sessions.pop(sid, None)
+
+    def remove(self, sid, session):
+        """Remove sid only if it still maps to `session` (not a newer one
+        started on the same socket). True if it did."""
+        shard = self._shard(sid)
+        with shard.lock:
+            if shard.sessions.get(sid) is not session:
+                return False
+            del shard.sessions[sid]
+            return True
+
+    def items(self):
+        """[(sid, session), ...] across every shard; a snapshot."""
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend(shard.sessions.items())
+        return items
+
+    def values(self):
+        return [session for _, session in self.items()]
+
+    def __len__(self):
+        total = 0
+        for shard in self._shards:
+            with shard.lock:
+                total += len(shard.sessions)
+        return total
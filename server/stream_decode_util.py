@@ -1,16 +1,19 @@
+import math
+import os
+
 import numpy as np
 
+from phoneme_vocab import normalize, phoneme_vocab
 from prosody_eval import evaluate_prosody
+from vad import VAD_ENABLED, blank_logits, is_speech
 
-_NORM_MAP = [("ɹ", "r"), ("ʌ", "ə"), ("v", "f"), ("ɔ", "ɑ"), ("ʒ", "ʃ"), ("ɚ", "ɝ")]
-
-R_COLORED_VOWEL = "ɝ"
+# Audio (ms) carried into each server-side chunk's inference window; 0 runs
+# every chunk in isolation. See LeftContextWindow.
+STREAM_LEFT_CONTEXT_MS = int(os.environ.get("STREAM_LEFT_CONTEXT_MS", "0"))
 
+SAMPLES_PER_FRAME = 320  # wav2vec2 frame hop at 16 kHz
 
-def normalize(phoneme):
-    for src, dst in _NORM_MAP:
-        phoneme = phoneme.replace(src, dst)
-    return phoneme
+R_COLORED_VOWEL = "ɝ"
 
 
 # exp(min(target_logit - decoded_logit, 0)) is the softmax probability ratio
@@ -24,78 +27,150 @@ GOP_TEMPERATURE = 5.0
 def gop_score(target_logit, decoded_logit, temperature=GOP_TEMPERATURE):
     """Graded Goodness of Pronunciation in (0, 1]: how close the expected
     phoneme's logit was to what the model actually decoded at that frame."""
-    if np.isnan(target_logit) or np.isnan(decoded_logit):
+    if math.isnan(target_logit) or math.isnan(decoded_logit):
         return None
     return float(np.exp(min(target_logit - decoded_logit, 0.0) / temperature))
 
 
-def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
-    """
-    Core streaming alignment algorithm, operating on precomputed CTC logits.
-    Use this when wav2vec2 inference already happened elsewhere (e.g. in the
-    browser via transformers.js/onnxruntime-web) and only the logits are
-    streamed to the server.
+class AlignmentEvent:
+    """One aligned reference phoneme, as the aligners emit it.
 
-    Args:
-        logits_chunks: iterable of float32 numpy arrays of shape (frames, vocab),
-                       one per audio chunk, in the model's vocab order.
-                       The caller signals end-of-stream by exhausting the iterable.
-        reference_phonemes: flat list of IPA phoneme strings to match against, in order.
-        tokenizer: Wav2Vec2CTCTokenizer (defines vocab, blank/pad id, special ids).
+    Slotted rather than an 8-key dict per phoneme, with the logits and
+    scores converted to plain floats up front so NumPy scalars never reach
+    the JSON encoder. event["score"]-style access still works for code
+    written against the old dicts; to_dict() is the one serialization step,
+    at the emit boundary.
+    """
 
-    Yields:
-        dict with keys:
-            phoneme  (str)   – the reference phoneme
-            position (int)   – its index in reference_phonemes
-            label    (str)   – 'correct' | 'mispronounced' | 'omitted' | 'insertion'
-            decoded  (str)   – what the model actually decoded (empty string for omitted)
-            target_logit (float) – model logit for the expected phoneme at that frame
-            decoded_logit (float) – model logit for the decoded phoneme at that frame
-            gop      (float|None) – graded Goodness of Pronunciation in (0, 1]
-            score    (float) – 1.0 for 'correct' (exact or lenient match),
-                               gop for 'mispronounced' when available (else
-                               0.5), 0.0 for 'omitted'
+    __slots__ = ("phoneme", "position", "label", "decoded",
+                 "target_logit", "decoded_logit", "gop", "score")
+
+    def __init__(self, phoneme, position, label, decoded, target_logit, decoded_logit,
+                 gop, score):
+        self.phoneme = str(phoneme)
+        self.position = position
+        self.label = label
+        self.decoded = decoded
+        self.target_logit = float(target_logit)
+        self.decoded_logit = float(decoded_logit)
+        self.gop = None if gop is None else float(gop)
+        self.score = float(score)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __eq__(self, other):
+        if not isinstance(other, AlignmentEvent):
+            return NotImplemented
+        return all(_same(getattr(self, f), getattr(other, f)) for f in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"AlignmentEvent({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.__slots__}
+
+
+def _same(a, b):
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+class _ChunkFrames:
+    """One chunk's CTC-collapsed phoneme frames, with every per-frame lookup
+    the aligner makes computed for all frames at once: the decoded logit, and
+    per normalized phoneme group the best logit and whether any of its ids
+    is in the frame's top 3."""
+
+    def __init__(self, logits, vocab, blank_id):
+        predicted = logits.argmax(axis=-1)
+        keep = predicted != blank_id
+        keep[1:] &= predicted[1:] != predicted[:-1]
+        frames = np.flatnonzero(keep)
+        ids = predicted[frames]
+        in_vocab = ids < len(vocab.norm_of_id)
+        nids = np.full(len(ids), -1, dtype=np.intp)
+        nids[in_vocab] = vocab.norm_of_id[ids[in_vocab]]
+        is_phoneme = nids >= 0
+        frames, ids = frames[is_phoneme], ids[is_phoneme]
+
+        self.phonemes = [vocab.norm_names[n] for n in nids[is_phoneme].tolist()]
+        rows = logits[frames]
+        self.logits = rows[np.arange(len(frames)), ids]
+        if not len(frames):
+            return
+        cols, starts = vocab.group_cols, vocab.group_starts
+        self.group_max = np.maximum.reduceat(rows[:, cols], starts, axis=1).tolist()
+        self.group_top3 = np.logical_or.reduceat(
+            _top3_mask(rows)[:, cols], starts, axis=1).tolist()
+
+    def target_logit(self, j, nid):
+        return self.group_max[j][nid] if nid >= 0 else float("nan")
+
+    def in_top3(self, j, nid):
+        return nid >= 0 and self.group_top3[j][nid]
+
+
+def _top3_mask(rows):
+    """Boolean mask of each row's three highest entries. Ties at the cutoff
+    go to the higher ids, as a stable argsort ranks them."""
+    k = min(3, rows.shape[1])
+    kth = np.partition(rows, -k, axis=1)[:, -k, np.newaxis]
+    above = rows > kth
+    tied = rows == kth
+    # Tied entries at or after each column, counted from the right.
+    tied_from_right = np.cumsum(tied[:, ::-1], axis=1)[:, ::-1]
+    slots = k - np.count_nonzero(above, axis=1, keepdims=True)
+    return above | (tied & (tied_from_right <= slots))
+
+
+class StreamingAligner:
+    """Push-style form of stream_decode_logits: the greedy pointer aligner
+    with its pointer and vocab state held between chunks, so a caller can
+    feed logits as they arrive from any thread or executor instead of
+    parking a thread on a blocking iterable.
+
+    feed(logits) aligns one (frames, vocab) chunk and returns its events;
+    finish() returns whatever is still pending at end of stream (nothing,
+    for the greedy aligner). Events are the AlignmentEvents
+    stream_decode_logits yields. Once every reference phoneme has been placed, done is true and
+    further chunks are ignored.
     """
-    reference_phonemes = [p for p in reference_phonemes if p != "ˈ"]
-    pointer = 0
-    phoneme2id = tokenizer.get_vocab()
-    special = set(tokenizer.all_special_ids)
-    # Target logits are read via every vocab id whose normalized form matches,
-    # so e.g. a reference "r" also credits the model's "ɹ" logit.
-    norm2ids = {}
-    for tok, tid in phoneme2id.items():
-        if tid not in special and tok not in ("|", " "):
-            norm2ids.setdefault(normalize(tok), []).append(tid)
+
     logit_threshold = 5.0
     lookahead = 3
 
-    for i, logits_np in enumerate(logits_chunks):
-        if pointer >= len(reference_phonemes):
-            return
-
-        logits_np = np.asarray(logits_np)
-        predicted_ids = logits_np.argmax(axis=-1).tolist()
-        blank_id = tokenizer.pad_token_id
-        collapsed = []
-        collapsed_frames = []
-        prev = None
-        for fi, idx in enumerate(predicted_ids):
-            if idx != prev:
-                if idx != blank_id:
-                    collapsed.append(idx)
-                    collapsed_frames.append(fi)
-                prev = idx
-
-        tokens = tokenizer.convert_ids_to_tokens(collapsed)
-        chunk_phonemes = []
-        phoneme_logits = []
-        chunk_frames = []
-        for fi, idx, t in zip(collapsed_frames, collapsed, tokens):
-            if tokenizer.convert_tokens_to_ids(t) not in special and t not in ("|", " "):
-                chunk_phonemes.append(normalize(t))
-                phoneme_logits.append(logits_np[fi, idx])
-                chunk_frames.append(fi)
-        # print(f"[chunk {i+1:02d}] {chunk_phonemes}", flush=True)
+    def __init__(self, reference_phonemes, tokenizer):
+        self.reference_phonemes = [p for p in reference_phonemes if p != "ˈ"]
+        self.vocab = phoneme_vocab(tokenizer)
+        self.ref_norm = [normalize(p) for p in self.reference_phonemes]
+        self.ref_nid = [self.vocab.norm_index.get(p, -1) for p in self.ref_norm]
+        self.blank_id = tokenizer.pad_token_id
+        self.pointer = 0
+
+    @property
+    def done(self):
+        return self.pointer >= len(self.reference_phonemes)
+
+    def feed(self, logits):
+        if self.done:
+            return []
+        return list(self._align(logits))
+
+    def finish(self):
+        return []
+
+    def _align(self, logits):
+        reference_phonemes, ref_norm, ref_nid = self.reference_phonemes, self.ref_norm, self.ref_nid
+        vocab, logit_threshold, lookahead = self.vocab, self.logit_threshold, self.lookahead
+        pointer = self.pointer
+        frames = _ChunkFrames(np.asarray(logits), vocab, self.blank_id)
+        chunk_phonemes = frames.phonemes
+        phoneme_logits = frames.logits
 
         # Pre-align: if no chunk phonemes match at the current pointer, scan forward/backward
         # to detect whether the user skipped over some reference phonemes.
@@ -103,7 +178,7 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
             current_count = sum(
                 1 for di, dp in enumerate(chunk_phonemes)
                 if pointer + di < len(reference_phonemes)
-                and dp == normalize(reference_phonemes[pointer + di])
+                and dp == ref_norm[pointer + di]
             )
             if current_count == 0:
                 best_count, best_skip = 0, 0
@@ -113,7 +188,7 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
                     count = sum(
                         1 for di, dp in enumerate(chunk_phonemes)
                         if 0 <= pointer + skip + di < len(reference_phonemes)
-                        and dp == normalize(reference_phonemes[pointer + skip + di])
+                        and dp == ref_norm[pointer + skip + di]
                     )
                     if count > best_count:
                         best_count, best_skip = count, skip
@@ -122,49 +197,47 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
                         for k in range(best_skip):
                             omitted_ph = reference_phonemes[pointer + k]
                             # print(f"  [omitted] {normalize(omitted_ph)!r}", flush=True)
-                            yield {
-                                "phoneme": omitted_ph,
-                                "position": pointer + k,
-                                "label": "omitted",
-                                "decoded": "",
-                                "target_logit": float("nan"),
-                                "decoded_logit": float("nan"),
-                                "gop": 0.0,
-                                "score": 0.0,
-                            }
+                            yield AlignmentEvent(
+                                phoneme=omitted_ph,
+                                position=pointer + k,
+                                label="omitted",
+                                decoded="",
+                                target_logit=float("nan"),
+                                decoded_logit=float("nan"),
+                                gop=0.0,
+                                score=0.0,
+                            )
                     pointer += best_skip
 
         j = 0
         while j < len(chunk_phonemes):
-            fi, p, lv = chunk_frames[j], chunk_phonemes[j], phoneme_logits[j]
+            p, lv = chunk_phonemes[j], phoneme_logits[j]
             if pointer >= len(reference_phonemes):
                 # print(f"  [insertion] {p!r}: {lv:.4f}", flush=True)
                 j += 1
                 continue
-            target_p = normalize(reference_phonemes[pointer])
-            target_ids = norm2ids.get(target_p, [])
-            target_lv = max((float(logits_np[fi, t]) for t in target_ids),
-                            default=float("nan"))
-            top3_ids = set(logits_np[fi].argsort()[-3:].tolist())
-            target_in_top3 = any(t in top3_ids for t in target_ids)
+            target_p = ref_norm[pointer]
+            target_known = ref_nid[pointer] >= 0
+            target_lv = frames.target_logit(j, ref_nid[pointer])
+            target_in_top3 = frames.in_top3(j, ref_nid[pointer])
 
             # Decoded ɝ standing in for a reference vowel immediately
             # followed by "r" — credit both reference positions from this
             # one frame instead of leaving the "r" as an omission.
             if (p == R_COLORED_VOWEL and target_p != R_COLORED_VOWEL
                     and pointer + 1 < len(reference_phonemes)
-                    and normalize(reference_phonemes[pointer + 1]) == "r"):
+                    and ref_norm[pointer + 1] == "r"):
                 for ref_pos in (pointer, pointer + 1):
-                    yield {
-                        "phoneme": reference_phonemes[ref_pos],
-                        "position": ref_pos,
-                        "label": "correct",
-                        "decoded": p,
-                        "target_logit": target_lv,
-                        "decoded_logit": float(lv),
-                        "gop": 1.0,
-                        "score": 1.0,
-                    }
+                    yield AlignmentEvent(
+                        phoneme=reference_phonemes[ref_pos],
+                        position=ref_pos,
+                        label="correct",
+                        decoded=p,
+                        target_logit=target_lv,
+                        decoded_logit=float(lv),
+                        gop=1.0,
+                        score=1.0,
+                    )
                 pointer += 2
                 j += 1
                 continue
@@ -175,25 +248,25 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
             # whatever comes next in the reference.
             if (target_p == R_COLORED_VOWEL and p != R_COLORED_VOWEL
                     and j + 1 < len(chunk_phonemes) and chunk_phonemes[j + 1] == "r"):
-                yield {
-                    "phoneme": reference_phonemes[pointer],
-                    "position": pointer,
-                    "label": "correct",
-                    "decoded": p,
-                    "target_logit": target_lv,
-                    "decoded_logit": float(lv),
-                    "gop": 1.0,
-                    "score": 1.0,
-                }
+                yield AlignmentEvent(
+                    phoneme=reference_phonemes[pointer],
+                    position=pointer,
+                    label="correct",
+                    decoded=p,
+                    target_logit=target_lv,
+                    decoded_logit=float(lv),
+                    gop=1.0,
+                    score=1.0,
+                )
                 pointer += 1
                 j += 2
                 continue
 
-            if p == target_p or (target_ids and target_lv > logit_threshold) or target_in_top3:
+            if p == target_p or (target_known and target_lv > logit_threshold) or target_in_top3:
                 label = "correct"
                 pos = pointer
                 pointer += 1
-            elif target_ids and target_lv > 0:
+            elif target_known and target_lv > 0:
                 next_is_target = j + 1 < len(chunk_phonemes) and chunk_phonemes[j + 1] == target_p
                 if next_is_target:
                     label = "insertion"
@@ -207,32 +280,30 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
                 # simply omitted and the decoded phoneme matches something ahead.
                 skip_to = next(
                     (k for k in range(1, min(lookahead + 1, len(reference_phonemes) - pointer))
-                     if p == normalize(reference_phonemes[pointer + k])),
+                     if p == ref_norm[pointer + k]),
                     None,
                 )
                 if skip_to is not None:
                     for k in range(skip_to):
                         omitted_ph = reference_phonemes[pointer + k]
                         # print(f"  [omitted] {normalize(omitted_ph)!r}", flush=True)
-                        yield {
-                            "phoneme": omitted_ph,
-                            "position": pointer + k,
-                            "label": "omitted",
-                            "decoded": "",
-                            "target_logit": float("nan"),
-                            "decoded_logit": float("nan"),
-                            "gop": 0.0,
-                            "score": 0.0,
-                        }
+                        yield AlignmentEvent(
+                            phoneme=omitted_ph,
+                            position=pointer + k,
+                            label="omitted",
+                            decoded="",
+                            target_logit=float("nan"),
+                            decoded_logit=float("nan"),
+                            gop=0.0,
+                            score=0.0,
+                        )
                     pointer += skip_to
                     label = "correct"
                     pos = pointer
                     # target_lv was read for the phoneme we just marked
                     # omitted; re-read it for the advanced pointer so the
                     # yielded event scores the phoneme it actually matched.
-                    target_ids = norm2ids.get(normalize(reference_phonemes[pointer]), [])
-                    target_lv = max((float(logits_np[fi, t]) for t in target_ids),
-                                    default=float("nan"))
+                    target_lv = frames.target_logit(j, ref_nid[pointer])
                     pointer += 1
                 else:
                     label = "insertion"
@@ -249,17 +320,53 @@ def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
                 # gop grading for genuine mispronunciations; always give full
                 # credit once something has been labeled "correct".
                 score = 1.0 if label == "correct" else (gop if gop is not None else 0.5)
-                yield {
-                    "phoneme": reference_phonemes[pos],
-                    "position": pos,
-                    "label": label,
-                    "decoded": p,
-                    "target_logit": target_lv,
-                    "decoded_logit": lv,
-                    "gop": gop,
-                    "score": score,
-                }
+                yield AlignmentEvent(
+                    phoneme=reference_phonemes[pos],
+                    position=pos,
+                    label=label,
+                    decoded=p,
+                    target_logit=target_lv,
+                    decoded_logit=lv,
+                    gop=gop,
+                    score=score,
+                )
             j += 1
+        self.pointer = pointer
+
+
+def stream_decode_logits(logits_chunks, reference_phonemes, tokenizer):
+    """
+    Core streaming alignment algorithm, operating on precomputed CTC logits.
+    Use this when wav2vec2 inference already happened elsewhere (e.g. in the
+    browser via transformers.js/onnxruntime-web) and only the logits are
+    streamed to the server.
+
+    Args:
+        logits_chunks: iterable of float32 numpy arrays of shape (frames, vocab),
+                       one per audio chunk, in the model's vocab order.
+                       The caller signals end-of-stream by exhausting the iterable.
+        reference_phonemes: flat list of IPA phoneme strings to match against, in order.
+        tokenizer: Wav2Vec2CTCTokenizer (defines vocab, blank/pad id, special ids).
+
+    Yields:
+        AlignmentEvent, indexable like a dict, with:
+            phoneme  (str)   – the reference phoneme
+            position (int)   – its index in reference_phonemes
+            label    (str)   – 'correct' | 'mispronounced' | 'omitted' | 'insertion'
+            decoded  (str)   – what the model actually decoded (empty string for omitted)
+            target_logit (float) – model logit for the expected phoneme at that frame
+            decoded_logit (float) – model logit for the decoded phoneme at that frame
+            gop      (float|None) – graded Goodness of Pronunciation in (0, 1]
+            score    (float) – 1.0 for 'correct' (exact or lenient match),
+                               gop for 'mispronounced' when available (else
+                               0.5), 0.0 for 'omitted'
+    """
+    aligner = StreamingAligner(reference_phonemes, tokenizer)
+    for logits in logits_chunks:
+        if aligner.done:
+            return
+        yield from aligner.feed(logits)
+    yield from aligner.finish()
 
 
 def prosody_event(audio, text, sample_rate=16000):
@@ -278,13 +385,94 @@ def prosody_event(audio, text, sample_rate=16000):
     }
 
 
+class LeftContextWindow:
+    """Rolling audio window for context-carrying streaming inference.
+
+    Each push() returns the audio to run through wav2vec2 — the new chunk
+    plus up to context_samples of audio before it — and the slice of that
+    window's logit frames that haven't been emitted yet. The window always
+    starts on the model's 320-sample frame grid, so the emitted frames are
+    aligned to the whole-utterance frame grid: frame i of the stream covers
+    the same audio it would in whole-utterance inference. Frames at chunk
+    boundaries see the audio on both sides instead of being cut off, which
+    is what lets chunks shrink without hurting alignment.
+
+    The logits themselves are not identical to whole-utterance inference.
+    The processor normalizes each window on its own (zero mean, unit
+    variance over the window, not the utterance), and the model attends only
+    over the window.
+    """
+
+    def __init__(self, context_samples):
+        self.context = int(context_samples) - int(context_samples) % SAMPLES_PER_FRAME
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.start = 0    # stream sample index of buffer[0]
+        self.emitted = 0  # logit frames handed out so far
+
+    def push(self, chunk):
+        from inference import frames_for_samples
+
+        window = np.concatenate([self.buffer, np.asarray(chunk, dtype=np.float32)])
+        total = self.start + len(window)
+        offset = self.start // SAMPLES_PER_FRAME
+        frames = max(frames_for_samples(total), self.emitted)
+        new = slice(self.emitted - offset, frames - offset)
+        self.emitted = frames
+
+        # Keep the not-yet-emitted tail (the next frame starts at
+        # emitted * 320) plus the requested left context before it.
+        keep_from = max(self.start, self.emitted * SAMPLES_PER_FRAME - self.context)
+        keep_from -= keep_from % SAMPLES_PER_FRAME
+        self.buffer = window[keep_from - self.start:]
+        self.start = keep_from
+        return window, new
+
+
+class AudioLogitsStream:
+    """Push-style audio -> logits stage shared by every server-side session:
+    voice-activity gating and optional left-context windows in front of an
+    inference backend. push(chunk) returns that chunk's (frames, vocab) logits."""
+
+    def __init__(self, backend, blank_id, vad=VAD_ENABLED, left_context_ms=STREAM_LEFT_CONTEXT_MS):
+        self.backend = backend
+        self.blank_id = blank_id
+        self.vad = vad
+        self.window = (LeftContextWindow(backend.sample_rate * left_context_ms // 1000)
+                       if left_context_ms > 0 else None)
+
+    def _blank(self, frames):
+        return blank_logits(frames, self.backend.vocab_size, self.blank_id)
+
+    def push(self, chunk):
+        from inference import frames_for_samples
+
+        silent = self.vad and not is_speech(chunk)
+        if self.window is None:
+            if silent:
+                return self._blank(frames_for_samples(len(chunk)))
+            return self.backend.infer(chunk)
+
+        window, new = self.window.push(chunk)
+        frames = new.stop - new.start
+        if silent or frames == 0:
+            return self._blank(frames)
+        return self.backend.infer(window)[new]
+
+
 def stream_decode_util(audio_chunks, reference_phonemes, processor, model,
-                       device="cpu", sample_rate=16000):
+                       device="cpu", sample_rate=16000, vad=VAD_ENABLED,
+                       left_context_ms=STREAM_LEFT_CONTEXT_MS):
     """
     Server-side inference path: runs wav2vec2 on raw audio chunks, then feeds
     the logits through stream_decode_logits. Kept for clients that stream raw
     PCM instead of precomputed logits.
 
+    With vad on, chunks the voice-activity gate judges silent skip the model
+    and reach the aligner as all-blank frames (see vad.py). With
+    left_context_ms > 0, each chunk is inferred together with that much of the
+    audio before it and only the new frames' logits are aligned (see
+    LeftContextWindow), so short chunks keep their acoustic context.
+
     Prosody is not scored here — the caller buffers the raw audio and runs
     prosody_event after the alignment result has been sent.
 
@@ -293,24 +481,27 @@ def stream_decode_util(audio_chunks, reference_phonemes, processor, model,
                       The caller signals end-of-stream by exhausting the iterable.
         reference_phonemes: flat list of IPA phoneme strings to match against, in order.
         processor: Wav2Vec2Processor
-        model: Wav2Vec2ForCTC
-        device: torch device string (default "cpu")
+        model: an inference.InferenceBackend, or a bare Wav2Vec2ForCTC (wrapped
+               in a TorchBackend on `device`)
+        device: torch device string (default "cpu"); ignored for backends
         sample_rate: audio sample rate in Hz (default 16000)
+        vad: skip inference on silent chunks (default VAD_ENABLED)
+        left_context_ms: audio carried into each chunk's inference window
+                         (default STREAM_LEFT_CONTEXT_MS; 0 = chunks in isolation)
 
     Yields:
-        same dicts as stream_decode_logits.
+        same events as stream_decode_logits.
     """
-    import torch
-
-    def logits_generator():
-        for chunk in audio_chunks:
-            inputs = processor(chunk, sampling_rate=sample_rate,
-                               return_tensors="pt", padding=True).to(device)
-            with torch.no_grad():
-                logits = model(**inputs).logits
-            yield logits[0].cpu().numpy()
-
-    yield from stream_decode_logits(logits_generator(), reference_phonemes, processor.tokenizer)
+    from inference import InferenceBackend, TorchBackend
+
+    if isinstance(model, InferenceBackend):
+        backend = model
+    else:
+        backend = TorchBackend(processor, model, device, sample_rate)
+    stream = AudioLogitsStream(backend, processor.tokenizer.pad_token_id, vad=vad,
+                               left_context_ms=left_context_ms)
+    logits = (stream.push(chunk) for chunk in audio_chunks)
+    yield from stream_decode_logits(logits, reference_phonemes, processor.tokenizer)
 
 
 def test_stream_decode_util():
@@ -0,0 +1,123 @@
+"""Admission control and bounded per-session queue tests (no server needed)."""
+
+import os
+import queue
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from admission import AdmissionController, BoundedChunkQueue, audio_capacity_for  # noqa: E402
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_audio_sessions_are_capped_by_inference_capacity(self):
+        ctl = AdmissionController(max_sessions=10, audio_capacity=2, retry_after=3)
+        self.assertTrue(ctl.admit("audio"))
+        self.assertTrue(ctl.admit("audio"))
+        rejected = ctl.admit("audio")
+        self.assertFalse(rejected)
+        self.assertEqual(rejected.reason, "inference_full")
+        self.assertEqual(rejected.retry_after, 3)
+        # Logits sessions don't need server-side inference.
+        self.assertEqual(ctl.admit("logits").mode, "logits")
+
+    def test_capable_clients_are_downgraded_to_logits_mode(self):
+        ctl = AdmissionController(max_sessions=10, audio_capacity=1)
+        ctl.admit("audio")
+        ticket = ctl.admit("audio", allow_downgrade=True)
+        self.assertTrue(ticket)
+        self.assertEqual(ticket.mode, "logits")
+        self.assertEqual(ctl.stats()["downgraded"], 1)
+
+    def test_total_sessions_are_capped(self):
+        ctl = AdmissionController(max_sessions=1, audio_capacity=5)
+        ctl.admit("logits")
+        self.assertEqual(ctl.admit("logits").reason, "server_full")
+
+    def test_zero_means_no_limit(self):
+        ctl = AdmissionController(max_sessions=0, audio_capacity=0)
+        tickets = [ctl.admit("audio") for _ in range(100)]
+        self.assertTrue(all(tickets))
+        self.assertEqual(ctl.stats()["rejected"], 0)
+
+    def test_audio_capacity_follows_the_backend(self):
+        class Backend:
+            concurrency = 2
+            max_batch_size = 3
+
+        ctl = AdmissionController(max_sessions=100, audio_capacity=None)
+        ctl.fit(Backend())
+        self.assertEqual(ctl.audio_capacity, audio_capacity_for(2, 3))
+        self.assertEqual(audio_capacity_for(2, 3, per_slot=4), 24)
+        # A plain backend has one slot and no batching.
+        ctl.fit(object())
+        self.assertEqual(ctl.audio_capacity, audio_capacity_for(1, 1))
+
+    def test_explicit_audio_capacity_is_kept(self):
+        ctl = AdmissionController(max_sessions=100, audio_capacity=7)
+        ctl.fit(object())
+        self.assertEqual(ctl.audio_capacity, 7)
+
+    def test_release_frees_capacity_once(self):
+        ctl = AdmissionController(max_sessions=10, audio_capacity=1)
+        ticket = ctl.admit("audio")
+        ctl.release(ticket)
+        ctl.release(ticket)
+        self.assertEqual(ctl.stats()["active_audio_sessions"], 0)
+        self.assertTrue(ctl.admit("audio"))
+        ctl.release(ctl.admit("audio"))  # rejected tickets are a no-op
+        self.assertEqual(ctl.stats()["active_audio_sessions"], 1)
+
+
+class BoundedChunkQueueTest(unittest.TestCase):
+    def _chunk(self, value, n=100):
+        return np.full(n, value, dtype=np.float32)
+
+    def test_overflow_merges_into_newest_chunk(self):
+        q = BoundedChunkQueue(maxsize=2, overflow="merge", merge_limit=4)
+        for v in range(3):
+            q.put(self._chunk(v))
+        self.assertEqual(q.qsize(), 2)
+        self.assertEqual(q.merged, 1)
+        q.get()
+        merged = q.get()
+        np.testing.assert_array_equal(merged, np.r_[self._chunk(1), self._chunk(2)])
+
+    def test_merge_limit_falls_back_to_dropping_oldest(self):
+        q = BoundedChunkQueue(maxsize=1, overflow="merge", merge_limit=2)
+        for v in range(3):
+            q.put(self._chunk(v))
+        self.assertEqual((q.merged, q.dropped), (1, 1))
+        self.assertEqual(len(q.get()), 100)
+
+    def test_drop_policy_keeps_the_newest_chunks(self):
+        q = BoundedChunkQueue(maxsize=2, overflow="drop")
+        for v in range(4):
+            q.put(self._chunk(v))
+        self.assertEqual(q.dropped, 2)
+        self.assertEqual([q.get()[0], q.get()[0]], [2.0, 3.0])
+
+    def test_logits_chunks_merge_along_frames(self):
+        q = BoundedChunkQueue(maxsize=1, overflow="merge")
+        q.put(np.zeros((25, 11), dtype=np.float32))
+        q.put(np.ones((25, 11), dtype=np.float32))
+        self.assertEqual(q.get().shape, (50, 11))
+
+    def test_stop_sentinel_is_never_dropped(self):
+        q = BoundedChunkQueue(maxsize=1, overflow="drop")
+        q.put(self._chunk(0))
+        q.put(None)
+        q.put(self._chunk(1))
+        self.assertEqual(q.get()[0], 0.0)
+        self.assertIsNone(q.get())
+
+    def test_get_timeout(self):
+        with self.assertRaises(queue.Empty):
+            BoundedChunkQueue().get(timeout=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ These drive the aligner with hand-built CTC logits and a fake tokenizer, so no
 model download or audio is involved.
 """
 
+import json
 import os
 import sys
 import unittest
@@ -79,5 +80,49 @@ class RColoredVowelTest(unittest.TestCase):
         self.assertNotIn(4, credited)  # the "z" was never spoken
 
 
+class TopThreeLeniencyTest(unittest.TestCase):
+    def _frame(self, target_logit, filler_logit):
+        # Decoded "z"; reference expects "d".
+        frame = np.full((1, len(VOCAB)), -20.0, dtype=np.float32)
+        frame[0, VOCAB["z"]] = 10.0
+        frame[0, VOCAB["d"]] = target_logit
+        frame[0, [VOCAB["_f1"], VOCAB["_f2"]]] = filler_logit
+        return frame
+
+    def _label(self, frame):
+        events = list(stream_decode_logits([frame], ["d"], FakeTokenizer()))
+        return events[0]["label"]
+
+    def test_target_in_top_three_is_credited(self):
+        self.assertEqual(self._label(self._frame(3.0, -20.0)), "correct")
+        self.assertEqual(self._label(self._frame(3.0, 4.0)), "mispronounced")
+
+    def test_ties_at_the_cutoff_go_to_the_higher_ids(self):
+        """d (id 6) ties both fillers (ids 9, 10) for the last two top-3
+        slots; like a stable argsort, the fillers win them."""
+        self.assertEqual(self._label(self._frame(3.0, 3.0)), "mispronounced")
+
+    def test_float16_logits_score_like_float32(self):
+        frame = self._frame(3.0, 4.0)
+        events32 = list(stream_decode_logits([frame], ["d"], FakeTokenizer()))
+        events16 = list(stream_decode_logits([frame.astype(np.float16)], ["d"], FakeTokenizer()))
+        self.assertEqual([e["score"] for e in events16], [e["score"] for e in events32])
+
+
+class AlignmentEventTest(unittest.TestCase):
+    def test_numpy_values_become_plain_floats(self):
+        event = run(["k"], ["k"])[0]
+        self.assertIs(type(event.decoded_logit), float)
+        self.assertIs(type(event.target_logit), float)
+        json.dumps(event.to_dict())
+
+    def test_dict_style_access(self):
+        event = run(["k", "ə"], ["k", "ə"])[1]
+        self.assertEqual(event["position"], 1)
+        self.assertEqual(event["label"], event.label)
+        with self.assertRaises(KeyError):
+            event["nope"]
+
+
 if __name__ == "__main__":
     unittest.main()
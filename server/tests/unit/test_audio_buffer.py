@@ -0,0 +1,102 @@
+"""Bounded session audio tests: ring buffers keep exactly the most recent
+values, int16/decimated storage round-trips, the memory budget refuses what
+doesn't fit, and a ProsodyAccumulator stays within its preallocated size."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from audio_buffer import AudioRingBuffer, MemoryBudget, RingBuffer  # noqa: E402
+from prosody_eval import ProsodyAccumulator, evaluate_prosody  # noqa: E402
+from tests.unit.test_prosody_eval import UTTERANCES, synthetic_utterance  # noqa: E402
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_keeps_the_most_recent_values(self):
+        rng = np.random.default_rng(0)
+        for capacity in (1, 7, 64):
+            ring, stream = RingBuffer(capacity), []
+            for _ in range(50):
+                values = rng.normal(size=int(rng.integers(0, 2 * capacity + 2)))
+                ring.extend(values)
+                stream.extend(values)
+                np.testing.assert_array_equal(ring.values(), stream[-capacity:])
+            self.assertEqual(ring.written, len(stream))
+            self.assertEqual(ring.overwritten, max(0, len(stream) - capacity))
+
+    def test_size_is_fixed(self):
+        ring = RingBuffer(10, dtype=np.int16)
+        ring.extend(np.arange(1000))
+        self.assertEqual(ring.nbytes, 20)
+        self.assertEqual(len(ring), 10)
+
+
+class AudioRingBufferTest(unittest.TestCase):
+    def test_int16_round_trip(self):
+        audio = np.sin(np.linspace(0, 100, 16000)).astype(np.float32) * 0.8
+        buffer = AudioRingBuffer(16000, max_seconds=2, dtype="int16")
+        buffer.write(audio[:5000])
+        buffer.write(audio[5000:])
+        self.assertEqual(buffer.nbytes, 2 * 32000)
+        np.testing.assert_allclose(buffer.audio(), audio, atol=1 / 32767)
+
+    def test_bounded_to_max_seconds(self):
+        buffer = AudioRingBuffer(16000, max_seconds=1, dtype="float32")
+        audio = np.arange(40000, dtype=np.float32) / 40000
+        for chunk in np.array_split(audio, 13):
+            buffer.write(chunk)
+        np.testing.assert_array_equal(buffer.audio(), audio[-16000:])
+
+    def test_downsample_averages_across_chunks(self):
+        buffer = AudioRingBuffer(16000, max_seconds=1, dtype="float32", downsample=2)
+        self.assertEqual(buffer.sr, 8000)
+        for chunk in ([0.0, 0.2, 0.4], [0.6, 0.8], [1.0, 0.5]):
+            buffer.write(np.array(chunk))
+        np.testing.assert_allclose(buffer.audio(), [0.1, 0.5, 0.9], atol=1e-6)
+
+    def test_unknown_dtype(self):
+        with self.assertRaises(ValueError):
+            AudioRingBuffer(16000, dtype="int8")
+
+
+class MemoryBudgetTest(unittest.TestCase):
+    def test_reserve_and_release(self):
+        budget = MemoryBudget(100)
+        self.assertTrue(budget.reserve(60))
+        self.assertFalse(budget.reserve(60))
+        self.assertTrue(budget.reserve(40))
+        budget.release(60)
+        self.assertTrue(budget.reserve(60))
+        self.assertEqual(budget.stats(), {"budget_bytes": 100, "reserved_bytes": 100,
+                                          "sessions": 2, "refused": 1})
+
+
+class BoundedAccumulatorTest(unittest.TestCase):
+    def test_long_streams_keep_only_max_seconds(self):
+        audio = synthetic_utterance(UTTERANCES["question"][0])
+        for tracker in ("yin", "pyin"):
+            with self.subTest(tracker):
+                accumulator = ProsodyAccumulator(tracker=tracker, max_seconds=1.0)
+                nbytes = accumulator.nbytes
+                for _ in range(5):
+                    accumulator.push(audio)
+                self.assertEqual(accumulator.nbytes, nbytes)
+                self.assertEqual(accumulator.samples, 5 * len(audio))
+                self.assertEqual(set(accumulator.scores("Is it?")),
+                                 {"monotony_score", "rhythm_score", "boundary_score",
+                                  "speaking_rate"})
+
+    def test_short_streams_are_unaffected(self):
+        audio = synthetic_utterance(UTTERANCES["statement"][0])
+        accumulator = ProsodyAccumulator(tracker="yin", max_seconds=30)
+        accumulator.push(audio)
+        self.assertEqual(accumulator.scores("It is."),
+                         evaluate_prosody(audio, "It is.", tracker="yin"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Graceful drain tests, on a fake clock: sessions that finish within the
+drain window are left alone, the rest are ended, and the drain waits for
+pending work before reporting."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from drain import Drain  # noqa: E402
+from session_table import SessionTable  # noqa: E402
+
+
+class DrainTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sessions = SessionTable(shards=4)
+        self.ended = []
+        self.finishes = {}   # sid -> time it winds down by itself
+        self.pending = 0
+
+    def sleep(self, seconds):
+        self.now += seconds
+        for sid, at in list(self.finishes.items()):
+            if at <= self.now:
+                self.sessions.pop(sid)
+                del self.finishes[sid]
+
+    def end(self, sid, session):
+        self.ended.append(sid)
+        self.finishes[sid] = self.now + 1  # finalize takes a moment
+
+    def drain(self, **kwargs):
+        return Drain(self.sessions, self.end, pending=lambda: self.pending, timeout=20,
+                     settle=10, clock=lambda: self.now, sleep=self.sleep, **kwargs)
+
+    def test_sessions_finish_or_are_ended(self):
+        for sid, finishes_at in (("quick", 5), ("slow", 100), ("stuck", None)):
+            self.sessions.put(sid, {})
+            if finishes_at is not None:
+                self.finishes[sid] = finishes_at
+        drain = self.drain()
+        self.assertFalse(drain.draining)
+
+        def end(sid, session):
+            self.ended.append(sid)
+            if sid == "slow":
+                self.finishes[sid] = self.now + 1
+        drain._end = end
+        self.assertEqual(drain.run(), {"finished": 1, "ended": 1, "abandoned": 1})
+        self.assertTrue(drain.draining)
+        self.assertEqual(sorted(self.ended), ["slow", "stuck"])
+        self.assertAlmostEqual(self.now, 30, delta=0.2)
+
+    def test_returns_as_soon_as_everything_settles(self):
+        self.sessions.put("a", {})
+        self.finishes["a"] = 2
+        self.assertEqual(self.drain().run(), {"finished": 1, "ended": 0, "abandoned": 0})
+        self.assertLess(self.now, 2.5)
+
+    def test_waits_for_pending_work(self):
+        drain = self.drain()
+        self.pending = 1
+        sleep = self.sleep
+
+        def finish_pending(seconds):
+            sleep(seconds)
+            if self.now >= 3:
+                self.pending = 0
+        drain._sleep = finish_pending
+        drain.run()
+        self.assertAlmostEqual(self.now, 3, delta=0.2)
+
+    def test_a_failing_end_doesnt_stop_the_drain(self):
+        self.sessions.put("a", {})
+        self.sessions.put("b", {})
+
+        def end(sid, session):
+            raise RuntimeError("boom")
+        drain = self.drain()
+        drain._end = end
+        with self.assertLogs("drain", "ERROR"):
+            self.assertEqual(drain.run()["abandoned"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
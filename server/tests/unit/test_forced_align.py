@@ -0,0 +1,86 @@
+"""Viterbi alignment engine tests, on hand-built CTC logits like
+test_alignment.py's."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from forced_align import ForcedAligner, make_aligner  # noqa: E402
+from stream_decode_util import StreamingAligner  # noqa: E402
+from tests.unit.test_alignment import FakeTokenizer, logits_for  # noqa: E402
+
+
+def ctc_logits(decoded):
+    """Each decoded phoneme held for two frames, with blanks around it."""
+    frames = []
+    for tok in decoded:
+        frames += ["<pad>", "<pad>", tok, tok]
+    return logits_for(frames + ["<pad>", "<pad>"])
+
+
+def run(reference, decoded, chunk_frames=4):
+    logits = ctc_logits(decoded)
+    aligner = ForcedAligner(reference, FakeTokenizer())
+    events = []
+    for i in range(0, len(logits), chunk_frames):
+        events += aligner.feed(logits[i:i + chunk_frames])
+    return events + aligner.finish()
+
+
+def labels(events):
+    return [(e["position"], e["label"]) for e in events]
+
+
+class ForcedAlignerTest(unittest.TestCase):
+    def test_clean_reading_is_all_correct(self):
+        events = run(["k", "ə", "l", "d"], ["k", "ə", "l", "d"])
+        self.assertEqual(labels(events), [(i, "correct") for i in range(4)])
+        self.assertEqual(set(events[0].to_dict()), {"phoneme", "position", "label", "decoded",
+                                          "target_logit", "decoded_logit", "gop", "score"})
+
+    def test_left_out_phoneme_is_omitted_not_drifted(self):
+        events = run(["k", "ə", "l", "d"], ["k", "l", "d"])
+        self.assertEqual(labels(events),
+                         [(0, "correct"), (1, "omitted"), (2, "correct"), (3, "correct")])
+
+    def test_substitution_is_mispronounced_in_place(self):
+        events = run(["k", "ə", "l", "d"], ["k", "z", "l", "d"])
+        self.assertEqual(labels(events)[1], (1, "mispronounced"))
+        self.assertEqual(events[1]["decoded"], "z")
+        self.assertLess(events[1]["score"], 0.5)
+
+    def test_r_colored_vowel_equivalences(self):
+        self.assertEqual([e["score"] for e in run(["k", "ə", "l", "ə", "r"],
+                                                  ["k", "ə", "l", "ɝ"])], [1.0] * 5)
+        self.assertEqual([e["score"] for e in run(["h", "ɝ", "d"],
+                                                  ["h", "ə", "r", "d"])], [1.0] * 3)
+
+    def test_unfinished_reading_reports_only_what_was_reached(self):
+        events = run(["k", "ə", "l", "d", "z", "h"], ["k", "ə"])
+        self.assertEqual([e["position"] for e in events], [0, 1])
+
+    def test_chunking_does_not_change_the_result(self):
+        reference, decoded = ["h", "ə", "l", "d", "z", "k"], ["h", "ə", "d", "z", "z", "k"]
+        whole = run(reference, decoded, chunk_frames=1000)
+        for chunk_frames in (1, 3, 7):
+            self.assertEqual(labels(run(reference, decoded, chunk_frames)), labels(whole))
+
+    def test_events_wait_until_settled(self):
+        for settle, reported in ((1, [0]), (2, [])):
+            aligner = ForcedAligner(["k", "ə", "l", "d"], FakeTokenizer(), settle=settle)
+            first = aligner.feed(ctc_logits(["k", "ə"]))  # path is at "ə"
+            self.assertEqual([e["position"] for e in first], reported)
+
+
+class MakeAlignerTest(unittest.TestCase):
+    def test_engines(self):
+        self.assertIsInstance(make_aligner(["k"], FakeTokenizer(), "greedy"), StreamingAligner)
+        self.assertIsInstance(make_aligner(["k"], FakeTokenizer(), "viterbi"), ForcedAligner)
+        with self.assertRaises(ValueError):
+            make_aligner(["k"], FakeTokenizer(), "beam")
+
+
+if __name__ == "__main__":
+    unittest.main()
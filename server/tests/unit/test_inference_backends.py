@@ -0,0 +1,244 @@
+"""Tests for the server-side inference backends.
+
+The onnxruntime parity tests need torch, onnxruntime and the exported ONNX
+model files (scripts/export_wav2vec2_onnx.py, or ONNX_MODEL_DIR pointing at
+them), and skip cleanly when any of those are missing. The torch-optimized
+accuracy gate needs torch and the checkpoint. The batching and pool tests use
+fake backends and always run.
+"""
+
+import importlib.util
+import itertools
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from inference import (  # noqa: E402
+    BatchingBackend, InferenceBackend, frames_for_samples, onnx_model_path,
+)
+from inference_pool import PoolBackend  # noqa: E402
+from runtime import start_native_thread  # noqa: E402
+from tests.utils.utils import bundled_wav_paths, load_test_wav, split_chunks  # noqa: E402
+
+MODEL = "vitouphy/wav2vec2-xls-r-300m-timit-phoneme"
+
+_HAVE_TORCH = all(importlib.util.find_spec(m) for m in ("torch", "transformers"))
+_HAVE_RUNTIMES = _HAVE_TORCH and importlib.util.find_spec("onnxruntime") is not None
+
+
+@unittest.skipUnless(_HAVE_RUNTIMES, "torch/transformers/onnxruntime not installed")
+class OnnxParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from transformers import Wav2Vec2Processor
+        from inference import load_backend
+
+        cls.processor = Wav2Vec2Processor.from_pretrained(MODEL)
+        cls.torch_backend = load_backend(cls.processor, MODEL, name="torch")
+        cls.chunks = [chunk
+                      for path in bundled_wav_paths()
+                      for chunk in split_chunks(load_test_wav(path))
+                      if len(chunk) >= 400]  # shorter than the conv receptive field
+
+    def _backend(self, quantized):
+        from inference import OnnxBackend
+
+        path = onnx_model_path(quantized=quantized)
+        if not path.exists():
+            self.skipTest(f"{path} not exported")
+        return OnnxBackend(self.processor, path)
+
+    def test_fp32_logits_match_torch(self):
+        backend = self._backend(quantized=False)
+        for chunk in self.chunks:
+            expected = self.torch_backend.infer(chunk)
+            actual = backend.infer(chunk)
+            self.assertEqual(actual.shape, expected.shape)
+            np.testing.assert_allclose(actual, expected, atol=1e-2, rtol=1e-3)
+
+    def test_int8_decodes_the_same_phonemes(self):
+        """int8 logits drift numerically, so compare what the aligner actually
+        consumes: the per-frame argmax."""
+        backend = self._backend(quantized=True)
+        agree = total = 0
+        for chunk in self.chunks:
+            expected = self.torch_backend.infer(chunk)
+            actual = backend.infer(chunk)
+            self.assertEqual(actual.shape, expected.shape)
+            agree += int((actual.argmax(-1) == expected.argmax(-1)).sum())
+            total += expected.shape[0]
+        self.assertGreaterEqual(agree / total, 0.95)
+
+
+@unittest.skipUnless(_HAVE_TORCH, "torch/transformers not installed")
+class OptimizedTorchAccuracyGateTest(unittest.TestCase):
+    """The torch-optimized engine (int8 Linear layers) may only ship if the
+    aligner labels the bundled recordings the same way it does with fp32."""
+
+    def test_alignment_labels_match_fp32(self):
+        from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+        from inference import OptimizedTorchBackend, TorchBackend
+        from stream_decode_util import normalize, stream_decode_util
+
+        processor = Wav2Vec2Processor.from_pretrained(MODEL)
+        fp32 = TorchBackend(processor, Wav2Vec2ForCTC.from_pretrained(MODEL).eval())
+        optimized = OptimizedTorchBackend(processor, Wav2Vec2ForCTC.from_pretrained(MODEL).eval(),
+                                          intra_op_threads=2)
+        tokenizer = processor.tokenizer
+        special = set(tokenizer.all_special_ids)
+
+        agree = total = 0
+        for path in bundled_wav_paths():
+            chunks = [c for c in split_chunks(load_test_wav(path)) if len(c) >= 400]
+            # Score each recording against what fp32 itself decoded, so the
+            # gate measures drift from fp32 rather than the speaker's accuracy.
+            frame_ids = [int(i) for c in chunks for i in fp32.infer(c).argmax(-1)]
+            ids = [i for i, _ in itertools.groupby(frame_ids)]  # CTC collapse
+            reference = [normalize(t) for t, i in zip(tokenizer.convert_ids_to_tokens(ids), ids)
+                         if i not in special and t not in ("|", " ")]
+            if not reference:
+                continue
+            expected = {e["position"]: e["label"]
+                        for e in stream_decode_util(chunks, reference, processor, fp32)}
+            actual = {e["position"]: e["label"]
+                      for e in stream_decode_util(chunks, reference, processor, optimized)}
+            for pos, label in expected.items():
+                total += 1
+                agree += actual.get(pos) == label
+        if not total:
+            self.skipTest("no bundled recordings with decodable speech")
+        self.assertGreaterEqual(agree / total, 0.9)
+
+
+class FakeBackend(InferenceBackend):
+    """Logits whose every value is the chunk's first sample, so each caller
+    can check it got its own slice back. Records the size of every batch."""
+
+    name = "fake"
+    vocab_size = 4
+
+    def __init__(self):
+        super().__init__(processor=None)
+        self.batch_sizes = []
+
+    def infer(self, chunk):
+        return self.infer_batch([chunk])[0]
+
+    def infer_batch(self, chunks):
+        self.batch_sizes.append(len(chunks))
+        width = max(len(c) for c in chunks)
+        padded = np.zeros((len(chunks), frames_for_samples(width), 4), dtype=np.float32)
+        for i, chunk in enumerate(chunks):
+            padded[i] = chunk[0]
+        return self._split_batch(padded, chunks)
+
+
+class BatchingBackendTest(unittest.TestCase):
+    def test_frames_for_samples_matches_wav2vec2_frame_rate(self):
+        # 20 ms per frame, minus the conv receptive field at the edge.
+        self.assertEqual(frames_for_samples(16000), 49)
+        self.assertEqual(frames_for_samples(8000), 24)
+        self.assertEqual(frames_for_samples(100), 0)
+
+    def test_concurrent_sessions_share_forward_passes(self):
+        inner = FakeBackend()
+        backend = BatchingBackend(inner, max_batch_size=8, max_wait_ms=200)
+        results = {}
+        start = threading.Barrier(8)
+
+        def session(i):
+            chunk = np.full(8000 if i % 2 else 6000, float(i), dtype=np.float32)
+            start.wait()
+            results[i] = backend.infer(chunk)
+
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        self.assertLess(len(inner.batch_sizes), 8)
+        self.assertEqual(sum(inner.batch_sizes), 8)
+        for i, logits in results.items():
+            self.assertEqual(logits.shape[0], frames_for_samples(8000 if i % 2 else 6000))
+            self.assertTrue(np.all(logits == i))
+
+    def test_batch_size_is_capped(self):
+        inner = FakeBackend()
+        backend = BatchingBackend(inner, max_batch_size=3, max_wait_ms=100)
+        chunks = [np.full(4000, float(i), dtype=np.float32) for i in range(7)]
+        results = backend.infer_batch(chunks)
+        self.assertTrue(all(size <= 3 for size in inner.batch_sizes))
+        self.assertEqual([float(r[0, 0]) for r in results], list(range(7)))
+
+    def test_errors_reach_every_waiting_caller(self):
+        class Broken(FakeBackend):
+            def infer_batch(self, chunks):
+                raise RuntimeError("boom")
+
+        backend = BatchingBackend(Broken(), max_batch_size=4, max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            backend.infer(np.zeros(4000, dtype=np.float32))
+
+    def test_scheduler_runs_on_a_native_thread(self):
+        # Under gevent a plain threading.Thread would be a greenlet on the
+        # event loop; the scheduler has to come from the runtime.
+        names = []
+
+        def recording_start(target, name=""):
+            names.append(name)
+            start_native_thread(target, name=name)
+
+        with patch("inference.start_native_thread", recording_start):
+            backend = BatchingBackend(FakeBackend(), max_batch_size=2, max_wait_ms=0)
+        self.assertEqual(names, ["inference-batcher"])
+        self.assertEqual(backend.infer(np.zeros(4000, dtype=np.float32)).shape[0],
+                         frames_for_samples(4000))
+
+
+class PidBackend(FakeBackend):
+    """Stamps the logits with the pid of the process that computed them."""
+
+    def infer_batch(self, chunks):
+        return [np.full((frames_for_samples(len(c)), self.vocab_size), os.getpid(), dtype=np.float32)
+                for c in chunks]
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "process pool relies on fork")
+class PoolBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = PoolBackend(PidBackend(), workers=2, threads=1, slot_seconds=1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_inference_runs_in_worker_processes(self):
+        logits = self.pool.infer(np.zeros(8000, dtype=np.float32))
+        self.assertEqual(logits.shape, (frames_for_samples(8000), 4))
+        worker_pids = {w.process.pid for w in self.pool._workers}
+        self.assertIn(int(logits[0, 0]), worker_pids)
+
+    def test_batches_larger_than_a_worker_buffer_are_split(self):
+        chunks = [np.zeros(8000, dtype=np.float32) for _ in range(5)]  # 2.5 s into 1 s slots
+        results = self.pool.infer_batch(chunks)
+        self.assertEqual([r.shape[0] for r in results], [frames_for_samples(8000)] * 5)
+
+    def test_oversized_chunk_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.pool.infer(np.zeros(32000, dtype=np.float32))
+
+    def test_batching_keeps_every_worker_busy(self):
+        backend = BatchingBackend(self.pool, max_batch_size=2, max_wait_ms=20)
+        self.assertEqual(backend.concurrency, 2)
+        results = backend.infer_batch([np.zeros(4000, dtype=np.float32) for _ in range(6)])
+        self.assertEqual(len(results), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
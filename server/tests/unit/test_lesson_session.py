@@ -0,0 +1,109 @@
+"""Lesson-scoped sessions over the Socket.IO test client: one `start` with
+lesson: true loads the baseline once and every `next_sentence` after it is
+scored on the same socket, with no further database reads."""
+
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+WORDS_IPA = [{"word": "red", "phonemes": ["ɹ", "ɛ", "d"]}]
+
+
+def _wait_for(client, event, timeout=10, count=1):
+    """All messages received until `event` has arrived `count` times."""
+    deadline = time.monotonic() + timeout
+    received = []
+    while time.monotonic() < deadline:
+        received.extend(client.get_received())
+        if sum(m["name"] == event for m in received) >= count:
+            return received
+        time.sleep(0.05)
+    raise AssertionError(f"no {event!r} in {[m['name'] for m in received]}")
+
+
+class LessonSessionTest(unittest.TestCase):
+    def sentence(self, **extra):
+        # Logits mode with no chunks: nothing to load, the result is empty.
+        return {"sentence": "Red.", "words_ipa": WORDS_IPA, "mode": "logits", **extra}
+
+    def test_next_sentence_reuses_the_lesson(self):
+        import main
+        with patch.object(main.users_collection, "find_one", return_value=None) as find_one:
+            client = main.socketio.test_client(main.app)
+            self.addCleanup(client.disconnect)
+            client.emit("start", self.sentence(userId="demo", lesson=True))
+            client.emit("stop")
+            received = _wait_for(client, "result")
+            self.assertIn("lesson_open", [m["name"] for m in received])
+            for _ in range(3):
+                client.emit("next_sentence", self.sentence())
+                client.emit("stop")
+                _wait_for(client, "result")
+        self.assertEqual(find_one.call_count, 1)
+
+    def test_next_sentence_takes_over_the_previous_ticket(self):
+        import main
+        from admission import AdmissionController
+        with patch.object(main.users_collection, "find_one", return_value=None), \
+                patch.object(main, "admission", AdmissionController(max_sessions=1)):
+            client = main.socketio.test_client(main.app)
+            self.addCleanup(client.disconnect)
+            client.emit("start", self.sentence(userId="demo", lesson=True))
+            _wait_for(client, "lesson_open")
+            # No stop: the first sentence is still live when the next starts.
+            client.emit("next_sentence", self.sentence())
+            client.emit("stop")
+            received = _wait_for(client, "result", count=2)
+        self.assertNotIn("busy", [m["name"] for m in received])
+
+    def test_next_sentence_needs_a_lesson(self):
+        import main
+        with patch.object(main.users_collection, "find_one", return_value=None):
+            client = main.socketio.test_client(main.app)
+            self.addCleanup(client.disconnect)
+            client.emit("start", self.sentence(userId="demo"))
+            client.emit("stop")
+            _wait_for(client, "result")
+            client.emit("next_sentence", self.sentence())
+            errors = [m["args"][0]["message"] for m in _wait_for(client, "error")
+                      if m["name"] == "error"]
+        self.assertEqual(errors, ["No lesson in progress"])
+
+    def test_disconnect_closes_the_lesson(self):
+        import main
+        with patch.object(main.users_collection, "find_one", return_value=None):
+            client = main.socketio.test_client(main.app)
+            client.emit("start", self.sentence(userId="demo", lesson=True))
+            _wait_for(client, "lesson_open")
+            self.assertEqual(len(main.lesson_table), 1)
+            self.assertEqual(len(main.sessions), 1)
+            client.disconnect()
+        self.assertEqual(len(main.lesson_table), 0)
+        self.assertEqual(len(main.sessions), 0)
+
+    def test_lesson_table_is_not_shadowed(self):
+        # A module-level name reused by a view or handler would replace the
+        # table at import.
+        import main
+        from session_table import SessionTable
+        self.assertIsInstance(main.lesson_table, SessionTable)
+        self.assertIsInstance(main.sessions, SessionTable)
+
+    def test_metrics_counts_open_lessons(self):
+        import main
+        with patch.object(main.users_collection, "find_one", return_value=None):
+            client = main.socketio.test_client(main.app)
+            self.addCleanup(client.disconnect)
+            client.emit("start", self.sentence(userId="demo", lesson=True))
+            _wait_for(client, "lesson_open")
+            response = main.app.test_client().get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["lessons"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
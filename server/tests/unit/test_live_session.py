@@ -0,0 +1,104 @@
+"""Push-driven session tests: StreamingAligner must match stream_decode_logits,
+and LiveSession must align every session's chunks in order on a small shared
+pool instead of a thread per session."""
+
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from admission import BoundedChunkQueue  # noqa: E402
+from live_session import LiveSession  # noqa: E402
+from stream_decode_util import StreamingAligner, stream_decode_logits  # noqa: E402
+from tests.unit.test_alignment import FakeTokenizer, logits_for  # noqa: E402
+
+REFERENCE = ["k", "ə", "l", "ə", "r", "h", "ɝ", "d"]
+DECODED = [["k", "ə"], ["l", "ɝ"], ["h", "ə", "r"], ["d"]]
+
+
+class StreamingAlignerTest(unittest.TestCase):
+    def test_feed_matches_the_generator(self):
+        chunks = [logits_for(c) for c in DECODED]
+        expected = list(stream_decode_logits(chunks, REFERENCE, FakeTokenizer()))
+        aligner = StreamingAligner(REFERENCE, FakeTokenizer())
+        events = [e for c in chunks for e in aligner.feed(c)] + aligner.finish()
+        self.assertEqual(events, expected)
+        self.assertTrue(aligner.done)
+        self.assertEqual(aligner.feed(logits_for(["k"])), [])
+
+
+class Recorder:
+    def __init__(self, executor):
+        self.queue = BoundedChunkQueue(maxsize=100)
+        self.events = []
+        self.ended = threading.Event()
+        self.end_calls = 0
+        self.session = LiveSession(self.queue, self.start, self.events.extend,
+                                   self.on_end, executor=executor)
+
+    def start(self):
+        return StreamingAligner(REFERENCE, FakeTokenizer()), logits_for
+
+    def on_end(self):
+        self.end_calls += 1
+        self.ended.set()
+
+    def send(self, item):
+        self.queue.put(item)
+        self.session.schedule()
+
+
+class LiveSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_many_sessions_share_two_workers(self):
+        recorders = [Recorder(self.executor) for _ in range(20)]
+
+        def client(rec):
+            for chunk in DECODED:
+                rec.send(chunk)
+            rec.send(None)
+
+        clients = [threading.Thread(target=client, args=(r,)) for r in recorders]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        expected = list(stream_decode_logits([logits_for(c) for c in DECODED],
+                                             REFERENCE, FakeTokenizer()))
+        for rec in recorders:
+            self.assertTrue(rec.ended.wait(5))
+            self.assertEqual(rec.events, expected)
+            self.assertEqual(rec.end_calls, 1)
+
+    def test_failure_ends_the_session_once(self):
+        rec = Recorder(self.executor)
+        rec.send(["k"])
+        rec.send("not a phoneme")  # logits_for raises KeyError
+        rec.send(["ə"])
+        rec.send(None)
+        self.assertTrue(rec.ended.wait(5))
+        self.executor.shutdown(wait=True)
+        self.assertEqual(rec.end_calls, 1)
+        self.assertEqual([e["position"] for e in rec.events], [0])
+
+    def test_abort_drops_queued_chunks_and_ends_once(self):
+        rec = Recorder(self.executor)
+        rec.queue.put(["k"])  # queued without a pump, like a stuck session
+        rec.queue.put(["ə"])
+        rec.session.abort()
+        rec.session.abort()
+        rec.send(None)
+        self.executor.shutdown(wait=True)
+        self.assertEqual(rec.end_calls, 1)
+        self.assertEqual(rec.events, [])
+        self.assertEqual(rec.queue.qsize(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
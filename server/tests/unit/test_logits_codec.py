@@ -0,0 +1,109 @@
+"""Logits wire-format tests: every encoding must decode to logits that score
+the same as the dense float32 original."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from logits_codec import decode_logits_chunk, negotiate_encoding  # noqa: E402
+from stream_decode_util import stream_decode_logits  # noqa: E402
+from tests.unit.test_alignment import VOCAB, FakeTokenizer, logits_for  # noqa: E402
+
+REFERENCE = ["k", "ə", "l", "ə", "r"]
+DECODED = ["k", "ə", "l", "ɝ"]
+
+
+def _noisy_logits():
+    rng = np.random.default_rng(0)
+    logits = logits_for(DECODED)
+    # Keep the -20 floor flat so the top-3 fillers still sort last-id-first.
+    logits[logits > 0] += rng.uniform(-2, 2, size=len(DECODED)).astype(np.float32)
+    return logits
+
+
+def encode(logits, encoding, k=3):
+    frames = len(logits)
+    if encoding == "float32":
+        return {"frames": frames, "data": logits.astype(np.float32).tobytes()}
+    if encoding == "float16":
+        return {"frames": frames, "data": logits.astype(np.float16).tobytes()}
+    if encoding == "int8":
+        lo, hi = logits.min(axis=1), logits.max(axis=1)
+        scales = np.maximum(hi - lo, 1e-6) / 254.0
+        offsets = (hi + lo) / 2
+        q = np.round((logits - offsets[:, None]) / scales[:, None]).astype(np.int8)
+        return {"frames": frames, "data": q.tobytes(),
+                "scales": scales.astype(np.float32).tobytes(),
+                "offsets": offsets.astype(np.float32).tobytes()}
+    if encoding == "topk":
+        ids = np.argsort(logits, axis=1, kind="stable")[:, -k:]
+        values = np.take_along_axis(logits, ids, axis=1)
+        return {"frames": frames, "k": k, "ids": ids.astype(np.uint16).tobytes(),
+                "values": values.astype(np.float16).tobytes()}
+    raise AssertionError(encoding)
+
+
+def _scores(logits):
+    return [(e["position"], e["label"], e["score"])
+            for e in stream_decode_logits([logits], REFERENCE, FakeTokenizer())]
+
+
+class DecodeTest(unittest.TestCase):
+    def test_every_encoding_scores_like_float32(self):
+        logits = _noisy_logits()
+        expected = _scores(logits)
+        for encoding in ("float32", "float16", "int8", "topk"):
+            decoded = decode_logits_chunk(encode(logits, encoding), encoding, len(VOCAB))
+            self.assertEqual(decoded.shape, logits.shape, encoding)
+            self.assertEqual(_scores(decoded), expected, encoding)
+
+    def test_dense_encodings_are_views_over_the_payload(self):
+        for encoding in ("float32", "float16"):
+            payload = encode(_noisy_logits(), encoding)
+            payload["data"] = bytearray(payload["data"])
+            decoded = decode_logits_chunk(payload, encoding)
+            self.assertTrue(np.shares_memory(decoded, np.frombuffer(payload["data"], np.uint8)))
+
+    def test_int8_is_within_half_a_step(self):
+        logits = _noisy_logits()
+        payload = encode(logits, "int8")
+        decoded = decode_logits_chunk(payload, "int8")
+        step = np.frombuffer(payload["scales"], dtype=np.float32)[:, None]
+        self.assertTrue(np.all(np.abs(decoded - logits) <= step / 2 + 1e-4))
+
+    def test_topk_fills_the_rest_with_minus_infinity(self):
+        decoded = decode_logits_chunk(encode(_noisy_logits(), "topk", k=4), "topk", len(VOCAB))
+        self.assertTrue(np.all(np.isfinite(decoded).sum(axis=1) == 4))
+        self.assertTrue(np.all(np.isneginf(decoded[~np.isfinite(decoded)])))
+
+    def test_malformed_payloads_are_rejected(self):
+        good = encode(_noisy_logits(), "topk")
+        bad = [
+            ("float32", {"frames": 0, "data": b"\0" * 44}),
+            ("float32", {"frames": 3, "data": b"\0" * 44}),
+            ("int8", {"frames": 4, "data": b"\0" * 44, "scales": b"\0" * 4}),
+            ("topk", dict(good, k=2)),
+            ("topk", dict(good, ids=np.full(12, 99, dtype=np.uint16).tobytes())),
+            ("bfloat16", {"frames": 1, "data": b"\0" * 22}),
+        ]
+        for encoding, payload in bad:
+            with self.assertRaises(ValueError, msg=encoding):
+                decode_logits_chunk(payload, encoding, len(VOCAB))
+
+
+class NegotiateTest(unittest.TestCase):
+    def test_first_supported_preference_wins(self):
+        self.assertEqual(negotiate_encoding(["bfloat16", "int8", "float16"]), "int8")
+        self.assertEqual(negotiate_encoding("topk"), "topk")
+
+    def test_falls_back_to_float32(self):
+        for requested in (None, "bfloat16", [], 7):
+            self.assertEqual(negotiate_encoding(requested), "float32")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""PhonemeVocab tests: one shared index per tokenizer, used by G2P filtering
+and the aligner."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from phoneme_vocab import PhonemeVocab, phoneme_vocab  # noqa: E402
+from tests.unit.test_alignment import VOCAB, FakeTokenizer  # noqa: E402
+
+
+class RhoticTokenizer(FakeTokenizer):
+    """FakeTokenizer plus a "ɹ" token that normalizes onto "r" and a word
+    separator."""
+
+    def get_vocab(self):
+        return dict(VOCAB, **{"ɹ": 11, "|": 12})
+
+
+class PhonemeVocabTest(unittest.TestCase):
+    def test_built_once_per_tokenizer(self):
+        tokenizer = FakeTokenizer()
+        self.assertIs(phoneme_vocab(tokenizer), phoneme_vocab(tokenizer))
+        self.assertIsNot(phoneme_vocab(tokenizer), phoneme_vocab(FakeTokenizer()))
+
+    def test_ids_sharing_a_normalized_phoneme_are_grouped(self):
+        vocab = PhonemeVocab(RhoticTokenizer())
+        r = vocab.norm_id("ɹ")
+        self.assertEqual(r, vocab.norm_id("r"))
+        self.assertEqual(vocab.norm_of_id[11], r)
+        self.assertEqual(vocab.norm_of_id[VOCAB["r"]], r)
+        for tid in (VOCAB["<pad>"], 12):
+            self.assertEqual(vocab.norm_of_id[tid], -1)
+        self.assertEqual(vocab.norm_id("θ"), -1)
+
+    def test_groups_line_up_with_reduceat(self):
+        vocab = PhonemeVocab(RhoticTokenizer())
+        row = np.arange(13, dtype=np.float32)[np.newaxis, :]
+        best = np.maximum.reduceat(row[:, vocab.group_cols], vocab.group_starts, axis=1)[0]
+        self.assertEqual(best[vocab.norm_id("r")], 11.0)  # "ɹ" beats "r" (5)
+        self.assertEqual(best[vocab.norm_id("k")], VOCAB["k"])
+
+    def test_g2p_output_is_filtered_to_emittable_phonemes(self):
+        vocab = PhonemeVocab(RhoticTokenizer())
+        tokens = ["ˈ", "k", "ʌ", "|", "<pad>", "θ", "ɹ", "ː"]
+        self.assertEqual(vocab.g2p_phonemes(tokens), ["k", "ʌ", "ɹ"])
+
+
+if __name__ == "__main__":
+    unittest.main()
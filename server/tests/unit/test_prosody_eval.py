@@ -0,0 +1,191 @@
+"""Prosody tests: the vectorized voiced-region/nPVI helpers, and agreement
+between the NumPy YIN tracker and librosa.pyin on the bundled test wav and
+on synthetic utterances with known pitch contours."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import librosa  # noqa: E402
+
+from prosody_eval import (ProsodyAccumulator, _bridge_gaps, _npvi, _voiced_regions,  # noqa: E402
+                          evaluate_prosody, pitch_tracker, yin)
+
+SR = 16000
+# The tracked copy at the repo root; server/testfiles is git-ignored.
+TEST_WAV = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "testfiles",
+                                        "uploaded_test.wav"))
+
+# (syllables, text): each syllable is (seconds, start Hz, end Hz).
+UTTERANCES = {
+    "question": ([(0.2, 180, 185), (0.3, 185, 180), (0.15, 180, 200), (0.3, 200, 260)], "Is it?"),
+    "statement": ([(0.3, 240, 230), (0.2, 230, 215), (0.3, 215, 190)], "It is."),
+    "flat": ([(0.2, 150, 150), (0.2, 150, 150), (0.2, 150, 150)], "It is."),
+}
+
+
+def synthetic_utterance(syllables, seed=0, sr=SR, gap=0.12, noise=0.01):
+    """Five-harmonic voiced syllables gliding between the given pitches,
+    separated by gaps and padded with 0.2 s of near-silence."""
+    rng = np.random.default_rng(seed)
+    parts = [np.zeros(int(0.2 * sr))]
+    for seconds, f_start, f_end in syllables:
+        n = int(seconds * sr)
+        phase = 2 * np.pi * np.cumsum(np.linspace(f_start, f_end, n)) / sr
+        voice = sum(np.sin(h * phase) / h for h in range(1, 6))
+        parts += [0.3 * voice * np.hanning(n) ** 0.3, np.zeros(int(gap * sr))]
+    parts.append(np.zeros(int(0.2 * sr)))
+    audio = np.concatenate(parts)
+    return (audio + noise * rng.standard_normal(len(audio))).astype(np.float32)
+
+
+def agreement_audio():
+    if os.path.exists(TEST_WAV):
+        yield "uploaded_test.wav", librosa.load(TEST_WAV, sr=SR)[0], "hi"
+    for name, (syllables, text) in UTTERANCES.items():
+        yield name, synthetic_utterance(syllables), text
+
+
+class VoicedRegionsTest(unittest.TestCase):
+    def test_regions(self):
+        flag = np.array([0, 1, 1, 0, 0, 1, 0, 1, 1, 1], dtype=bool)
+        self.assertEqual(_voiced_regions(flag).tolist(), [[1, 3], [5, 6], [7, 10]])
+        self.assertEqual(_voiced_regions(np.zeros(4, dtype=bool)).shape, (0, 2))
+        self.assertEqual(_voiced_regions(np.ones(3, dtype=bool)).tolist(), [[0, 3]])
+
+    def test_npvi(self):
+        self.assertAlmostEqual(_npvi(np.array([2, 2, 2])), 0.0)
+        # |2-6| / 4 = 1, |6-2| / 4 = 1
+        self.assertAlmostEqual(_npvi(np.array([2, 6, 2])), 100.0)
+
+    def test_bridge_gaps_fills_only_short_inner_gaps(self):
+        flag = np.array([0, 1, 0, 0, 1, 0, 0, 0, 1, 0], dtype=bool)
+        self.assertEqual(_bridge_gaps(flag, 2).astype(int).tolist(),
+                         [0, 1, 1, 1, 1, 0, 0, 0, 1, 0])
+
+
+class YinTest(unittest.TestCase):
+    def test_pure_tones(self):
+        t = np.arange(SR) / SR
+        for hz in (90.0, 150.0, 220.0, 290.0):
+            f0, voiced = yin(np.sin(2 * np.pi * hz * t), SR)
+            self.assertGreater(voiced.mean(), 0.9)
+            self.assertAlmostEqual(float(np.nanmedian(f0)) / hz, 1.0, delta=0.005)
+
+    def test_silence_and_short_input_are_unvoiced(self):
+        for audio in (np.zeros(SR), np.zeros(100), np.zeros(0)):
+            f0, voiced = yin(audio, SR)
+            self.assertFalse(voiced.any())
+            self.assertTrue(np.isnan(f0).all())
+
+    def test_flat_pitch_is_monotone(self):
+        audio = synthetic_utterance(UTTERANCES["flat"][0])
+        self.assertLess(evaluate_prosody(audio, "It is.", tracker="yin")["monotony_score"], 0.05)
+
+    def test_unknown_tracker(self):
+        with self.assertRaises(ValueError):
+            pitch_tracker("crepe")
+
+
+class PyinAgreementTest(unittest.TestCase):
+    def test_pitch_agrees_where_both_are_voiced(self):
+        for name, audio, _ in agreement_audio():
+            with self.subTest(name):
+                f0_pyin, voiced_pyin = pitch_tracker("pyin")(audio, SR)
+                f0_yin, voiced_yin = yin(audio, SR)
+                self.assertEqual(len(f0_yin), len(f0_pyin))
+                both = voiced_pyin & voiced_yin
+                self.assertGreater(both.sum(), 10)
+                cents = np.abs(1200 * np.log2(f0_yin[both] / f0_pyin[both]))
+                self.assertLess(np.median(cents), 10)
+                self.assertGreater(np.mean(cents < 50), 0.9)
+                # yin's voicing is the stricter of the two.
+                self.assertGreater(voiced_pyin[voiced_yin].mean(), 0.9)
+
+    def test_scores_agree_on_synthetic_utterances(self):
+        for name, (syllables, text) in UTTERANCES.items():
+            with self.subTest(name):
+                audio = synthetic_utterance(syllables)
+                expected = evaluate_prosody(audio, text, tracker="pyin")
+                scores = evaluate_prosody(audio, text, tracker="yin")
+                # pyin's voicing HMM sometimes runs on into the trailing
+                # near-silence at a spurious low pitch, which inflates its
+                # monotony score; compare pitch spread where both are voiced.
+                del expected["monotony_score"], scores["monotony_score"]
+                self.assertEqual(scores, expected)
+                f0_pyin, voiced_pyin = pitch_tracker("pyin")(audio, SR)
+                f0_yin, voiced_yin = yin(audio, SR)
+                both = voiced_pyin & voiced_yin
+                self.assertAlmostEqual(np.std(f0_yin[both]), np.std(f0_pyin[both]), delta=2.0)
+
+    def test_boundary_tone_agrees_on_the_test_wav(self):
+        if not os.path.exists(TEST_WAV):
+            self.skipTest("uploaded_test.wav not present")
+        audio = librosa.load(TEST_WAV, sr=SR)[0]
+        for text in ("Hi.", "Hi?"):
+            self.assertEqual(evaluate_prosody(audio, text, tracker="yin")["boundary_score"],
+                             evaluate_prosody(audio, text, tracker="pyin")["boundary_score"])
+
+
+def push_in_chunks(accumulator, audio, seed):
+    rng = np.random.default_rng(seed)
+    i = 0
+    while i < len(audio):
+        n = int(rng.integers(1, 6000))
+        accumulator.push(audio[i:i + n])
+        i += n
+
+
+class ProsodyAccumulatorTest(unittest.TestCase):
+    def test_chunked_yin_matches_the_whole_utterance(self):
+        for name, audio, text in agreement_audio():
+            expected = evaluate_prosody(audio, text, tracker="yin")
+            for seed in range(3):
+                with self.subTest(name, seed=seed):
+                    accumulator = ProsodyAccumulator(tracker="yin")
+                    push_in_chunks(accumulator, audio, seed)
+                    self.assertEqual(accumulator.scores(text), expected)
+
+    def test_tracking_between_pushes_matches(self):
+        audio = synthetic_utterance(UTTERANCES["question"][0])
+        accumulator = ProsodyAccumulator(tracker="yin")
+        accumulator.push(audio[:3000])
+        self.assertEqual(len(accumulator._tracked[0]), 0)  # push() only queues
+        accumulator.track()
+        self.assertGreater(len(accumulator._tracked[0]), 0)
+        for i in range(3000, len(audio), 3000):
+            accumulator.push(audio[i:i + 3000])
+            accumulator.track()
+        self.assertEqual(accumulator.scores("Is it?"),
+                         evaluate_prosody(audio, "Is it?", tracker="yin"))
+
+    def test_short_audio(self):
+        audio = synthetic_utterance(UTTERANCES["flat"][0])
+        for n in (100, 1500, 3000):
+            accumulator = ProsodyAccumulator(tracker="yin")
+            accumulator.push(audio[:n])
+            self.assertEqual(accumulator.scores("x"), evaluate_prosody(audio[:n], "x", tracker="yin"))
+
+    def test_scores_mid_stream_leave_the_stream_open(self):
+        audio = synthetic_utterance(UTTERANCES["question"][0])
+        accumulator = ProsodyAccumulator(tracker="yin")
+        accumulator.push(audio[:10000])
+        accumulator.scores("Is it?")
+        accumulator.push(audio[10000:])
+        self.assertEqual(accumulator.scores("Is it?"),
+                         evaluate_prosody(audio, "Is it?", tracker="yin"))
+
+    def test_pyin_buffers_the_audio(self):
+        audio = synthetic_utterance(UTTERANCES["statement"][0])
+        accumulator = ProsodyAccumulator(tracker="pyin")
+        push_in_chunks(accumulator, audio, 0)
+        self.assertEqual(accumulator.scores("It is."), evaluate_prosody(audio, "It is.", tracker="pyin"))
+        self.assertEqual(accumulator.samples, len(audio))
+
+
+if __name__ == "__main__":
+    unittest.main()
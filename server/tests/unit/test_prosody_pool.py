@@ -0,0 +1,123 @@
+"""Prosody pool tests: queue limit, deadlines and failures are each reported
+exactly once with an explicit status, and real worker processes score a
+ProsodyAccumulator the same as scoring it in-process."""
+
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from prosody_eval import ProsodyAccumulator  # noqa: E402
+from prosody_pool import SCORE_KEYS, ProsodyPool  # noqa: E402
+from tests.unit.test_prosody_eval import UTTERANCES, synthetic_utterance  # noqa: E402
+
+SCORES = {"monotony_score": 0.5, "rhythm_score": None, "boundary_score": 1.0,
+          "speaking_rate": 1.2}
+
+
+class FakeAccumulator:
+    """scores() blocks until released; raises if told to."""
+
+    def __init__(self, fail=False):
+        self.release = threading.Event()
+        self.fail = fail
+
+    def scores(self, text):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("boom")
+        return SCORES
+
+
+class Messages:
+    def __init__(self):
+        self.items = []
+        self.settled = threading.Event()
+
+    def __call__(self, message):
+        self.items.append(message)
+        self.settled.set()
+
+    def statuses(self):
+        return [m["status"] for m in self.items]
+
+
+class ProsodyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def pool(self, **kwargs):
+        return ProsodyPool(workers=1, executor=self.executor, **kwargs)
+
+    def test_ok(self):
+        pool, job, messages = self.pool(deadline=5), FakeAccumulator(), Messages()
+        job.release.set()
+        pool.submit(job, "Hi.", messages)
+        self.assertTrue(messages.settled.wait(5))
+        self.assertEqual(messages.items, [{**SCORES, "status": "ok"}])
+
+    def test_full_queue_drops_new_jobs(self):
+        pool = self.pool(max_queue=1, deadline=5)
+        jobs = [FakeAccumulator() for _ in range(3)]
+        messages = [Messages() for _ in jobs]
+        for job, m in zip(jobs, messages):
+            pool.submit(job, "Hi.", m)
+        # One running, one waiting, the third refused immediately.
+        self.assertEqual(messages[2].items, [{**dict.fromkeys(SCORE_KEYS), "status": "dropped"}])
+        for job in jobs:
+            job.release.set()
+        for m in messages[:2]:
+            self.assertTrue(m.settled.wait(5))
+            self.assertEqual(m.statuses(), ["ok"])
+        self.executor.shutdown(wait=True)
+        self.assertEqual(pool.stats(), {"workers": 1, "in_flight": 0, "ok": 2, "late": 0,
+                                        "dropped": 1, "failed": 0})
+
+    def test_deadline_reports_late_once(self):
+        pool, running, waiting = self.pool(deadline=0.05), FakeAccumulator(), FakeAccumulator()
+        first, second = Messages(), Messages()
+        pool.submit(running, "Hi.", first)
+        pool.submit(waiting, "Hi.", second)
+        self.assertTrue(first.settled.wait(5))
+        self.assertTrue(second.settled.wait(5))
+        running.release.set()  # finishes after its deadline; scores discarded
+        self.executor.shutdown(wait=True)
+        self.assertEqual(first.statuses(), ["late"])
+        self.assertEqual(second.statuses(), ["late"])  # cancelled before it started
+        self.assertEqual(first.items[0]["monotony_score"], None)
+        self.assertEqual(pool.stats()["in_flight"], 0)
+
+    def test_failure(self):
+        pool, job, messages = self.pool(deadline=5), FakeAccumulator(fail=True), Messages()
+        job.release.set()
+        with self.assertLogs("prosody_pool", "ERROR"):
+            pool.submit(job, "Hi.", messages)
+            self.assertTrue(messages.settled.wait(5))
+        self.assertEqual(messages.statuses(), ["failed"])
+
+    def test_inline(self):
+        job, messages = FakeAccumulator(), Messages()
+        job.release.set()
+        ProsodyPool(workers=0).submit(job, "Hi.", messages)
+        self.assertEqual(messages.statuses(), ["ok"])
+
+
+class ProcessPoolTest(unittest.TestCase):
+    def test_worker_process_scores_match(self):
+        syllables, text = UTTERANCES["question"]
+        accumulator = ProsodyAccumulator(tracker="yin")
+        accumulator.push(synthetic_utterance(syllables))
+        pool = ProsodyPool(workers=1, deadline=60, nice=0)
+        self.addCleanup(lambda: pool._executor.shutdown())
+        messages = Messages()
+        pool.submit(accumulator, text, messages)
+        self.assertTrue(messages.settled.wait(60))
+        self.assertEqual(messages.items, [{**accumulator.scores(text), "status": "ok"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
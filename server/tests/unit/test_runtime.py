@@ -0,0 +1,46 @@
+"""Runtime tests for the default threading mode: native workers are a plain
+thread pool and worker callbacks run where they're called."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import runtime  # noqa: E402
+
+
+class ThreadingRuntimeTest(unittest.TestCase):
+    def test_native_executor_runs_on_os_threads(self):
+        executor = runtime.native_executor(2, thread_name_prefix="test", mode="threading")
+        self.addCleanup(executor.shutdown)
+        name = executor.submit(lambda: threading.current_thread().name).result(5)
+        self.assertTrue(name.startswith("test"))
+
+    def test_native_thread_is_a_daemon(self):
+        started = threading.Event()
+        seen = {}
+
+        def target():
+            seen["daemon"] = threading.current_thread().daemon
+            started.set()
+
+        runtime.start_native_thread(target, name="test-loop", mode="threading")
+        self.assertTrue(started.wait(5))
+        self.assertTrue(seen["daemon"])
+
+    def test_in_loop_is_a_direct_call(self):
+        def callback(x):
+            return x + 1
+        self.assertIs(runtime.in_loop(callback), callback)
+
+    def test_unknown_mode(self):
+        for call in (lambda: runtime.patch("eventlet"),
+                     lambda: runtime.native_executor(1, mode="asyncio")):
+            with self.assertRaises(ValueError):
+                call()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Session reaper tests, on a fake clock: idle and over-long sessions are
+ended once, aborted if they're still around after the grace period, and
+counted by reason."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from session_reaper import SessionReaper  # noqa: E402
+from session_table import SessionTable  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SessionReaperTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.sessions = SessionTable(shards=4)
+        self.ended, self.aborted = [], []
+        self.reaper = SessionReaper(self.sessions, self.end, self.abort,
+                                    idle_timeout=30, max_duration=300, grace=15,
+                                    clock=self.clock)
+
+    def end(self, sid, session, reason):
+        self.ended.append((sid, reason))
+
+    def abort(self, sid, session):
+        self.aborted.append(sid)
+        self.sessions.remove(sid, session)
+
+    def add(self, sid, started_ago=0.0, idle_for=0.0):
+        self.sessions.put(sid, {'started': self.clock.now - started_ago,
+                                'last_active': self.clock.now - idle_for})
+
+    def test_active_sessions_are_left_alone(self):
+        self.add("a", started_ago=100, idle_for=5)
+        self.assertEqual(self.reaper.sweep(), [])
+        self.assertEqual(self.ended, [])
+
+    def test_idle_and_max_duration(self):
+        self.add("idle", started_ago=60, idle_for=31)
+        self.add("long", started_ago=301, idle_for=1)
+        self.add("both", started_ago=400, idle_for=100)
+        self.assertEqual(sorted(self.reaper.sweep()),
+                         [("both", "max_duration"), ("idle", "idle"), ("long", "max_duration")])
+        # Ended once, not on every sweep while they wind down.
+        self.clock.now += 5
+        self.assertEqual(self.reaper.sweep(), [])
+        self.assertEqual(len(self.ended), 3)
+        self.assertEqual(self.reaper.stats(), {"idle": 1, "max_duration": 2, "aborted": 0})
+
+    def test_sessions_that_dont_wind_down_are_aborted(self):
+        self.add("stuck", idle_for=31)
+        self.add("clean", idle_for=31)
+        self.reaper.sweep()
+        self.sessions.pop("clean")  # its teardown ran
+        self.clock.now += 15
+        self.assertEqual(self.reaper.sweep(), [("stuck", "aborted")])
+        self.assertEqual(self.aborted, ["stuck"])
+        self.assertEqual(len(self.sessions), 0)
+        self.assertEqual(self.reaper.stats(), {"idle": 2, "max_duration": 0, "aborted": 1})
+
+    def test_a_failing_callback_doesnt_stop_the_sweep(self):
+        def end(sid, session, reason):
+            raise RuntimeError("boom")
+        reaper = SessionReaper(self.sessions, end, self.abort, idle_timeout=30,
+                               clock=self.clock)
+        self.add("a", idle_for=31)
+        self.add("b", idle_for=31)
+        with self.assertLogs("session_reaper", "ERROR"):
+            self.assertEqual(len(reaper.sweep()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
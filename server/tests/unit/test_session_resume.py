@@ -0,0 +1,66 @@
+"""Resume table tests, on a fake clock: a parked session can be resumed
+once with its token, and one nobody comes back for is expired exactly once
+after the grace period."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from session_resume import ResumeTable, new_resume_token  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResumeTableTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.expired = []
+        self.table = ResumeTable(lambda *entry: self.expired.append(entry), grace=30,
+                                 clock=self.clock)
+
+    def test_resume_once(self):
+        lesson, session = {"user_id": "demo"}, {"results": []}
+        self.table.park("t", lesson, session)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.table.resume("t"), (lesson, session))
+        self.assertIsNone(self.table.resume("t"))
+        self.assertIsNone(self.table.resume("unknown"))
+        self.assertEqual(self.table.stats(), {"parked": 0, "resumed": 1, "expired": 0})
+
+    def test_expires_after_the_grace_period(self):
+        self.table.park("old", None, {"n": 1})
+        self.clock.now += 20
+        self.table.park("new", {"n": 2}, None)
+        self.assertEqual(self.table.sweep(), [])
+        self.clock.now += 10
+        self.assertEqual(self.table.sweep(), ["old"])
+        self.assertEqual(self.expired, [("old", None, {"n": 1})])
+        self.assertIsNone(self.table.resume("old"))
+        self.assertEqual(self.table.resume("new"), ({"n": 2}, None))
+        self.assertEqual(self.table.stats(), {"parked": 0, "resumed": 1, "expired": 1})
+
+    def test_a_failing_expire_doesnt_stop_the_sweep(self):
+        def expire(token, lesson, session):
+            raise RuntimeError("boom")
+        table = ResumeTable(expire, grace=0, clock=self.clock)
+        table.park("a", None, None)
+        table.park("b", None, None)
+        with self.assertLogs("session_resume", "ERROR"):
+            self.assertEqual(sorted(table.sweep()), ["a", "b"])
+
+    def test_tokens_are_unguessable(self):
+        tokens = {new_resume_token() for _ in range(100)}
+        self.assertEqual(len(tokens), 100)
+        self.assertTrue(all(len(t) >= 24 for t in tokens))
+
+
+if __name__ == "__main__":
+    unittest.main()
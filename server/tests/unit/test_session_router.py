@@ -0,0 +1,103 @@
+"""Session routing tests: claims, ownership checks from another node, expiry
+and refresh on a fake clock, and release only by the owner. The Redis
+router runs against fakeredis when it's installed."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from session_router import MemoryRouter, RedisRouter, make_router  # noqa: E402
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RouterContract:
+    """Behaviour every router shares; mixed into a TestCase with routers()."""
+
+    def test_owner_and_elsewhere(self):
+        a, b = self.routers("node-a", "node-b")
+        a.claim("s1")
+        self.assertEqual(a.owner("s1"), "node-a")
+        self.assertEqual(b.owner("s1"), "node-a")
+        self.assertIsNone(a.elsewhere("s1"))
+        self.assertEqual(b.elsewhere("s1"), "node-a")
+        self.assertIsNone(b.elsewhere("unknown"))
+        self.assertEqual(b.stats()["moved"], 1)
+        self.assertEqual(a.stats()["claimed"], 1)
+
+    def test_only_the_owner_releases(self):
+        a, b = self.routers("node-a", "node-b")
+        a.claim("s1")
+        b.release("s1")
+        self.assertEqual(a.owner("s1"), "node-a")
+        a.release("s1")
+        self.assertIsNone(b.owner("s1"))
+
+    def test_reclaimed_session_survives_the_old_owners_release(self):
+        a, b = self.routers("node-a", "node-b")
+        a.claim("s1")
+        b.claim("s1")
+        a.release("s1")
+        self.assertEqual(a.owner("s1"), "node-b")
+
+
+class MemoryRouterTest(RouterContract, unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def routers(self, *nodes):
+        # One shared table standing in for the shared backend.
+        routers = [MemoryRouter(ttl=60, node=node, clock=self.clock) for node in nodes]
+        for router in routers[1:]:
+            router._routes, router._lock = routers[0]._routes, routers[0]._lock
+        return routers
+
+    def test_routes_expire_unless_refreshed(self):
+        (router,) = self.routers("node-a")
+        router.claim("live")
+        router.claim("crashed")
+        self.clock.now += 40
+        router.refresh(["live"])
+        self.clock.now += 40
+        self.assertEqual(router.owner("live"), "node-a")
+        self.assertIsNone(router.owner("crashed"))
+
+    def test_run_refreshes_live_sessions(self):
+        (router,) = self.routers("node-a")
+        router.claim("s1")
+
+        def sleep(seconds):
+            self.clock.now += seconds
+            if self.clock.now > 1000 + 3 * router.ttl:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            router.run(lambda: ["s1"], sleep=sleep)
+        self.assertEqual(router.owner("s1"), "node-a")
+
+    def test_default(self):
+        self.assertIsInstance(make_router(""), MemoryRouter)
+
+
+@unittest.skipUnless(fakeredis, "fakeredis not installed")
+class RedisRouterTest(RouterContract, unittest.TestCase):
+    def routers(self, *nodes):
+        server = fakeredis.FakeServer()
+        return [RedisRouter(fakeredis.FakeRedis(server=server), ttl=60, node=node)
+                for node in nodes]
+
+
+if __name__ == "__main__":
+    unittest.main()
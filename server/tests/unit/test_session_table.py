@@ -0,0 +1,65 @@
+"""Sharded session table tests: lookups, compare-and-remove, snapshots across
+shards, and concurrent handlers on different sessions."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from session_table import SessionTable  # noqa: E402
+
+
+class SessionTableTest(unittest.TestCase):
+    def test_get_put_pop(self):
+        table = SessionTable(shards=8)
+        self.assertIsNone(table.get("a"))
+        table.put("a", {"n": 1})
+        self.assertEqual(table.get("a"), {"n": 1})
+        self.assertEqual(table.pop("a"), {"n": 1})
+        self.assertIsNone(table.pop("a"))
+        self.assertEqual(len(table), 0)
+
+    def test_remove_only_the_same_session(self):
+        table = SessionTable(shards=8)
+        old, new = {}, {}
+        table.put("a", old)
+        table.put("a", new)  # a fresh start on the same socket
+        self.assertFalse(table.remove("a", old))
+        self.assertIs(table.get("a"), new)
+        self.assertTrue(table.remove("a", new))
+        self.assertIsNone(table.get("a"))
+
+    def test_snapshot_spans_every_shard(self):
+        table = SessionTable(shards=4)
+        for i in range(100):
+            table.put(f"sid{i}", i)
+        self.assertEqual(len(table), 100)
+        self.assertEqual(sorted(table.values()), list(range(100)))
+        # A snapshot: changing the table while walking it is fine.
+        for sid, _ in table.items():
+            table.pop(sid)
+        self.assertEqual(table.items(), [])
+
+    def test_concurrent_handlers(self):
+        table = SessionTable(shards=16)
+
+        def handler(worker):
+            for i in range(500):
+                sid = f"{worker}-{i}"
+                table.put(sid, worker)
+                self.assertEqual(table.get(sid), worker)
+                if i % 2:
+                    table.pop(sid)
+
+        threads = [threading.Thread(target=handler, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(table), 8 * 250)
+
+
+if __name__ == "__main__":
+    unittest.main()
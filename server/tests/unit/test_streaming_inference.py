@@ -0,0 +1,86 @@
+"""Left-context streaming inference tests.
+
+A fake backend whose frame j is computed from exactly the audio wav2vec2's
+frame j would see (samples 320j .. 320j+400) makes it easy to check that
+windowed, chunked inference emits the same frames as one pass over the whole
+utterance.
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from inference import InferenceBackend, frames_for_samples  # noqa: E402
+from stream_decode_util import AudioLogitsStream, LeftContextWindow  # noqa: E402
+
+
+class ReceptiveFieldBackend(InferenceBackend):
+    vocab_size = 2
+
+    def __init__(self):
+        super().__init__(processor=None)
+        self.window_lengths = []
+
+    def infer(self, chunk):
+        self.window_lengths.append(len(chunk))
+        frames = frames_for_samples(len(chunk))
+        out = np.zeros((frames, 2), dtype=np.float32)
+        for j in range(frames):
+            out[j, 1] = chunk[320 * j:320 * j + 400].sum()
+        return out
+
+
+def _utterance(seconds=3):
+    rng = np.random.default_rng(1)
+    return rng.standard_normal(int(16000 * seconds)).astype(np.float32)
+
+
+def _chunks(audio, ms):
+    size = 16 * ms
+    return [audio[i:i + size] for i in range(0, len(audio), size)]
+
+
+class LeftContextWindowTest(unittest.TestCase):
+    def _stream(self, context_ms, chunk_ms):
+        audio = _utterance()
+        whole = ReceptiveFieldBackend().infer(audio)
+        backend = ReceptiveFieldBackend()
+        stream = AudioLogitsStream(backend, blank_id=0, vad=False, left_context_ms=context_ms)
+        streamed = np.concatenate([stream.push(c) for c in _chunks(audio, chunk_ms)])
+        return whole, streamed, backend
+
+    def test_streamed_frames_match_whole_utterance(self):
+        for context_ms, chunk_ms in ((1000, 200), (300, 200), (20, 500), (480, 130)):
+            whole, streamed, _ = self._stream(context_ms, chunk_ms)
+            np.testing.assert_allclose(streamed, whole, rtol=1e-5, atol=1e-4,
+                                       err_msg=f"context={context_ms} chunk={chunk_ms}")
+
+    def test_window_is_bounded_by_context_plus_chunk(self):
+        _, _, backend = self._stream(1000, 200)
+        # context + chunk + the unfinished tail of the previous frame
+        self.assertLessEqual(max(backend.window_lengths), 16 * (1000 + 200) + 400)
+
+    def test_context_is_snapped_to_the_frame_grid(self):
+        window = LeftContextWindow(1000)
+        self.assertEqual(window.context % 320, 0)
+        for chunk in _chunks(_utterance(1), 70):
+            window.push(chunk)
+            self.assertEqual(window.start % 320, 0)
+
+    def test_silent_chunks_keep_context_but_skip_the_model(self):
+        backend = ReceptiveFieldBackend()
+        stream = AudioLogitsStream(backend, blank_id=0, vad=True, left_context_ms=500)
+        silence = np.zeros(3200, dtype=np.float32)
+        logits = stream.push(silence)
+        self.assertEqual(backend.window_lengths, [])
+        self.assertTrue(np.all(logits.argmax(-1) == 0))
+        stream.push(_utterance(0.2) * 0.5)
+        self.assertGreater(backend.window_lengths[0], 3200)  # silence kept as context
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Voice-activity gate tests: silent chunks must skip the model entirely."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from inference import InferenceBackend, frames_for_samples  # noqa: E402
+from stream_decode_util import stream_decode_logits, stream_decode_util  # noqa: E402
+from tests.unit.test_alignment import VOCAB, FakeTokenizer  # noqa: E402
+from tests.utils.utils import TESTFILES_DIR, load_test_wav, split_chunks  # noqa: E402
+from vad import blank_logits, is_speech  # noqa: E402
+
+
+class FakeProcessor:
+    tokenizer = FakeTokenizer()
+
+
+class CountingBackend(InferenceBackend):
+    vocab_size = len(VOCAB)
+
+    def __init__(self):
+        super().__init__(FakeProcessor())
+        self.calls = 0
+
+    def infer(self, chunk):
+        self.calls += 1
+        return blank_logits(frames_for_samples(len(chunk)), self.vocab_size, 0)
+
+
+def _wav_chunks(name):
+    path = os.path.join(TESTFILES_DIR, name)
+    if not os.path.exists(path):
+        raise unittest.SkipTest(f"{name} not present")
+    return split_chunks(load_test_wav(path))
+
+
+class VadTest(unittest.TestCase):
+    def test_empty_recording_is_all_silence(self):
+        self.assertFalse(any(is_speech(c) for c in _wav_chunks("empty.wav")))
+
+    def test_speech_recordings_are_detected(self):
+        for name in ("reference.wav", "same_words.wav", "testsound.wav"):
+            flags = [is_speech(c) for c in _wav_chunks(name)]
+            self.assertGreaterEqual(sum(flags), len(flags) - 2, name)
+
+    def test_quiet_fricative_hiss_counts_as_speech(self):
+        rng = np.random.default_rng(0)
+        hiss = (rng.standard_normal(8000) * 0.006).astype(np.float32)  # below the energy bar
+        self.assertTrue(is_speech(hiss))
+
+    def test_digital_silence_and_empty_chunks(self):
+        self.assertFalse(is_speech(np.zeros(8000, dtype=np.float32)))
+        self.assertFalse(is_speech(np.zeros(0, dtype=np.float32)))
+
+    def test_empty_recording_never_reaches_the_model(self):
+        backend = CountingBackend()
+        events = list(stream_decode_util(_wav_chunks("empty.wav"), ["k", "ə", "l"],
+                                         FakeProcessor(), backend, vad=True))
+        self.assertEqual(backend.calls, 0)
+        self.assertEqual(events, [])
+
+    def test_vad_off_runs_every_chunk(self):
+        backend = CountingBackend()
+        chunks = [np.zeros(8000, dtype=np.float32)] * 3
+        list(stream_decode_util(chunks, ["k"], FakeProcessor(), backend, vad=False))
+        self.assertEqual(backend.calls, 3)
+
+    def test_blank_frames_decode_to_nothing(self):
+        logits = blank_logits(25, len(VOCAB), 0)
+        self.assertEqual(list(stream_decode_logits([logits], ["k", "ə"], FakeTokenizer())), [])
+        self.assertFalse(logits.flags.writeable)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,28 @@
+import glob
+import os
+
+TESTFILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "testfiles"))
+
+
 def generate_test_sound(text, path):
     from gtts import gTTS
     myobj = gTTS(text=text, lang='en', slow=True)
     myobj.save(path)
+
+
+def bundled_wav_paths():
+    return sorted(glob.glob(os.path.join(TESTFILES_DIR, "*.wav")))
+
+
+def load_test_wav(path, sample_rate=16000):
+    """Read a bundled test wav as mono float32 at sample_rate (the recordings
+    are a mix of 16 kHz and 24 kHz)."""
+    import librosa
+    audio, _ = librosa.load(path, sr=sample_rate, mono=True)
+    return audio.astype("float32")
+
+
+def split_chunks(audio, sample_rate=16000, chunk_ms=500):
+    """Cut audio into the fixed-size chunks the frontend streams."""
+    size = int(sample_rate * chunk_ms / 1000)
+    return [audio[i:i + size] for i in range(0, len(audio), size)]
@@ -0,0 +1,59 @@
+"""Cheap energy / zero-crossing voice-activity gate for server-side inference.
+
+Kids leave long silences before and between words, and every 500 ms chunk of
+it used to cost a full wav2vec2 forward pass that decodes to nothing but CTC
+blanks. is_speech() looks at the chunk in 20 ms frames: a frame counts as
+speech when it's loud enough (voiced sounds), or quieter but with a high
+zero-crossing rate (unvoiced fricatives like /s/ and /f/ are mostly noise-like
+hiss with little energy). A chunk with fewer than VAD_MIN_SPEECH_FRAMES speech
+frames is silent, and stream_decode_util reports it to the aligner as blank
+frames without running the model.
+"""
+import os
+
+import numpy as np
+
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") != "0"
+# RMS on float audio in [-1, 1]; 0.01 is about -40 dBFS.
+VAD_ENERGY_THRESHOLD = float(os.environ.get("VAD_ENERGY_THRESHOLD", "0.01"))
+VAD_FRICATIVE_ENERGY_THRESHOLD = float(os.environ.get("VAD_FRICATIVE_ENERGY_THRESHOLD", "0.003"))
+VAD_FRICATIVE_ZCR_THRESHOLD = float(os.environ.get("VAD_FRICATIVE_ZCR_THRESHOLD", "0.3"))
+VAD_MIN_SPEECH_FRAMES = int(os.environ.get("VAD_MIN_SPEECH_FRAMES", "2"))
+
+FRAME_SAMPLES = 320  # 20 ms at 16 kHz — one wav2vec2 logit frame
+
+
+def speech_frames(chunk):
+    """Boolean mask of which 20 ms frames in chunk look like speech."""
+    chunk = np.asarray(chunk, dtype=np.float32)
+    n = len(chunk) // FRAME_SAMPLES
+    if n == 0:
+        frames = chunk[np.newaxis, :]
+    else:
+        frames = chunk[:n * FRAME_SAMPLES].reshape(n, FRAME_SAMPLES)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+    return (rms > VAD_ENERGY_THRESHOLD) | (
+        (rms > VAD_FRICATIVE_ENERGY_THRESHOLD) & (zcr > VAD_FRICATIVE_ZCR_THRESHOLD))
+
+
+def is_speech(chunk):
+    if len(chunk) == 0:
+        return False
+    return int(np.count_nonzero(speech_frames(chunk))) >= VAD_MIN_SPEECH_FRAMES
+
+
+_blank_cache = {}
+
+
+def blank_logits(frames, vocab_size, blank_id):
+    """(frames, vocab) logits that decode to nothing but CTC blanks. Cached
+    and read-only — the aligner never writes to its input."""
+    key = (frames, vocab_size, blank_id)
+    logits = _blank_cache.get(key)
+    if logits is None:
+        logits = np.full((frames, vocab_size), -20.0, dtype=np.float32)
+        logits[:, blank_id] = 10.0
+        logits.setflags(write=False)
+        _blank_cache[key] = logits
+    return logits
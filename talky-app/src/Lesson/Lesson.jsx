@@ -685,6 +685,16 @@ export default function Lesson() {
   const stopTimeoutRef = useRef(null);
   const stopHardCapRef = useRef(null);
   const prosodyTimeoutRef = useRef(null);
+  // True while the server holds a lesson open on this socket: later
+  // sentences go out as `next_sentence` on the same connection.
+  const lessonOpenRef = useRef(false);
+  // Resuming after a dropped connection: the server's token for this
+  // socket's session, and everything sent for the current sentence so the
+  // chunks the server never got can be sent again.
+  const resumeTokenRef = useRef(null);
+  const sentChunksRef = useRef([]);
+  const sentLogitsRef = useRef([]);
+  const stopSentRef = useRef(false);
 
   useEffect(() => {
     const socket = io(API_BASE, { autoConnect: false, transports: ['websocket', 'polling'] });
@@ -692,12 +702,58 @@ export default function Lesson() {
 
     socket.on('connect', () => {
       if (pendingSessionRef.current) {
+        resumeTokenRef.current = null;
         socket.emit('start', pendingSessionRef.current);
         pendingSessionRef.current = null;
+      } else if (resumeTokenRef.current) {
+        socket.emit('resume', { token: resumeTokenRef.current });
       }
     });
 
-    socket.on('partial_result', (data) => {
+    socket.on('resume_token', (data) => {
+      resumeTokenRef.current = data.token;
+    });
+
+    socket.on('resume_failed', () => {
+      resumeTokenRef.current = null;
+    });
+
+    socket.on('lesson_open', () => {
+      lessonOpenRef.current = true;
+    });
+
+    socket.on('disconnect', () => {
+      lessonOpenRef.current = false;
+    });
+
+    // Out of server-side inference capacity, the server moved this session
+    // to on-device logits (we said we could with allow_downgrade).
+    socket.on('session_mode', (data) => {
+      sessionModeRef.current = data.mode;
+    });
+
+    // Turned away at start: nothing will be scored, so give the record
+    // button back and say when to try again.
+    socket.on('busy', (data) => {
+      stopRecording();
+      sentChunksRef.current = [];
+      sentLogitsRef.current = [];
+      if (data.reason === 'draining') {
+        // This server is shutting down; the next try reconnects elsewhere.
+        lessonOpenRef.current = false;
+        socket.disconnect();
+      }
+      const seconds = Math.ceil(data.retry_after || 5);
+      toast.error(`Lots of people are practicing right now. Please try again in ${seconds} seconds.`);
+    });
+
+    socket.on('error', (data) => {
+      console.error('Scoring session error:', data?.message);
+      stopRecording();
+      toast.error("Couldn't start scoring. Please try again.");
+    });
+
+    const handlePartialResult = (data) => {
       setWordResults(prev => {
         const next = [...prev];
         next[data.word_index] = { word: data.word, phonemes: data.phonemes };
@@ -713,9 +769,9 @@ export default function Lesson() {
       }));
       console.log(`[phoneme] word ${data.word_index} "${data.word}"`);
       console.table(rows);
-    });
+    };
 
-    socket.on('stats_update', (data) => {
+    const handleStatsUpdate = (data) => {
       allWordScoresRef.current.push(data.score);
       const scores = allWordScoresRef.current;
       setRunningScore(scores.reduce((a, b) => a + b, 0) / scores.length);
@@ -757,6 +813,27 @@ export default function Lesson() {
           return next;
         });
       }
+    };
+
+    socket.on('partial_result', handlePartialResult);
+    socket.on('stats_update', handleStatsUpdate);
+
+    socket.on('resumed', (data) => {
+      lessonOpenRef.current = !!data.lesson;
+      (data.results || []).forEach(handlePartialResult);
+      sentChunksRef.current.slice(data.chunks).forEach(chunk => socket.emit('chunk', chunk));
+      sentLogitsRef.current.slice(data.logits_chunks).forEach(msg => socket.emit('logits_chunk', msg));
+      if (stopSentRef.current) socket.emit('stop');
+    });
+
+    // Everything one audio chunk completed, in one message (we opt in with
+    // chunk_results: true on start). Entry i of each list is the same word.
+    socket.on('chunk_results', (data) => {
+      (data.partial_results || []).forEach((result, i) => {
+        handlePartialResult(result);
+        const stats = data.stats_updates?.[i];
+        if (stats) handleStatsUpdate(stats);
+      });
     });
 
     socket.on('result', (data) => {
@@ -765,7 +842,9 @@ export default function Lesson() {
     });
 
     socket.on('prosody', (data) => {
-      setProsody(data);
+      // status is 'late', 'dropped' or 'failed' when the server had no
+      // scores for this sentence in time; nothing to show then.
+      setProsody(data.status && data.status !== 'ok' ? null : data);
       prosodyHistoryRef.current = [
         ...prosodyHistoryRef.current,
         { sentenceIndex: currentSentenceIndexRef.current, ...data },
@@ -774,13 +853,22 @@ export default function Lesson() {
         clearTimeout(prosodyTimeoutRef.current);
         prosodyTimeoutRef.current = null;
       }
-      socket.disconnect();
+      if (!lessonOpenRef.current) socket.disconnect();
     });
 
     return () => {
       socket.off('connect');
+      socket.off('lesson_open');
+      socket.off('resume_token');
+      socket.off('resume_failed');
+      socket.off('resumed');
+      socket.off('disconnect');
+      socket.off('session_mode');
+      socket.off('busy');
+      socket.off('error');
       socket.off('partial_result');
       socket.off('stats_update');
+      socket.off('chunk_results');
       socket.off('result');
       socket.off('prosody');
       socket.disconnect();
@@ -804,8 +892,10 @@ export default function Lesson() {
         workerReadyRef.current = false;
         console.warn('On-device wav2vec2 unavailable, streaming raw audio instead:', msg.error);
       } else if (msg.type === 'logits') {
-        if (sessionModeRef.current === 'logits' && socketRef.current?.connected) {
-          socketRef.current.emit('logits_chunk', { frames: msg.frames, data: msg.data.buffer });
+        if (sessionModeRef.current === 'logits') {
+          const logits = { frames: msg.frames, data: msg.data.buffer };
+          sentLogitsRef.current.push(logits);
+          if (socketRef.current?.connected) socketRef.current.emit('logits_chunk', logits);
         }
         pendingChunksRef.current -= 1;
         onWorkerProgress();
@@ -928,7 +1018,7 @@ export default function Lesson() {
     if (prosodyTimeoutRef.current) clearTimeout(prosodyTimeoutRef.current);
     prosodyTimeoutRef.current = setTimeout(() => {
       prosodyTimeoutRef.current = null;
-      socketRef.current?.disconnect();
+      if (!lessonOpenRef.current) socketRef.current?.disconnect();
     }, 20000);
 
     if (data.passed) {
@@ -972,13 +1062,15 @@ export default function Lesson() {
   };
 
   const sendChunk = async (chunks, sampleRate) => {
-    if (!chunks.length || !socketRef.current?.connected) return;
+    // Sent while disconnected too: kept for a resume (see 'resumed').
+    if (!chunks.length || !socketRef.current) return;
     const totalLength = chunks.reduce((sum, c) => sum + c.length, 0);
     const flat = new Float32Array(totalLength);
     let offset = 0;
     for (const c of chunks) { flat.set(c, offset); offset += c.length; }
     const resampled = await resampleTo16k(flat, sampleRate);
-    socketRef.current.emit('chunk', resampled.buffer);
+    sentChunksRef.current.push(resampled.buffer);
+    if (socketRef.current.connected) socketRef.current.emit('chunk', resampled.buffer);
     if (sessionModeRef.current === 'logits' && workerRef.current) {
       pendingChunksRef.current += 1;
       workerRef.current.postMessage({ type: 'chunk', audio: resampled });
@@ -1006,6 +1098,7 @@ export default function Lesson() {
       if (pendingChunksRef.current > 0) {
         console.warn(`[wav2vec2] gave up draining worker with ${pendingChunksRef.current} chunk(s) still unscored`);
       }
+      stopSentRef.current = true;
       socketRef.current?.emit('stop');
     }
   };
@@ -1026,6 +1119,7 @@ export default function Lesson() {
       stopTimeoutRef.current = setTimeout(emitStop, STOP_DRAIN_STALL_MS);
       stopHardCapRef.current = setTimeout(emitStop, STOP_DRAIN_HARD_CAP_MS);
     } else {
+      stopSentRef.current = true;
       socketRef.current?.emit('stop');
     }
   };
@@ -1060,6 +1154,9 @@ export default function Lesson() {
     sessionModeRef.current = workerReadyRef.current ? 'logits' : 'audio';
     pendingChunksRef.current = 0;
     stopPendingRef.current = false;
+    stopSentRef.current = false;
+    sentChunksRef.current = [];
+    sentLogitsRef.current = [];
     clearStopTimers();
     if (prosodyTimeoutRef.current) {
       clearTimeout(prosodyTimeoutRef.current);
@@ -1067,14 +1164,19 @@ export default function Lesson() {
     }
 
     const socket = socketRef.current;
-    if (socket.connected) socket.disconnect();
-    // The server only accepts a userId other than "demo" when it's backed by
-    // a valid token for that same subject (see handle_start in main.py) - an
-    // authenticated learner's real progress/baseline must not be readable or
-    // writable by an unauthenticated caller who merely knows their user id.
-    const token = isAuthenticated ? await getAccessTokenSilently().catch(() => null) : null;
-    pendingSessionRef.current = { sentence, words_ipa, userId, mode: sessionModeRef.current, target_phoneme: targetPhoneme, token };
-    socket.connect();
+    if (socket.connected && lessonOpenRef.current) {
+      // The lesson is already authenticated and loaded server-side.
+      socket.emit('next_sentence', { sentence, words_ipa, mode: sessionModeRef.current, target_phoneme: targetPhoneme });
+    } else {
+      if (socket.connected) socket.disconnect();
+      // The server only accepts a userId other than "demo" when it's backed by
+      // a valid token for that same subject (see handle_start in main.py) - an
+      // authenticated learner's real progress/baseline must not be readable or
+      // writable by an unauthenticated caller who merely knows their user id.
+      const token = isAuthenticated ? await getAccessTokenSilently().catch(() => null) : null;
+      pendingSessionRef.current = { sentence, words_ipa, userId, mode: sessionModeRef.current, target_phoneme: targetPhoneme, token, chunk_results: true, lesson: true, resumable: true, allow_downgrade: workerReadyRef.current };
+      socket.connect();
+    }
 
     let stream;
     try {